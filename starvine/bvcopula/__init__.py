@@ -1,6 +1,8 @@
-__all__ = ['bv_plot', 'pc_base']
+__all__ = ['bv_plot', 'pc_base', 'pc_cache', 'pc_store']
 
 # from copula import *
 from .copula_factory import Copula
 from .bv_plot import bvContourf, bvPairPlot, bvJointPlot
 from .pc_base import PairCopula
+from .pc_cache import TournamentCache
+from .pc_store import ColumnStore
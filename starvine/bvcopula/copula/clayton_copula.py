@@ -41,6 +41,21 @@ class ClaytonCopula(CopulaBase):
             p = h2*np.power(UU,-h2)*np.power(VV,-h2)*np.power(h4,-h1)
             return p
 
+    @CopulaBase._rotPDF
+    def _dlogpdf(self, u, v, rotation=0, *theta):
+        """!
+        @brief Derivative of the log density of the clayton copula with
+        respect to theta.
+        """
+        t = theta[0]
+        logU = np.log(np.asarray(u))
+        logV = np.log(np.asarray(v))
+        pU, pV = np.exp(-t * logU), np.exp(-t * logV)
+        h1 = pU + pV - 1.0
+        h2 = -(pU * logU + pV * logV)
+        return 1.0 / (1.0 + t) - (logU + logV) + np.log(h1) / t ** 2 - \
+            (1.0 / t + 2.0) * h2 / h1
+
     @CopulaBase._rotCDF
     def _cdf(self, u, v, rotation=0, *theta):
         h1 = -theta[0]
@@ -5,6 +5,7 @@
 from __future__ import print_function, absolute_import, division
 import numpy as np
 import six, abc
+import copy
 import scipy.integrate as spi
 from scipy.optimize import bisect, newton, brentq
 from scipy.optimize import minimize
@@ -123,6 +124,17 @@ class CopulaBase(object):
         rotation = 0
         return self._pdf(u, v, rotation, *theta)
 
+    def dlogpdf(self, u, v, *theta):
+        """!
+        @brief Derivative of the log density with respect to the first
+        copula parameter, theta[0].
+        @param u <b>np_1darray</b> Rank data vector
+        @param v <b>np_1darray</b> Rank data vector
+        @param theta  <b>list</b> of <b>float</b> Copula parameter list
+        """
+        rotation = 0
+        return self._dlogpdf(u, v, rotation, *theta)
+
     def h(self, u, v, *theta):
         rotation = 0
         return self._h(u, v, rotation, *theta)
@@ -131,6 +143,39 @@ class CopulaBase(object):
         rotation = 0
         return self._hinv(u, v, rotation, *theta)
 
+    def hT(self, u, v, *theta):
+        """!
+        @brief Conditional distribution of u given v.
+        h(u, v) is the conditional distribution of v given u.  hT(u, v)
+        is h() of the transposed copula, \f$ C^T(v, u) = C(u, v) \f$.
+        @param u <b>np_1darray</b> Rank data vector
+        @param v <b>np_1darray</b> Rank data vector (conditioning variable)
+        @param theta  <b>list</b> of <b>float</b> Copula parameter list
+        """
+        rotation = 0
+        return self._transpose()._h(v, u, rotation, *theta)
+
+    def hinvT(self, w, v, *theta):
+        """!
+        @brief Inverse of hT() with respect to u.
+        @param w <b>np_1darray</b> Conditional probability vector
+        @param v <b>np_1darray</b> Rank data vector (conditioning variable)
+        @param theta  <b>list</b> of <b>float</b> Copula parameter list
+        @return u such that hT(u, v) == w
+        """
+        rotation = 0
+        return self._transpose()._hinv(v, w, rotation, *theta)
+
+    def _transpose(self):
+        """!
+        @brief Copula with swapped arguments.  All copula families
+        in starvine are exchangeable, so transposition only
+        swaps the 90 and 270 degree rotations.
+        """
+        copulaT = copy.copy(self)
+        copulaT.rotation = {0: 0, 1: 3, 2: 2, 3: 1}[self.rotation]
+        return copulaT
+
     def fitMcmc(self, u, v, *theta0, **kwargs):
         """!
         @brief Markov chain monte carlo fit method
@@ -261,6 +306,13 @@ class CopulaBase(object):
         """
         raise NotImplementedError
 
+    def _dlogpdf(self, u, v, rotation=0, *theta):
+        """!
+        @brief Virtual derivative of the log density with respect to
+        theta[0].  Only copula with a closed form derivative implement it.
+        """
+        raise NotImplementedError
+
     def _cdf(self, u, v, rotation=0, *theta):
         """!
         @brief Default implementation of the cumulative density function. Very slow.
@@ -40,6 +40,21 @@ class FrankCopula(CopulaBase):
             p = h3 * np.exp(h1 * (UU + VV)) / np.power(h2 + h4, 2.0)
             return p
 
+    @CopulaBase._rotPDF
+    def _dlogpdf(self, u, v, rotation=0, *theta):
+        """!
+        @brief Derivative of the log density of the frank copula with
+        respect to theta.
+        """
+        t = theta[0]
+        UU = np.asarray(u)
+        VV = np.asarray(v)
+        eU, eV = np.expm1(-t * UU), np.expm1(-t * VV)
+        # denominator of the density and its derivative
+        h1 = np.expm1(-t) + eU * eV
+        h2 = -np.exp(-t) - UU * (eU + 1.0) * eV - VV * (eV + 1.0) * eU
+        return 1.0 / t + 1.0 / np.expm1(t) - (UU + VV) - 2.0 * h2 / h1
+
     @CopulaBase._rotCDF
     def _cdf(self, u, v, rotation=0, *theta):
         """!
@@ -3,6 +3,7 @@
 from __future__ import print_function, absolute_import, division
 import numpy as np
 from scipy import stats
+from scipy.special import ndtr, ndtri
 # STARVINE IMPORTS
 from starvine.bvcopula.copula.copula_base import CopulaBase
 from starvine.bvcopula.copula.mvtdstpack import mvtdstpack as mvt
@@ -39,7 +40,6 @@ class GaussCopula(CopulaBase):
         h1 = 1.0 - rho2
         h2 = rho2 / (2.0 * h1)
         h3 = theta[0] / h1
-        norm_rv = stats.norm(scale=1.0, loc=0.0)
 
         # UU = CheckBounds(u);
         # VV = CheckBounds(v);
@@ -51,12 +51,24 @@ class GaussCopula(CopulaBase):
         p = np.zeros(UU.size)
 
         # Percentile point function eval
-        x = norm_rv.ppf(UU)
-        y = norm_rv.ppf(VV)
+        x = ndtri(UU)
+        y = ndtri(VV)
 
         p = np.exp(h3 * x * y - h2 * (np.power(x, 2) + np.power(y, 2))) / np.sqrt(h1)
         return p
 
+    @CopulaBase._rotPDF
+    def _dlogpdf(self, u, v, rotation=0, *theta):
+        """!
+        @brief Derivative of the log density of the Gauss copula with
+        respect to rho.
+        """
+        rho = theta[0]
+        h1 = 1.0 - rho ** 2
+        x = ndtri(np.asarray(u))
+        y = ndtri(np.asarray(v))
+        return rho / h1 + ((1.0 + rho ** 2) * x * y - rho * (x ** 2 + y ** 2)) / h1 ** 2
+
     @CopulaBase._rotCDF
     def _cdf(self, u, v, rotation=0, *theta):
         rho = theta[0]
@@ -88,22 +100,18 @@ class GaussCopula(CopulaBase):
         @brief H function (Conditional distribution) of Gauss copula.
         TODO: CHECK UU and VV ordering!
         """
-        kT = self.kTau(0, *theta)
-        kTs = kT / abs(kT)
-        kTM = 1 if kTs < 0 else 0
-
         h1 = np.sqrt(1.0 - np.power(np.asarray(theta[0]), 2))
-        dist = stats.norm(scale=1.0, loc=0.0)
 
-        UU = np.asarray(kTM + kTs * u)  # TODO: check input bounds
+        # negative dependence is carried by theta[0] < 0, no data flip
+        UU = np.asarray(u)  # TODO: check input bounds
         VV = np.asarray(v)
 
         # inverse CDF yields quantiles
-        x = dist.ppf(UU)
-        y = dist.ppf(VV)
+        x = ndtri(UU)
+        y = ndtri(VV)
 
         # eval H function
-        uu = dist.cdf((x - theta[0] * y) / h1)
+        uu = ndtr((x - theta[0] * y) / h1)
         return uu
 
     @CopulaBase._rotHinv
@@ -112,22 +120,18 @@ class GaussCopula(CopulaBase):
         @brief Inverse H function (Inv Conditional distribution) of Gauss copula.
         TODO: CHECK UU and VV ordering!
         """
-        kT = self.kTau(0, *theta)
-        kTs = kT / abs(kT)
-        kTM = 1 if kTs < 0 else 0
-
         h1 = np.sqrt(1.0 - np.power(np.asarray(theta[0]), 2))
-        dist = stats.norm(scale=1.0, loc=0.0)
 
-        UU = np.asarray(kTM + kTs * u)  # TODO: check input bounds
+        # negative dependence is carried by theta[0] < 0, no data flip
+        UU = np.asarray(u)  # TODO: check input bounds
         VV = np.asarray(v)
 
         # inverse CDF yields quantiles
-        x = dist.ppf(UU)
-        y = dist.ppf(VV)
+        x = ndtri(UU)
+        y = ndtri(VV)
 
         # eval H function
-        uu = dist.cdf(x * h1 + theta[0] * y)
+        uu = ndtr(x * h1 + theta[0] * y)
         return uu
 
     @CopulaBase._rotGen
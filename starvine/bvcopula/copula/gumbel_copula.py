@@ -39,6 +39,26 @@ class GumbelCopula(CopulaBase):
         p = np.exp(-h7+h4+h5)*np.power(h4,h1)*np.power(h5,h1)*np.power(h6,h2)*(h1+h7)
         return p
 
+    @CopulaBase._rotPDF
+    def _dlogpdf(self, u, v, rotation=0, *theta):
+        """!
+        @brief Derivative of the log density of the gumbel copula with
+        respect to theta.
+        """
+        t = theta[0]
+        x = -np.log(np.asarray(u))
+        y = -np.log(np.asarray(v))
+        logX, logY = np.log(x), np.log(y)
+        pX, pY = np.power(x, t), np.power(y, t)
+        h6 = pX + pY
+        logH6 = np.log(h6)
+        # derivatives of h6 and of h7 = h6 ** (1 / t)
+        dH6 = pX * logX + pY * logY
+        h7 = np.power(h6, 1.0 / t)
+        dH7 = h7 * (dH6 / (t * h6) - logH6 / t ** 2)
+        return -dH7 + logX + logY - logH6 / t ** 2 + (1.0 / t - 2.0) * dH6 / h6 + \
+            (1.0 + dH7) / (t - 1.0 + h7)
+
     @CopulaBase._rotCDF
     def _cdf(self, u, v, rotation=0, *theta):
         h1 = 1 / theta[0]
@@ -55,51 +75,32 @@ class GumbelCopula(CopulaBase):
         return p
 
     @CopulaBase._rotH
-    def _h(self, v, u, rotation=0, *theta):
-        """
-        TODO: CHECK UU and VV ordering!
+    def _h(self, u, v, rotation=0, *theta):
+        """!
+        @brief Conditional distribution of v given u,
+        \f$ h(u, v) = \partial C(u, v) / \partial u \f$
         """
         h1 = theta[0] - 1.0
         h2 = (1.0 - theta[0]) / theta[0]
         h3 = 1.0 / theta[0]
 
-        UU = np.asarray(1. - u)
-        VV = np.asarray(1. - v)
+        UU = np.asarray(u)
+        VV = np.asarray(v)
 
-        h4 = -np.log(VV)
-        h5 = np.power(-np.log(UU), theta[0]) + np.power(h4, theta[0])
+        h4 = -np.log(UU)
+        h5 = np.power(h4, theta[0]) + np.power(-np.log(VV), theta[0])
 
-        uu = np.power(h4,h1)/VV*(np.power(h5,h2))*np.exp(-np.power(h5,h3))
+        uu = np.power(h4, h1) / UU * (np.power(h5, h2)) * np.exp(-np.power(h5, h3))
         return uu
 
     @CopulaBase._rotHinv
-    def _hinv(self, v, u, rotation=0, *theta):
+    def _hinv(self, u, w, rotation=0, *theta):
         """!
-        TODO: CHECK UU and VV ordering!
+        @brief Inverse of h(u, v) with respect to v.
         """
-        U = np.asarray(u)
-        V = np.asarray(v)
-        uu = np.zeros(U.size)
-        for i, (ui, vi) in enumerate(zip(U, V)):
-            uu[i] = self._invhfun_bisect(ui, vi, rotation, *theta)
-        return uu
-        # Apply rotation
-
-        # TODO: Fix! Properly vectorize hinv!
-        # TODO: This is causing an issue in c-vine sampling
-        # It is faster but it is incorrect.
-        #if rotation == 1:
-        #    U = 1. - U
-        #elif rotation == 3:
-        #    V = 1. - V
-        #elif rotation == 0:
-        #    pass
-        #vv = self.vec_newton_hinv(V, U, theta[0], z_init=np.ones(len(U)))
-        #if rotation == 1 or rotation == 3:
-        #    return 1. - vv
-        #else:
-        #    return vv
-        pass
+        UU = np.clip(np.asarray(u, dtype=float), 1e-12, 1. - 1e-12)
+        WW = np.clip(np.asarray(w, dtype=float), 1e-12, 1. - 1e-12)
+        return self.vec_newton_hinv(UU, WW, theta[0])
 
     @CopulaBase._rotGen
     def _gen(self, t, *theta):
@@ -113,32 +114,35 @@ class GumbelCopula(CopulaBase):
             return 1. - 1. / theta[0]
 
     @staticmethod
-    def vec_newton_hinv(u, p, theta, z_init, under_relax=0.5, eps=1e-6, iter_max=100):
+    def vec_newton_hinv(u, p, theta, z_init=None, eps=1e-12, iter_max=50):
         """!
         @brief Finds the zero of h() via vectorized newtons method.
             Note: For derivation of h() and h'() See:
             Dependence Modeling with Copulas. H. Joe. pp 172.
+            h(z) is increasing and concave in z, so the iterates started
+            right of the zero converge monotonically from the left after
+            the first step.
         @param u np_1darray in (0, 1)
         @param p np_1darray in (0, 1)
         @param theta float. copula shape parameter
-        @param z_init np_1darray initial guess for zeros
-        @param under_relax  float.
+        @param z_init np_1darray initial guess for zeros.  Default is an
+            upper bound of the zeros.
         @param eps Convergence tol
         """
         x = - np.log(u)
-        h = lambda z: z + (theta - 1.) * np.log(z) - (x + (theta - 1.) * np.log(x) - np.log(p))
+        rhs = x + (theta - 1.) * np.log(x) - np.log(p)
+        h = lambda z: z + (theta - 1.) * np.log(z) - rhs
         h_prime = lambda z: 1. + (theta - 1.0) / z
-        z = np.asarray(z_init)
-        i = 0
-        # z_old = np.ones(len(z)) * 1e12
-        # mask = np.empty(len(z), dtype=bool)
-        while i < iter_max:
-            # eps_arr = z - z_old
-            # mask = eps > np.abs(eps_arr)
-            z -= under_relax * h(z) / h_prime(z)
-            z = np.clip(z, 1e-12, 1e5)
-            # z_old = deepcopy(z)
-            i += 1
-        y = (z ** theta - x ** theta) ** (1. / theta)
+        if z_init is None:
+            z = x - np.log(p)
+        else:
+            z = np.array(z_init, dtype=float)
+        for i in range(iter_max):
+            dz = h(z) / h_prime(z)
+            # the zero is no smaller than x
+            z = np.maximum(z - dz, x)
+            if np.all(np.abs(dz) <= eps * z):
+                break
+        y = np.power(np.maximum(z ** theta - x ** theta, 0.), 1. / theta)
         vv = np.exp(-y)
         return vv
@@ -5,13 +5,16 @@ from __future__ import print_function, absolute_import, division
 import os
 import numpy as np
 from six import iteritems
-from scipy.stats import kendalltau, spearmanr, pearsonr
-from scipy.stats import gaussian_kde
+from scipy.stats import kendalltau, spearmanr, pearsonr, norm
+from scipy.special import ndtr
+from scipy.signal import fftconvolve
 from scipy.stats.mstats import rankdata
 # NUMBA
-from numba import jit
+from numba import jit, prange
 # COPULA IMPORTS
 from starvine.bvcopula.copula_factory import Copula
+from starvine.bvcopula.pc_cache import TournamentCache
+from starvine.bvcopula.pc_workers import shareArrays, attachArrays, unshare
 
 
 class PairCopula(object):
@@ -35,6 +38,13 @@ class PairCopula(object):
         @param y  <b>np_1darray</b> second marginal data set
         @param weights <b>np_1darray</b> (optional) data weights
                normalized or unormalized weights accepted
+        @param weightedRank <b>bool</b> (optional) use the data weights
+               in the rank transform.  Default is False.
+        @param ranks <b>tuple</b> (optional) precomputed (u, v) ranked data.
+               The arrays are not copied.  See pc_store.ColumnStore
+        @param indepAlpha <b>float</b> (optional) significance level of the
+               kendall's tau independence pre-test of copulaTournament().
+               Default is 0, the pre-test is off.
         Note: len(u) == len(v) == len(weights)
         """
         self.copulaModel, self.copulaParams = None, (None, None, )
@@ -43,22 +53,35 @@ class PairCopula(object):
         self.y = np.asarray(y)
         # normalize weights (weights must sum to 1.0)
         self.weights = weights
+        self._weightScale = 1.0
         if self.weights is not None:
-            self.weights = self.weights / np.average(self.weights)
+            self._weightScale = np.average(self.weights)
+            if self._weightScale != 1.0:
+                self.weights = self.weights / self._weightScale
+        self._resampled = resample > 0
         if resample > 0:
             self.resample(resample, kwargs.pop("jitter", 1e-12))
         self.setTrialCopula(kwargs.pop("family", {}))
+        self.indepAlpha = kwargs.pop("indepAlpha", 0.0)
         # default data ranking method
+        self.weighted_rank = kwargs.pop("weightedRank", False)
         self.rank_method = kwargs.pop("rankMethod", 0)
-        self.rank(self.rank_method)
+        ranks = kwargs.pop("ranks", None)
+        if ranks is not None and not self._resampled:
+            self.UU, self.VV = np.asarray(ranks[0]), np.asarray(ranks[1])
+            assert len(self.UU) == len(self.x) == len(self.VV)
+            self._resetCache()
+        else:
+            self.rank(self.rank_method)
 
     def resample(self, px_size=10, jitter=1e-12):
         """!
         @brief Resamples the original data with replacement.  Samples
         are drawn with probability proportional to the original sample weight.
         The resampled data points are all equally weighted.
-            Note: Equally weighted samples are required to accurately
-            estimate Kendall's function.
+            Note: Resampling is no longer required to estimate Kendall's tau,
+            Kendall's function or the data ranks of weighted samples.  See
+            weighted_kendalltau(), fast_empKc() and weighted_rankdata().
         @param px_size <b>int</b> population size multiplier.
             Higher is more accurate but requires more
             ram an cpu to fit copula and compute statistics on the resampled pop
@@ -86,25 +109,182 @@ class PairCopula(object):
         @param method <b>int</b>
                if == 0: use standard rank transform,
                else: use CDF data transform.
+               If self.weighted_rank is set, the data weights are
+               accounted for by both methods.
         @return (u, v) tuple of <b>np_1darray</b> ranked samples
         """
+        wgts = self.weights if self.weighted_rank else None
         if method == 0:
-            u = rankdata(self.x) / (len(self.x) + 1)
-            v = rankdata(self.y) / (len(self.y) + 1)
+            if wgts is None:
+                u = rankdata(self.x) / (len(self.x) + 1)
+                v = rankdata(self.y) / (len(self.y) + 1)
+            else:
+                u = weighted_rankdata(self.x, wgts)
+                v = weighted_rankdata(self.y, wgts)
         else:
             # use alternate CDF rank transform method
-            kde_x = gaussian_kde(self.x)
-            kde_y = gaussian_kde(self.y)
-            u_hat = np.zeros(len(self.x))
-            v_hat = np.zeros(len(self.y))
-            for i, (xp, yp) in enumerate(zip(self.x, self.y)):
-                u_hat[i] = kde_x.integrate_box_1d(-np.inf, xp)
-                v_hat[i] = kde_y.integrate_box_1d(-np.inf, yp)
-            u = u_hat
-            v = v_hat
+            u = kde_cdf(self.x, weights=wgts)
+            v = kde_cdf(self.y, weights=wgts)
         self.UU, self.VV = u, v
+        self._resetCache()
         return u, v
 
+    def update(self, x_new, y_new, weights=None, refit=True, driftTol=None, **kwargs):
+        """!
+        @brief Append a batch of observations.
+        The data ranks and kendall's tau are updated incrementally from a
+        maintained sorted index of the data: only the new-new and
+        new-old pairs are counted.
+        The current copula model is refit starting from its current
+        parameters.  The copula tournament is re-run if the per sample AIC
+        of the refit model increases by more than driftTol.
+        @param x_new <b>np_1darray</b> new first marginal data
+        @param y_new <b>np_1darray</b> new second marginal data
+        @param weights <b>np_1darray</b> (optional) weights of the new data,
+            on the same scale as the weights supplied at init.
+        @param refit <b>bool</b> refit the copula model. Default True.
+        @param driftTol <b>float</b> (optional) max allowed increase of the
+            per sample AIC before the copula tournament is re-run.
+            If None, the copula family is never re-selected.
+        @param kwargs passed to copulaTournament()
+        @return (copula model, copula params)
+        """
+        if self._resampled:
+            raise RuntimeError("Update of resampled data is not supported.")
+        x_new = np.asarray(x_new, dtype=np.float64)
+        y_new = np.asarray(y_new, dtype=np.float64)
+        assert len(x_new) == len(y_new)
+        if not hasattr(self, "_sortIdx"):
+            self._initSortedIndex()
+        n_old = len(self.x)
+        # raw weights are kept on the scale of the init weights
+        if weights is None:
+            w_new = np.ones(len(x_new))
+        else:
+            w_new = np.asarray(weights, dtype=np.float64) / self._weightScale
+        rank_w_new = w_new if self.weighted_rank else np.ones(len(x_new))
+        if weights is not None or self.weights is not None:
+            self.weights = np.concatenate((self._sortIdx["w_raw"], w_new))
+            self._sortIdx["w_raw"] = self.weights
+            self.weights = self.weights / np.average(self.weights)
+        else:
+            self._sortIdx["w_raw"] = np.ones(n_old + len(x_new))
+        # incremental kendall's tau
+        tau_w_old = self._sortIdx["tau_w"]
+        tau_w_new = w_new if self.weights is not None else np.ones(len(x_new))
+        self._sortIdx["tau_sums"] = self._updateKendallSums(x_new, y_new, tau_w_new)
+        self._sortIdx["tau_w"] = np.concatenate((tau_w_old, tau_w_new))
+        # incremental ranks
+        self._sortIdx["rx"] = self._mergeRankSums("x", self.x, x_new, rank_w_new)
+        self._sortIdx["ry"] = self._mergeRankSums("y", self.y, y_new, rank_w_new)
+        self.x = np.concatenate((self.x, x_new))
+        self.y = np.concatenate((self.y, y_new))
+        self._sortIdx["rank_w"] = np.concatenate((self._sortIdx["rank_w"], rank_w_new))
+        if self.rank_method == 0:
+            w_avg = np.average(self._sortIdx["rank_w"])
+            self.UU = (self._sortIdx["rx"] / w_avg + 0.5) / (len(self.x) + 1)
+            self.VV = (self._sortIdx["ry"] / w_avg + 0.5) / (len(self.y) + 1)
+            self._resetCache()
+        else:
+            self.rank(self.rank_method)
+        s_sum, t_0, t_x, t_y = self._sortIdx["tau_sums"]
+        self.empKTau_ = s_sum / np.sqrt((t_0 - t_x) * (t_0 - t_y))
+        tau_w = self._sortIdx["tau_w"]
+        self.pval_ = kendall_pval(self.empKTau_, np.sum(tau_w) ** 2. / np.sum(tau_w ** 2.))
+        if not refit:
+            return (self.copulaModel, self.copulaParams)
+        if self.copulaModel is None or self.copulaParams[1] is None:
+            return self.copulaTournament(**kwargs)
+        if self.copulaModel.name == 'indep':
+            # nothing to refit, re-run the independence pre-test
+            return self.copulaTournament(**kwargs)
+        # warm start from the current copula params
+        aic_old = self.copulaParams[2] / n_old
+        goldCopula = self.copulaModel
+        goldParams = self.fitCopula(goldCopula, thetaGuess=tuple(self.copulaParams[1]))
+        self.copulaModel, self.copulaParams = goldCopula, goldParams
+        if driftTol is not None and \
+                not (goldParams[2] / len(self.x) - aic_old <= driftTol):
+            return self.copulaTournament(**kwargs)
+        return (self.copulaModel, self.copulaParams)
+
+    def _initSortedIndex(self):
+        """!
+        @brief Build the sorted index used by update().
+        Stores the sort order and sorted values of each margin, the
+        (weighted) rank sums and the kendall's tau pair sums.
+        """
+        n = len(self.x)
+        w_raw = np.ones(n) if self.weights is None else self.weights
+        rank_w = w_raw if self.weighted_rank else np.ones(n)
+        self._sortIdx = {"w_raw": w_raw, "rank_w": rank_w, "tau_w": w_raw}
+        for key, z in (("x", self.x), ("y", self.y)):
+            z_order = np.argsort(z, kind='mergesort')
+            z_sorted = z[z_order]
+            cum_w = np.concatenate(([0.], np.cumsum(rank_w[z_order])))
+            lo = np.searchsorted(z_sorted, z, side='left')
+            hi = np.searchsorted(z_sorted, z, side='right')
+            self._sortIdx[key + "_order"] = z_order
+            self._sortIdx[key + "_sorted"] = z_sorted
+            self._sortIdx["r" + key] = 0.5 * (cum_w[lo] + cum_w[hi])
+        self._sortIdx["tau_sums"] = kendall_sums(np.asarray(self.x, dtype=np.float64),
+                                                 np.asarray(self.y, dtype=np.float64),
+                                                 w_raw)
+
+    def _mergeRankSums(self, key, z_old, z_new, w_new):
+        """!
+        @brief Merge new samples into the sorted index of one margin.
+        @return <b>np_1darray</b> rank sums of the merged samples
+        """
+        n_old = len(z_old)
+        z_order, z_sorted = self._sortIdx[key + "_order"], self._sortIdx[key + "_sorted"]
+        new_order = np.argsort(z_new, kind='mergesort')
+        new_sorted = z_new[new_order]
+        # old samples move up by the weight of the new samples below them
+        cum_new = np.concatenate(([0.], np.cumsum(w_new[new_order])))
+        r_old = self._sortIdx["r" + key] + 0.5 * \
+            (cum_new[np.searchsorted(new_sorted, z_old, side='left')] +
+             cum_new[np.searchsorted(new_sorted, z_old, side='right')])
+        # merge the sorted index
+        ins = np.searchsorted(z_sorted, new_sorted, side='right')
+        z_sorted = np.insert(z_sorted, ins, new_sorted)
+        z_order = np.insert(z_order, ins, new_order + n_old)
+        rank_w = np.concatenate((self._sortIdx["rank_w"], w_new))
+        cum_w = np.concatenate(([0.], np.cumsum(rank_w[z_order])))
+        r_new = 0.5 * (cum_w[np.searchsorted(z_sorted, z_new, side='left')] +
+                       cum_w[np.searchsorted(z_sorted, z_new, side='right')])
+        self._sortIdx[key + "_order"], self._sortIdx[key + "_sorted"] = z_order, z_sorted
+        return np.concatenate((r_old, r_new))
+
+    def _updateKendallSums(self, x_new, y_new, w_new):
+        """!
+        @brief Add the pair sums of the new-new and old-new pairs to
+        the kendall's tau pair sums.  Must be called before the sorted
+        index is merged.
+        """
+        x_order = self._sortIdx["x_order"]
+        w_old = self._sortIdx["tau_w"]
+        s_new, t0_new, tx_new, ty_new = kendall_sums(x_new, y_new, w_new)
+        # common y ranks of old and new samples
+        y_all_sorted = np.sort(np.concatenate((self._sortIdx["y_sorted"], y_new)))
+        yo_rank = np.searchsorted(y_all_sorted, self.y[x_order], side='left') + 1
+        new_order = np.argsort(x_new, kind='mergesort')
+        yn_rank = np.searchsorted(y_all_sorted, y_new[new_order], side='left') + 1
+        s_x, tx_x, ty_x = jit_cross_kendall(
+            np.asarray(self.x[x_order], dtype=np.float64), yo_rank, w_old[x_order],
+            x_new[new_order], yn_rank, w_new[new_order], len(y_all_sorted))
+        s_old, t0_old, tx_old, ty_old = self._sortIdx["tau_sums"]
+        return (s_old + s_new + s_x,
+                t0_old + t0_new + np.sum(w_old) * np.sum(w_new),
+                tx_old + tx_new + tx_x,
+                ty_old + ty_new + ty_x)
+
+    def _resetCache(self):
+        """!
+        @brief Reset caches which depend on the ranked data.
+        """
+        self._kcEmpCache, self._kcModelCache, self._kcBaseBank = {}, {}, {}
+
     @property
     def u(self):
         """! @brief alias to self.UU """
@@ -131,13 +311,20 @@ class PairCopula(object):
         self.copulaBank = {}
         for name, rotation in iteritems(self.trialFamily):
             self.copulaBank[name] = Copula(name, rotation)
+        # selected when the independence pre-test passes
+        self.copulaBank.setdefault("indep", Copula("indep", 0))
 
     def empKTau(self):
         """!
         @brief Returns emperical kendall's tau of rank transformed data.
+        Weighted samples are handled by weighted_kendalltau().
         @return <b>float</b> Kendall's tau rank correlation coeff
         """
-        self.empKTau_, self.pval_ = kendalltau(self.UU, self.VV)
+        if self.weights is None:
+            self.empKTau_, self.pval_ = kendalltau(self.UU, self.VV)
+        else:
+            self.empKTau_, self.pval_ = \
+                weighted_kendalltau(self.UU, self.VV, self.weights)
         return self.empKTau_, self.pval_
 
     def empSRho(self):
@@ -159,23 +346,89 @@ class PairCopula(object):
     def empKc(self, UU=[], VV=[]):
         """!
         @brief Compute empirical kendall's function.
+        Uses the O(n log n) fenwick tree implementation, see fast_empKc().
+        Data weights are used when UU and VV are not supplied.
         """
-        if UU == [] or VV == []:
-            UU, VV = self.UU, self.VV
-        return jit_empKc(UU, VV)
+        if len(UU) == 0 or len(VV) == 0:
+            return fast_empKc(self.UU, self.VV, self.weights)
+        return fast_empKc(UU, VV)
 
     def copulaTournament(self, criterion='AIC', **kwargs):
         """!
         @brief Determines the copula that best fits the rank transformed data
         based on the AIC or Kendall's function criterion.
         All Copula in self.trialFamily set are considered.
+        The fitted params and scores of all candidates are stored in
+        self.tournamentResults.
+        @param criterion <b>str</b> in ('AIC', 'Kc')
+        @param cache <b>TournamentCache</b> (optional) tournament result cache.
+            If the same ranked data, weights, trial family and criterion
+            were seen before, the cached result is used and no copula is fit.
+        @param executor (optional) concurrent.futures style executor.  The
+            trial copula are fit concurrently, each worker maps the ranked
+            data published once by starvine.bvcopula.pc_workers.shareArrays()
+        @param shareDir <b>str</b> (optional) parent directory of the
+            shared data files.  Default is /dev/shm
         """
         vb = kwargs.pop("verbosity", True)
+        cache = kwargs.pop("cache", None)
+        if cache is not None:
+            cache_key = self.tournamentKey(criterion)
+            entry = cache.get(cache_key)
+            if entry is not None:
+                return self._loadTournament(entry, vb)
+        self._runTournament(criterion, vb, **kwargs)
+        if cache is not None:
+            cache.put(cache_key, self._dumpTournament())
+        return (self.copulaModel, self.copulaParams)
+
+    def tournamentKey(self, criterion='AIC'):
+        """!
+        @brief Tournament cache key of this pair copula.
+        @param criterion <b>str</b> in ('AIC', 'Kc')
+        """
+        return TournamentCache.key(
+            self.UU, self.VV, self.weights, self.trialFamily, criterion,
+            {"rankMethod": self.rank_method, "weightedRank": self.weighted_rank,
+             "indepAlpha": self.indepAlpha})
+
+    def indepTest(self, alpha=None):
+        """!
+        @brief Kendall's tau test of independence.
+        @param alpha <b>float</b> (optional) significance level.  Default is
+            self.indepAlpha.
+        @return <b>bool</b> True if independence can not be rejected at
+            the significance level, or if the independence copula is the
+            only trial family.  Always False at a zero level otherwise.
+        """
+        if alpha is None:
+            alpha = self.indepAlpha
         self.empKTau()
-        if self.pval_ >= 0.05 and self.weights is None:
+        if set(self.trialFamily) == set(["indep"]):
+            return True
+        return alpha > 0 and self.pval_ >= alpha
+
+    def _runTournament(self, criterion='AIC', vb=True, **kwargs):
+        """!
+        @brief Fit all trial copula and select the best.  See copulaTournament().
+        """
+        self.tournamentResults = {}
+        if self.indepTest():
+            # no copula is fit to independent data
+            goldCopula = self.copulaBank["indep"]
+            goldParams = (goldCopula.name, np.array([]), 0.0, goldCopula.rotation, True)
+            self.tournamentResults["indep"] = goldParams + (None, )
+            self.copulaModel = goldCopula
+            self.copulaParams = goldParams
+            if vb: print("ID: %s. Independence not rejected, pval=%.3f. indep copula selected."
+                         % (str(self.id), self.pval_))
+            if vb: print("-------------------------------------------")
+            return (self.copulaModel, self.copulaParams)
+        if self.pval_ >= 0.05 and "gauss" in self.trialFamily:
             print("Independence Coplua selected")
             goldCopula = self.copulaBank["gauss"]
             goldParams = self.fitCopula(goldCopula)
+            self.tournamentResults["gauss"] = goldParams + (None, )
             self.copulaModel = goldCopula
             self.copulaParams = goldParams
             if vb: print("ID: %s. %s copula selected.  fitted params="
@@ -185,17 +438,28 @@ class PairCopula(object):
             return (self.copulaModel, self.copulaParams)
         # Find best fitting copula
         best_AIC, best_kc, goldCopula, goldParams = np.inf, np.inf, None, None
+        executor, shareDir = kwargs.pop("executor", None), kwargs.pop("shareDir", None)
+        trialFits = None
+        if executor is not None:
+            trialFits = self._parFitCopula(executor, shareDir)
         for trialCopulaName, rotation in iteritems(self.trialFamily):
             if vb: print("Copula " + (trialCopulaName).ljust(12) + '.', end="")
             copula = self.copulaBank[trialCopulaName]
-            fittedCopulaParams = self.fitCopula(copula)
+            if trialFits is None:
+                fittedCopulaParams = self.fitCopula(copula)
+            else:
+                fittedCopulaParams = trialFits[trialCopulaName]
+                copula._fittedParams = fittedCopulaParams[1]
             trialAIC = fittedCopulaParams[2]
             trial_kc_metric = 0
             if criterion == 'Kc':
                 trial_kc_metric = self.compute_kc_metric(copula, \
                         log=kwargs.get("log", False), \
-                        log_dir=kwargs.get("log_dir", "Kc_logs"))
+                        log_dir=kwargs.get("log_dir", "Kc_logs"), \
+                        params=fittedCopulaParams[1])
                 print(" KC_m: " + '{:+05.5f}'.format(trial_kc_metric), end=",")
+            self.tournamentResults[trialCopulaName] = fittedCopulaParams + \
+                (trial_kc_metric if criterion == 'Kc' else None, )
             if vb: print(" AIC: " + '{:+05.3f}'.format(trialAIC), end=",")
             if vb: print(" emp_ktau: " + '{:+05.3f}'.format(self.empKTau_), end=",")
             if vb: print(" cop_ktau: " + \
@@ -218,6 +482,52 @@ class PairCopula(object):
         self.copulaParams = goldParams
         return (self.copulaModel, self.copulaParams)
 
+    def _parFitCopula(self, executor, shareDir=None):
+        """!
+        @brief Fit all trial copula concurrently.
+        @param executor concurrent.futures style executor
+        @param shareDir <b>str</b> (optional) parent directory of the
+            shared data files
+        @return <b>dict</b> {trial copula name: fitted copula params}
+        """
+        names = list(self.trialFamily)
+        ref = shareArrays({"UU": np.asarray(self.UU, dtype=np.float64),
+                           "VV": np.asarray(self.VV, dtype=np.float64),
+                           "weights": self.weights}, shareDir)
+        try:
+            fits = list(executor.map(fitTrialCopula, [ref] * len(names), names,
+                                     [self.trialFamily[name] for name in names]))
+        finally:
+            unshare(ref)
+        return dict(zip(names, fits))
+
+    def _dumpTournament(self):
+        """!
+        @brief Tournament result to be stored in a TournamentCache.
+        """
+        gold_name = [name for name, copula in iteritems(self.copulaBank)
+                     if copula is self.copulaModel][0]
+        return {"gold": gold_name,
+                "copulaParams": self.copulaParams,
+                "results": self.tournamentResults,
+                "ktau": (self.empKTau_, self.pval_)}
+
+    def _loadTournament(self, entry, vb=True):
+        """!
+        @brief Restore a cached tournament result.
+        """
+        self.empKTau_, self.pval_ = entry["ktau"]
+        self.tournamentResults = dict(entry["results"])
+        for name, result in iteritems(self.tournamentResults):
+            self.copulaBank[name]._fittedParams = result[1]
+        self.copulaModel = self.copulaBank[entry["gold"]]
+        self.copulaParams = entry["copulaParams"]
+        self.copulaModel._fittedParams = self.copulaParams[1]
+        if vb: print("ID: %s. %s copula loaded from cache.  fitted params="
+                     % (str(self.id), self.copulaModel.name) + str(self.copulaParams[1])
+                     + " rotation=" + str(self.copulaParams[3]))
+        return (self.copulaModel, self.copulaParams)
+
     def fitCopula(self, copula, thetaGuess=(None, None,)):
         """!
         @brief fit specified copula to data.
@@ -225,48 +535,64 @@ class PairCopula(object):
         @param thetaGuess <b>tuple</b> (optional) initial guess for copula params
         @return (copula type <b>string</b>, fitted copula params <b>np_array</b>)
         """
-        thetaHat, successFlag = \
-            copula.fitMLE(self.UU, self.VV, *thetaGuess, weights=self.weights)
-        if successFlag:
-            AIC = copula._AIC(self.UU, self.VV, 0, *thetaHat, weights=self.weights)
-        else:
-            AIC = np.inf
         self.copulaModel = copula
-        return (copula.name, thetaHat, AIC, copula.rotation, successFlag)
+        return fitCopulaMLE(copula, self.UU, self.VV, self.weights, thetaGuess)
 
     @staticmethod
     def compute_aic_metric(copula, u, v, rot, theta, weights=None):
         raise NotImplementedError
 
-    def compute_kc_metric(self, copula, log=True, log_dir='Kc_logs'):
+    def compute_kc_metric(self, copula, log=True, log_dir='Kc_logs', params=None):
         """!
         @brief Compute l2 norm of differences between the empirical Kc function
         and the fitted copula's Kc function.
+        The empirical Kc function is computed at most once for each of the
+        four possible data rotations and the fitted copula's Kc function is
+        cached by (copula, rotation, params).  Caches are reset by rank().
         @param copula starvine.bvcopula.copula.copula_base.CopulaBase instance
+        @param params <b>np_1darray</b> (optional) copula params fitted to the
+            un-rotated data, eg. from fitCopula().  If not supplied, the
+            un-rotated copula is refit to the rotated data.
         """
         # rotate current data into the proposed copula orientation
-        if copula.name in ["gauss", "t"] and copula.rotation == 0 and self.empKTau_ < 0:
+        flip = copula.name in ["gauss", "t"] and copula.rotation == 0 \
+            and self.empKTau_ < 0
+        if flip:
             # force positive correlation
-            rt_UU, rt_VV = self.rotate_data(self.UU, self.VV, -1)
+            rt_key = 3
         else:
-            rt_UU, rt_VV = self.rotate_data(self.UU, self.VV, copula.rotation)
-        # compute emperical Kc on the rotated data
-        rt_t_emp, rt_kc_emp = jit_empKc(rt_UU, rt_VV)
-        # fit the un-rotated copula
-        base_copula = Copula(copula.name, 0)
-        base_copula.fitMLE(rt_UU, rt_VV, *(None, None,), weights=self.weights)
-        mask = ((rt_t_emp > 0.005) & (rt_t_emp < 1.0))
-        kc_metric = []
-        for i in range(4):
-            fitted_kc = base_copula.kC(rt_t_emp[mask])
-            kc_metric.append(np.linalg.norm(fitted_kc - rt_kc_emp[mask]))
+            rt_key = copula.rotation
+        if rt_key not in self._kcEmpCache:
+            rt_UU, rt_VV = self.rotate_data(self.UU, self.VV, rt_key)
+            # compute emperical Kc on the rotated data
+            rt_t_emp, rt_kc_emp = fast_empKc(rt_UU, rt_VV, self.weights)
+            mask = ((rt_t_emp > 0.005) & (rt_t_emp < 1.0))
+            self._kcEmpCache[rt_key] = (rt_t_emp[mask], rt_kc_emp[mask])
+        t_emp, kc_emp = self._kcEmpCache[rt_key]
+        # the un-rotated copula
+        if copula.name not in self._kcBaseBank:
+            self._kcBaseBank[copula.name] = Copula(copula.name, 0)
+        base_copula = self._kcBaseBank[copula.name]
+        if params is None:
+            rt_UU, rt_VV = self.rotate_data(self.UU, self.VV, rt_key)
+            params = base_copula.fitMLE(rt_UU, rt_VV, *(None, None,),
+                                        weights=self.weights)[0]
+        elif flip:
+            # correlation coeff of the reflected data changes sign
+            params = np.array(params, dtype=float)
+            params[0] = -params[0]
+        model_key = (copula.name, rt_key, tuple(np.asarray(params).ravel()))
+        if model_key not in self._kcModelCache:
+            self._kcModelCache[model_key] = base_copula.kC(t_emp, *params)
+        fitted_kc = self._kcModelCache[model_key]
+        kc_metric = np.linalg.norm(fitted_kc - kc_emp)
         if log:
             if not os.path.exists(log_dir):
                 os.makedirs(log_dir)
             np.savetxt(log_dir + '/kc_log_' + str(base_copula.name) + "_" + str(copula.rotation) + '.txt',
-                       np.array([rt_t_emp[mask], fitted_kc, rt_kc_emp[mask]]).T,
+                       np.array([t_emp, fitted_kc, kc_emp]).T,
                        header="Kendalls fn log for Copula: " + str(base_copula.name) + "_" + str(copula.rotation))
-        return np.average(kc_metric)
+        return kc_metric
 
     def _rotate_data(self, u, v, rotation=0):
         """!
@@ -334,6 +660,44 @@ class PairCopula(object):
         return default_family
 
 
+def fitCopulaMLE(copula, UU, VV, weights=None, thetaGuess=(None, None,)):
+    """!
+    @brief Maximum likelihood fit of a copula to ranked data.
+    @param copula <b>CopulaBase</b> Copula instance
+    @param UU <b>np_1darray</b> ranked data
+    @param VV <b>np_1darray</b> ranked data
+    @param weights <b>np_1darray</b> (optional) data weights
+    @param thetaGuess <b>tuple</b> (optional) initial guess for copula params
+    @return (copula type <b>string</b>, fitted copula params <b>np_array</b>,
+        AIC, rotation, success flag)
+    """
+    # single precision ranks are upcast for the fit only
+    u = np.asarray(UU, dtype=np.float64)
+    v = np.asarray(VV, dtype=np.float64)
+    thetaHat, successFlag = \
+        copula.fitMLE(u, v, *thetaGuess, weights=weights)
+    if successFlag:
+        AIC = copula._AIC(u, v, 0, *thetaHat, weights=weights)
+    else:
+        AIC = np.inf
+    return (copula.name, thetaHat, AIC, copula.rotation, successFlag)
+
+
+def fitTrialCopula(ref, name, rotation):
+    """!
+    @brief Fit a single trial copula.  Executed by the workers of
+    PairCopula.copulaTournament().
+    @param ref <b>dict</b> shared data reference.
+        See starvine.bvcopula.pc_workers.shareArrays()
+    @param name <b>str</b> trial copula family name
+    @param rotation <b>int</b> copula rotation
+    @return fitted copula params, see fitCopulaMLE()
+    """
+    data = attachArrays(ref)
+    return fitCopulaMLE(Copula(name, rotation), data["UU"], data["VV"],
+                        data.get("weights", None))
+
+
 @jit(nopython=True)
 def jit_empKc(UU, VV):
     """!
@@ -351,3 +715,435 @@ def jit_empKc(UU, VV):
     x2 = np.sort(z)
     f2 = np.linspace(0.0, 1.0, len(z))
     return x2, f2
+
+
+def fast_empKc(UU, VV, weights=None):
+    """!
+    @brief O(n log n) empirical kendall's function.
+    For each sample, the (weighted) fraction of the other samples which
+    are strictly dominated in both coordinates is counted by sweeping the
+    samples in order of increasing UU while a fenwick tree (binary indexed
+    tree) accumulates the weight of the visited samples by VV rank.
+    Produces identical output to jit_empKc() for unweighted data.
+    @param UU <b>np_1darray</b> rank transformed data
+    @param VV <b>np_1darray</b> rank transformed data
+    @param weights <b>np_1darray</b> (optional) sample weights
+    @return (t, Kc(t)) tuple of <b>np_1darray</b>
+    """
+    UU = np.asarray(UU, dtype=np.float64)
+    VV = np.asarray(VV, dtype=np.float64)
+    n = len(UU)
+    if weights is None:
+        wgts = np.ones(n)
+    else:
+        wgts = np.asarray(weights, dtype=np.float64)
+    assert len(VV) == n and len(wgts) == n
+    u_order = np.argsort(UU, kind='mergesort')
+    # dense ranks of VV in [1, n_unique] index the fenwick tree
+    v_rank = np.unique(VV, return_inverse=True)[1].ravel() + 1
+    dominated = jit_fenwick_dominated(UU[u_order], v_rank[u_order],
+                                      wgts[u_order])
+    z = np.zeros(n)
+    z[u_order] = (1. / (np.sum(wgts) - wgts[u_order])) * dominated
+    if weights is None:
+        x2 = np.sort(z)
+        f2 = np.linspace(0.0, 1.0, n)
+    else:
+        z_order = np.argsort(z, kind='mergesort')
+        x2 = z[z_order]
+        cum_wgts = np.cumsum(wgts[z_order])
+        f2 = (cum_wgts - cum_wgts[0]) / (cum_wgts[-1] - cum_wgts[0])
+    return x2, f2
+
+
+@jit(nopython=True)
+def jit_fenwick_dominated(u_sorted, v_rank, wgts):
+    """!
+    @brief Sum of weights of the samples strictly below each sample in
+    both coordinates.
+    @param u_sorted <b>np_1darray</b> first coordinate sorted ascending
+    @param v_rank <b>np_1darray</b> integer ranks (1 based) of the second
+        coordinate, ordered consistently with u_sorted
+    @param wgts <b>np_1darray</b> sample weights ordered consistently with u_sorted
+    @return <b>np_1darray</b> dominated weight of each sample
+    """
+    n = len(u_sorted)
+    n_rank = 0
+    for i in range(n):
+        if v_rank[i] > n_rank:
+            n_rank = v_rank[i]
+    tree = np.zeros(n_rank + 1)
+    dominated = np.zeros(n)
+    i = 0
+    while i < n:
+        # samples tied in u can not dominate each other: query the
+        # whole tie group before any member is inserted into the tree
+        j = i
+        while j < n and u_sorted[j] == u_sorted[i]:
+            k = v_rank[j] - 1
+            result = 0.
+            while k > 0:
+                result += tree[k]
+                k -= k & (-k)
+            dominated[j] = result
+            j += 1
+        for m in range(i, j):
+            k = v_rank[m]
+            while k <= n_rank:
+                tree[k] += wgts[m]
+                k += k & (-k)
+        i = j
+    return dominated
+
+
+def kde_cdf(x, bw=None, n_exact=4000, n_grid=None, weights=None):
+    """!
+    @brief Evaluates the CDF of a gaussian kernel density estimate
+    at every sample point in one pass.  Equivalent to calling
+    scipy.stats.gaussian_kde(x).integrate_box_1d(-np.inf, xp)
+    for each xp in x.
+    For small data sets the gaussian kernel CDF sum is evaluated directly
+    in chunks.  For large data sets the samples are linearly binned
+    onto a regular grid, the binned counts are convolved with the
+    kernel CDF by FFT and the result is interpolated back to the samples,
+    which is O(n + m log m) for a grid with m points.
+    @param x <b>np_1darray</b> samples
+    @param bw <b>float</b> (optional) kernel bandwidth. Defaults to
+        Scott's rule, the scipy.stats.gaussian_kde default.
+    @param n_exact <b>int</b> max number of samples for direct evaluation
+    @param n_grid <b>int</b> (optional) number of grid points used by the
+        binned approximation.
+    @param weights <b>np_1darray</b> (optional) sample weights
+    @return <b>np_1darray</b> KDE CDF evaluated at x
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if weights is None:
+        wgts = np.ones(n) / n
+    else:
+        wgts = np.asarray(weights, dtype=np.float64)
+        wgts = wgts / np.sum(wgts)
+    if bw is None:
+        # effective sample size of weighted samples
+        n_eff = 1. / np.sum(wgts ** 2)
+        bw = np.sqrt(np.cov(x, aweights=wgts)) * n_eff ** (-1. / 5.)
+    if n <= n_exact:
+        cdf = np.zeros(n)
+        chunk = max(1, int(4e6 // n))
+        for i in range(0, n, chunk):
+            cdf[i:i + chunk] = \
+                np.dot(ndtr((x[i:i + chunk, None] - x[None, :]) / bw), wgts)
+        return cdf
+    # regular grid spanning the data with a pad of 6 bandwidths
+    x_min, x_max = np.min(x) - 6. * bw, np.max(x) + 6. * bw
+    if n_grid is None:
+        # grid spacing of at most 1/16 bandwidth
+        n_grid = int(2 ** np.ceil(np.log2(16. * (x_max - x_min) / bw)))
+        n_grid = min(max(n_grid, 2 ** 10), 2 ** 20)
+    grid, dx = np.linspace(x_min, x_max, n_grid, retstep=True)
+    # linear binning
+    pos = (x - x_min) / dx
+    idx = np.clip(np.floor(pos).astype(np.int64), 0, n_grid - 2)
+    frac = pos - idx
+    counts = np.bincount(idx, weights=wgts * (1. - frac), minlength=n_grid) + \
+        np.bincount(idx + 1, weights=wgts * frac, minlength=n_grid)
+    # kernel cdf at all grid offsets in (-n_grid, n_grid)
+    kern = ndtr(np.arange(-(n_grid - 1), n_grid) * dx / bw)
+    grid_cdf = fftconvolve(counts, kern)[n_grid - 1: 2 * n_grid - 1]
+    return np.clip(np.interp(x, grid, grid_cdf), 0., 1.)
+
+
+def weighted_rankdata(x, weights=None):
+    """!
+    @brief Weighted rank transform.  Each sample is assigned the
+    weight of all samples below it plus half the weight of its ties,
+    normalized to (0, 1).  Reduces to rankdata(x) / (len(x) + 1) for
+    equally weighted samples.
+    @param x <b>np_1darray</b> samples
+    @param weights <b>np_1darray</b> (optional) sample weights
+    @return <b>np_1darray</b> weighted ranks in (0, 1)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if weights is None:
+        return rankdata(x) / (n + 1)
+    # normalize weights to unit average
+    wgts = np.asarray(weights, dtype=np.float64)
+    wgts = wgts / np.average(wgts)
+    x_order = np.argsort(x, kind='mergesort')
+    x_sorted = x[x_order]
+    cum_wgts = np.concatenate(([0.], np.cumsum(wgts[x_order])))
+    # weight below and weight up to and including each tie group
+    w_lo = cum_wgts[np.searchsorted(x_sorted, x, side='left')]
+    w_hi = cum_wgts[np.searchsorted(x_sorted, x, side='right')]
+    return (0.5 * (w_lo + w_hi) + 0.5) / (n + 1)
+
+
+def weighted_kendalltau(x, y, weights=None):
+    """!
+    @brief Weighted Kendall's tau-b in O(n log n).  Each pair of samples
+    contributes to the concordance sums with the product of the
+    sample weights.  Discordant pairs are counted by a weighted
+    merge sort (Knight's algorithm).  Reduces to scipy.stats.kendalltau
+    for equally weighted samples.
+    The p-value is computed from the asymptotic normal distribution of
+    tau under independence using the effective sample size
+    \f$ n_{eff} = (\sum w)^2 / \sum w^2 \f$.
+    @param x <b>np_1darray</b> samples
+    @param y <b>np_1darray</b> samples
+    @param weights <b>np_1darray</b> (optional) sample weights
+    @return (tau, p-value) tuple of <b>float</b>
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if weights is None:
+        wgts = np.ones(len(x))
+    else:
+        wgts = np.asarray(weights, dtype=np.float64)
+    s_sum, t_0, t_x, t_y = kendall_sums(x, y, wgts)
+    tau = s_sum / np.sqrt((t_0 - t_x) * (t_0 - t_y))
+    n_eff = np.sum(wgts) ** 2. / np.sum(wgts ** 2.)
+    return tau, kendall_pval(tau, n_eff)
+
+
+def kendall_pval(tau, n_eff):
+    """!
+    @brief Two sided p-value of kendall's tau under independence, normal
+    approximation.
+    @param tau <b>float</b> kendall's tau
+    @param n_eff <b>float</b> (effective) number of samples
+    """
+    tau_sd = np.sqrt(2. * (2. * n_eff + 5.) / (9. * n_eff * (n_eff - 1.)))
+    return 2. * norm.sf(np.abs(tau) / tau_sd)
+
+
+def kendall_sums(x, y, wgts):
+    """!
+    @brief Weighted pair sums which define kendall's tau-b.
+    @param x <b>np_1darray</b> samples
+    @param y <b>np_1darray</b> samples
+    @param wgts <b>np_1darray</b> sample weights
+    @return (S, T0, Tx, Ty) tuple of <b>float</b>.  S is the weighted
+        number of concordant minus discordant pairs, T0 is the weighted number
+        of pairs and Tx, Ty are the weighted number of pairs tied in x and y.
+    """
+    xy_order = np.lexsort((y, x))
+    xs, ys, ws = x[xy_order], y[xy_order], wgts[xy_order]
+    w_tot = np.sum(ws)
+    t_0 = 0.5 * (w_tot ** 2. - np.sum(ws ** 2.))
+    t_x = _tie_sum(xs, ws)
+    t_xy = jit_joint_tie_sum(xs, ys, ws)
+    discordant, ys_sorted, ws_sorted = jit_merge_discordant(ys, ws)
+    t_y = _tie_sum(ys_sorted, ws_sorted)
+    s_sum = t_0 - t_x - t_y + t_xy - 2. * discordant
+    return s_sum, t_0, t_x, t_y
+
+
+def kendalltau_matrix(X, weights=None):
+    """!
+    @brief Matrix of pairwise (weighted) Kendall's tau-b between the columns of X.
+    Each column is sorted and reduced to integer dense ranks and a tie sum
+    once.  The remaining per pair work, a merge sort discordance count of
+    one column in the sort order of the other, runs in a parallel JIT kernel.
+    Total cost is O(d^2 n log n).
+    @param X <b>np_2darray</b> (n, d) samples
+    @param weights <b>np_1darray</b> (optional) sample weights
+    @return <b>np_2darray</b> (d, d) symmetric kendall's tau matrix
+    """
+    X = np.asarray(X)
+    n, d = X.shape
+    if weights is None:
+        wgts = np.ones(n)
+    else:
+        wgts = np.asarray(weights, dtype=np.float64)
+    dense_ranks = np.empty((n, d), dtype=np.float64)
+    col_orders = np.empty((n, d), dtype=np.int64)
+    t_ties = np.empty(d)
+    for i in range(d):
+        col_vals, col_ranks = np.unique(X[:, i], return_inverse=True)
+        dense_ranks[:, i] = col_ranks
+        col_orders[:, i] = np.argsort(col_ranks, kind='mergesort')
+        t_ties[i] = _tie_sum(dense_ranks[col_orders[:, i], i], wgts[col_orders[:, i]])
+    w_tot = np.sum(wgts)
+    t_0 = 0.5 * (w_tot ** 2. - np.sum(wgts ** 2.))
+    return jit_kendalltau_matrix(dense_ranks, col_orders, wgts, t_ties, t_0)
+
+
+@jit(nopython=True, parallel=True)
+def jit_kendalltau_matrix(dense_ranks, col_orders, wgts, t_ties, t_0):
+    """!
+    @brief Pairwise kendall's tau-b of dense ranked columns.
+    See kendalltau_matrix()
+    """
+    n, d = dense_ranks.shape
+    tau = np.eye(d)
+    for i in prange(d):
+        x_order = col_orders[:, i]
+        xs = dense_ranks[x_order, i]
+        for j in range(i + 1, d):
+            ys = dense_ranks[x_order, j]
+            ws = wgts[x_order]
+            # sort by y within groups of tied x
+            lo = 0
+            while lo < n:
+                hi = lo + 1
+                while hi < n and xs[hi] == xs[lo]:
+                    hi += 1
+                if hi - lo > 1:
+                    sub_order = np.argsort(ys[lo:hi], kind='mergesort')
+                    ys[lo:hi] = ys[lo:hi][sub_order]
+                    ws[lo:hi] = ws[lo:hi][sub_order]
+                lo = hi
+            t_xy = jit_joint_tie_sum(xs, ys, ws)
+            discordant, ys_sorted, ws_sorted = jit_merge_discordant(ys, ws)
+            s_sum = t_0 - t_ties[i] - t_ties[j] + t_xy - 2. * discordant
+            tau[i, j] = s_sum / np.sqrt((t_0 - t_ties[i]) * (t_0 - t_ties[j]))
+            tau[j, i] = tau[i, j]
+    return tau
+
+
+def _tie_sum(xs, ws):
+    """!
+    @brief Weighted number of tied pairs in sorted samples.
+    """
+    if len(xs) == 0:
+        return 0.
+    group_start = np.concatenate(([True], xs[1:] != xs[:-1]))
+    group_w = np.add.reduceat(ws, np.flatnonzero(group_start))
+    group_w2 = np.add.reduceat(ws ** 2., np.flatnonzero(group_start))
+    return 0.5 * np.sum(group_w ** 2. - group_w2)
+
+
+@jit(nopython=True)
+def jit_joint_tie_sum(xs, ys, ws):
+    """!
+    @brief Weighted number of pairs tied in both x and y.
+    Samples must be sorted lexicographically by (x, y).
+    """
+    t_xy = 0.
+    i = 0
+    n = len(xs)
+    while i < n:
+        j = i
+        g_w, g_w2 = 0., 0.
+        while j < n and xs[j] == xs[i] and ys[j] == ys[i]:
+            g_w += ws[j]
+            g_w2 += ws[j] * ws[j]
+            j += 1
+        t_xy += 0.5 * (g_w * g_w - g_w2)
+        i = j
+    return t_xy
+
+
+@jit(nopython=True)
+def jit_merge_discordant(ys, ws):
+    """!
+    @brief Bottom up weighted merge sort of ys.  Every time a sample from the
+    right block is merged ahead of the remaining samples of the left block
+    the pairs are discordant.
+    @param ys <b>np_1darray</b> y samples sorted lexicographically by (x, y)
+    @param ws <b>np_1darray</b> sample weights
+    @return (weighted discordant pair count, sorted ys, permuted ws)
+    """
+    n = len(ys)
+    src_y, src_w = ys.copy(), ws.copy()
+    dst_y, dst_w = np.empty(n), np.empty(n)
+    discordant = 0.
+    width = 1
+    while width < n:
+        for lo in range(0, n, 2 * width):
+            mid = min(lo + width, n)
+            hi = min(lo + 2 * width, n)
+            left_w = 0.
+            for m in range(lo, mid):
+                left_w += src_w[m]
+            i, j, k = lo, mid, lo
+            while i < mid and j < hi:
+                if src_y[i] <= src_y[j]:
+                    dst_y[k], dst_w[k] = src_y[i], src_w[i]
+                    left_w -= src_w[i]
+                    i += 1
+                else:
+                    dst_y[k], dst_w[k] = src_y[j], src_w[j]
+                    discordant += src_w[j] * left_w
+                    j += 1
+                k += 1
+            while i < mid:
+                dst_y[k], dst_w[k] = src_y[i], src_w[i]
+                i += 1
+                k += 1
+            while j < hi:
+                dst_y[k], dst_w[k] = src_y[j], src_w[j]
+                j += 1
+                k += 1
+        src_y, dst_y = dst_y, src_y
+        src_w, dst_w = dst_w, src_w
+        width *= 2
+    return discordant, src_y, src_w
+
+
+@jit(nopython=True)
+def jit_cross_kendall(xo, yo_rank, wo, xn, yn_rank, wn, n_rank):
+    """!
+    @brief Kendall's tau pair sums over all pairs with one sample from an old
+    and one sample from a new data set.  Sweeps the new samples in order of
+    increasing x while old samples with smaller (or equal) x are added to a
+    fenwick tree indexed by y rank.
+    @param xo <b>np_1darray</b> old x samples sorted ascending
+    @param yo_rank <b>np_1darray</b> integer y ranks (1 based) of the old samples
+    @param wo <b>np_1darray</b> old sample weights
+    @param xn <b>np_1darray</b> new x samples sorted ascending
+    @param yn_rank <b>np_1darray</b> integer y ranks (1 based) of the new samples
+    @param wn <b>np_1darray</b> new sample weights
+    @param n_rank <b>int</b> max y rank
+    @return (S, Tx, Ty) weighted concordant minus discordant pairs, pairs
+        tied in x and pairs tied in y
+    """
+    n_old, n_new = len(xo), len(xn)
+    # total old weight with y rank <= r
+    cum_y = np.zeros(n_rank + 1)
+    for i in range(n_old):
+        cum_y[yo_rank[i]] += wo[i]
+    for r in range(1, n_rank + 1):
+        cum_y[r] += cum_y[r - 1]
+    # fenwick trees of old samples with x < xn[k] and x <= xn[k]
+    tree_lt = np.zeros(n_rank + 1)
+    tree_le = np.zeros(n_rank + 1)
+    s_sum, t_x, t_y = 0., 0., 0.
+    p_lt, p_le = 0, 0
+    w_lt, w_le = 0., 0.
+    for k in range(n_new):
+        r = yn_rank[k]
+        while p_lt < n_old and xo[p_lt] < xn[k]:
+            j = yo_rank[p_lt]
+            while j <= n_rank:
+                tree_lt[j] += wo[p_lt]
+                j += j & (-j)
+            w_lt += wo[p_lt]
+            p_lt += 1
+        while p_le < n_old and xo[p_le] <= xn[k]:
+            j = yo_rank[p_le]
+            while j <= n_rank:
+                tree_le[j] += wo[p_le]
+                j += j & (-j)
+            w_le += wo[p_le]
+            p_le += 1
+        lt_below, lt_le, le_below, le_le = 0., 0., 0., 0.
+        j = r - 1
+        while j > 0:
+            lt_below += tree_lt[j]
+            le_below += tree_le[j]
+            j -= j & (-j)
+        j = r
+        while j > 0:
+            lt_le += tree_lt[j]
+            le_le += tree_le[j]
+            j -= j & (-j)
+        lt_above = w_lt - lt_le
+        le_above = w_le - le_le
+        gt_below = cum_y[r - 1] - le_below
+        gt_above = (cum_y[n_rank] - cum_y[r]) - le_above
+        s_sum += wn[k] * (lt_below + gt_above - lt_above - gt_below)
+        t_x += wn[k] * (w_le - w_lt)
+        t_y += wn[k] * (cum_y[r] - cum_y[r - 1])
+    return s_sum, t_x, t_y
@@ -0,0 +1,148 @@
+##
+# \brief Content addressed cache of copula tournament results.
+from __future__ import print_function, absolute_import, division
+import os
+import hashlib
+import pickle
+from collections import OrderedDict
+import numpy as np
+from six import iteritems
+
+
+class TournamentCache(object):
+    """!
+    @brief Stores copula tournament results keyed by a hash of the
+    ranked data, the data weights, the trial copula family, the selection
+    criterion and the fit settings.  Identical pair data is never refit.
+
+    Results are kept in memory with least recently used eviction.
+    If a cache directory is supplied, results are also written to disk
+    so that they persist between runs.  The on-disk cache is capped in
+    size and the least recently used files are deleted first.
+    """
+    def __init__(self, maxEntries=256, cacheDir=None, maxBytes=None):
+        """!
+        @param maxEntries <b>int</b> max number of in-memory results
+        @param cacheDir <b>str</b> (optional) on-disk cache directory
+        @param maxBytes <b>int</b> (optional) on-disk cache size cap
+        """
+        self.maxEntries = maxEntries
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        self._mem = OrderedDict()
+        self.hits, self.misses = 0, 0
+        if self.cacheDir is not None and not os.path.exists(self.cacheDir):
+            os.makedirs(self.cacheDir)
+
+    @staticmethod
+    def key(UU, VV, weights=None, family={}, criterion='AIC', settings={}):
+        """!
+        @brief Content hash of a copula tournament.
+        @param UU <b>np_1darray</b> ranked data
+        @param VV <b>np_1darray</b> ranked data
+        @param weights <b>np_1darray</b> (optional) data weights
+        @param family <b>dict</b> trial copula family
+        @param criterion <b>str</b> copula selection criterion
+        @param settings <b>dict</b> any other settings which alter the result
+        @return <b>str</b> hex digest
+        """
+        h = hashlib.sha1()
+        for arr in (UU, VV, weights):
+            if arr is None:
+                h.update(b"none")
+            else:
+                h.update(np.ascontiguousarray(arr, dtype=np.float64).tobytes())
+            h.update(b"|")
+        h.update(repr(sorted(iteritems(family))).encode())
+        h.update(repr(criterion).encode())
+        h.update(repr(sorted(iteritems(settings))).encode())
+        return h.hexdigest()
+
+    def get(self, key):
+        """!
+        @brief Get a cached tournament result.
+        @param key <b>str</b> content hash from key()
+        @return cached entry or None
+        """
+        if key in self._mem:
+            self._mem.move_to_end(key)
+            self.hits += 1
+            return self._mem[key]
+        if self.cacheDir is not None:
+            fname = self._fname(key)
+            if os.path.exists(fname):
+                try:
+                    with open(fname, 'rb') as f:
+                        entry = pickle.load(f)
+                except Exception:
+                    entry = None
+                if entry is not None:
+                    # mark as recently used
+                    os.utime(fname, None)
+                    self._putMem(key, entry)
+                    self.hits += 1
+                    return entry
+        self.misses += 1
+        return None
+
+    def put(self, key, entry):
+        """!
+        @brief Store a tournament result.
+        @param key <b>str</b> content hash from key()
+        @param entry  picklable tournament result
+        """
+        self._putMem(key, entry)
+        if self.cacheDir is not None:
+            fname = self._fname(key)
+            with open(fname + ".tmp", 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(fname + ".tmp", fname)
+            self._evictDisk()
+
+    def clear(self):
+        """!
+        @brief Remove all cached results, in memory and on disk.
+        """
+        self._mem.clear()
+        if self.cacheDir is not None:
+            for fname, _, _ in self._diskEntries():
+                os.remove(fname)
+
+    def __contains__(self, key):
+        return key in self._mem or \
+            (self.cacheDir is not None and os.path.exists(self._fname(key)))
+
+    def __len__(self):
+        return len(self._mem)
+
+    def _putMem(self, key, entry):
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.maxEntries:
+            self._mem.popitem(last=False)
+
+    def _fname(self, key):
+        return os.path.join(self.cacheDir, key + ".pkl")
+
+    def _diskEntries(self):
+        """!
+        @brief List of (filename, size, mtime) of the on-disk cache.
+        """
+        entries = []
+        for fname in os.listdir(self.cacheDir):
+            if fname.endswith(".pkl"):
+                fpath = os.path.join(self.cacheDir, fname)
+                stat = os.stat(fpath)
+                entries.append((fpath, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evictDisk(self):
+        if self.maxBytes is None:
+            return
+        entries = sorted(self._diskEntries(), key=lambda e: e[2])
+        total = sum(e[1] for e in entries)
+        # always keep the most recent entry
+        while total > self.maxBytes and len(entries) > 1:
+            fpath, size, _ = entries.pop(0)
+            os.remove(fpath)
+            total -= size
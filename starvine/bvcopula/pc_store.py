@@ -0,0 +1,164 @@
+##
+# \brief Shared column store for pair copula data.
+from __future__ import print_function, absolute_import, division
+import os
+import numpy as np
+from pandas import DataFrame
+from scipy.stats.mstats import rankdata
+# STARVINE IMPORTS
+from starvine.bvcopula.pc_base import PairCopula, kde_cdf, weighted_rankdata
+from starvine.bvcopula.pc_workers import shareDirectory, unshare
+
+
+class ColumnStore(object):
+    """!
+    @brief Holds a multivariate data set in a single column-major
+    (Fortran ordered) buffer along with a matching buffer of ranked data.
+    Every column is ranked once.  Pair copulas built from the store
+    hold zero-copy views into these buffers so the memory used by each
+    pair copula does not grow with the number of samples.
+
+    The ranked data may optionally be stored in single precision.
+    Ranks are upcast to double precision only transiently, during copula
+    fitting.
+    """
+    def __init__(self, data, weights=None, labels=None, rankDtype=np.float64, **kwargs):
+        """!
+        @param data <b>DataFrame</b> or <b>np_2darray</b> (n, d) data set.
+            If data is a Fortran ordered float64 array it is not copied.
+        @param weights <b>np_1darray</b> (optional) data weights
+        @param labels <b>list</b> (optional) column labels.
+            Taken from the DataFrame columns by default.
+        @param rankDtype <b>np.dtype</b> storage type of the ranked data.
+            np.float32 halves the memory of the rank buffer.
+        @param rankMethod <b>int</b> (optional) rank transform method.
+            See PairCopula.rank()
+        @param weightedRank <b>bool</b> (optional) use the data weights
+            in the rank transform.  Default is False.
+        """
+        if isinstance(data, DataFrame):
+            labels = list(data.columns) if labels is None else labels
+            data = data.values
+        self.values = np.asfortranarray(data, dtype=np.float64)
+        assert len(self.values.shape) == 2
+        self.labels = list(range(self.values.shape[1])) if labels is None else list(labels)
+        assert len(self.labels) == self.values.shape[1]
+        self._index = dict((label, i) for i, label in enumerate(self.labels))
+        self.weights = None
+        if weights is not None:
+            self.weights = np.asarray(weights, dtype=np.float64)
+            self.weights = self.weights / np.average(self.weights)
+        self.rankDtype = np.dtype(rankDtype)
+        self.rankMethod = kwargs.pop("rankMethod", 0)
+        self.weightedRank = kwargs.pop("weightedRank", False)
+        self._ranks = None
+
+    @classmethod
+    def attach(cls, ref):
+        """!
+        @brief Open a store previously published with ColumnStore.share().
+        The data and rank buffers are read-only memory maps of the shared
+        files, no data is copied.
+        @param ref <b>dict</b> reference returned by ColumnStore.share()
+        @return <b>ColumnStore</b>
+        """
+        store = cls.__new__(cls)
+        store.values = np.load(os.path.join(ref["dir"], "values.npy"), mmap_mode='r')
+        store._ranks = np.load(os.path.join(ref["dir"], "ranks.npy"), mmap_mode='r')
+        store.weights = None
+        if ref["weights"]:
+            store.weights = np.load(os.path.join(ref["dir"], "weights.npy"), mmap_mode='r')
+        store.labels = list(ref["labels"])
+        store._index = dict((label, i) for i, label in enumerate(store.labels))
+        store.rankDtype = store._ranks.dtype
+        store.rankMethod = ref["rankMethod"]
+        store.weightedRank = ref["weightedRank"]
+        return store
+
+    def share(self, shareDir=None):
+        """!
+        @brief Publish the data, rank and weight buffers to files so other
+        processes can map them with ColumnStore.attach().  The files are
+        written under /dev/shm when available so the buffers stay in
+        shared memory.
+        @param shareDir <b>str</b> (optional) parent directory of the files
+        @return <b>dict</b> picklable reference to the shared store.
+            Release with ColumnStore.unshare(ref).
+        """
+        outDir = shareDirectory(shareDir)
+        np.save(os.path.join(outDir, "values.npy"), self.values)
+        np.save(os.path.join(outDir, "ranks.npy"), self.ranks)
+        if self.weights is not None:
+            np.save(os.path.join(outDir, "weights.npy"), self.weights)
+        return {"dir": outDir, "labels": list(self.labels),
+                "weights": self.weights is not None,
+                "rankMethod": self.rankMethod,
+                "weightedRank": self.weightedRank}
+
+    @staticmethod
+    def unshare(ref):
+        """! @brief Remove the files of a shared store. """
+        unshare(ref)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def ranks(self):
+        """!
+        @brief Column-major buffer of ranked data.  Computed on first access.
+        """
+        if self._ranks is None:
+            n, d = self.values.shape
+            wgts = self.weights if self.weightedRank else None
+            self._ranks = np.empty((n, d), dtype=self.rankDtype, order='F')
+            for i in range(d):
+                if self.rankMethod != 0:
+                    self._ranks[:, i] = kde_cdf(self.values[:, i], weights=wgts)
+                elif wgts is not None:
+                    self._ranks[:, i] = weighted_rankdata(self.values[:, i], wgts)
+                else:
+                    self._ranks[:, i] = rankdata(self.values[:, i]) / (n + 1)
+        return self._ranks
+
+    @property
+    def nbytes(self):
+        """! @brief Total memory held by the store buffers. """
+        nbytes = self.values.nbytes
+        if self._ranks is not None:
+            nbytes += self._ranks.nbytes
+        if self.weights is not None:
+            nbytes += self.weights.nbytes
+        return nbytes
+
+    def column(self, label):
+        """! @brief Zero-copy view of a data column. """
+        return self.values[:, self._index[label]]
+
+    def rankColumn(self, label):
+        """! @brief Zero-copy view of a ranked data column. """
+        return self.ranks[:, self._index[label]]
+
+    def frame(self):
+        """!
+        @brief DataFrame view of the data buffer.
+        @return <b>DataFrame</b> sharing memory with the store.
+        """
+        return DataFrame(self.values, columns=self.labels, copy=False)
+
+    def pairCopula(self, label0, label1, **kwargs):
+        """!
+        @brief Build a pair copula from two columns of the store.
+        The pair copula data and ranks are views into the store.
+        @param label0 first column label
+        @param label1 second column label
+        @param kwargs passed to PairCopula
+        @return <b>PairCopula</b>
+        """
+        return PairCopula(self.column(label0), self.column(label1),
+                          weights=self.weights,
+                          ranks=(self.rankColumn(label0), self.rankColumn(label1)),
+                          rankMethod=self.rankMethod,
+                          weightedRank=self.weightedRank,
+                          **kwargs)
@@ -0,0 +1,97 @@
+##
+# \brief Executors and shared data buffers for parallel work units.
+#
+# Parallel work in starvine (edge fits of a vine tree, trial copula fits of a
+# tournament, bootstrap batches of the goodness of fit tests) is submitted to
+# any concurrent.futures style executor: an object with a
+# map(fn, *iterables) method such as a ThreadPoolExecutor, a
+# ProcessPoolExecutor or the executor of a cluster scheduler.  Work
+# units only receive small picklable references to the data, which is
+# published once per call to memory mapped files.
+from __future__ import print_function, absolute_import, division
+import os
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+from six import iteritems
+
+
+@contextmanager
+def workerPool(executor=None, nWorkers=None):
+    """!
+    @brief Executor for parallel work units.
+    Yields the given executor, else a process pool of nWorkers processes
+    which is shut down on exit, else None (run sequentially).  Workers of
+    the default process pool are spawned rather than forked: the numba
+    parallel threading layers are not fork safe.
+    @param executor (optional) concurrent.futures style executor
+    @param nWorkers <b>int</b> (optional) number of worker processes,
+        capped at the number of CPUs
+    """
+    if nWorkers is not None:
+        nWorkers = min(nWorkers, multiprocessing.cpu_count())
+    if executor is not None:
+        yield executor
+    elif nWorkers is not None and nWorkers > 1:
+        with ProcessPoolExecutor(max_workers=nWorkers,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            yield pool
+    else:
+        yield None
+
+
+def shareDirectory(shareDir=None):
+    """!
+    @brief New directory for shared data files.  Created under /dev/shm
+    when available, so the files stay in shared memory.  Workers on other
+    hosts need a shareDir on a file system they mount.
+    @param shareDir <b>str</b> (optional) parent directory
+    @return <b>str</b> directory path
+    """
+    if shareDir is None and os.path.isdir("/dev/shm"):
+        shareDir = "/dev/shm"
+    return tempfile.mkdtemp(prefix="starvine_", dir=shareDir)
+
+
+def shareArrays(arrays, shareDir=None):
+    """!
+    @brief Publish arrays to files so other processes can map them with
+    attachArrays().
+    @param arrays <b>dict</b> {name: np_ndarray}.  None values are skipped.
+    @param shareDir <b>str</b> (optional) parent directory of the files.
+        See shareDirectory()
+    @return <b>dict</b> picklable reference.  Release with unshare(ref).
+    """
+    outDir = shareDirectory(shareDir)
+    names = []
+    for name, arr in iteritems(arrays):
+        if arr is not None:
+            np.save(os.path.join(outDir, name + ".npy"), arr)
+            names.append(name)
+    return {"dir": outDir, "arrays": names}
+
+
+def attachArrays(ref):
+    """!
+    @brief Map arrays published with shareArrays().  No data is copied.
+    @param ref <b>dict</b> reference returned by shareArrays()
+    @return <b>dict</b> {name: read-only np.memmap}
+    """
+    return dict((name, np.load(os.path.join(ref["dir"], name + ".npy"), mmap_mode='r'))
+                for name in ref["arrays"])
+
+
+def unshare(ref):
+    """! @brief Remove the files of shared data. """
+    shutil.rmtree(ref["dir"], ignore_errors=True)
+
+
+def batchSizes(n, batchSize):
+    """!
+    @brief Split n work items into batches.
+    @return <b>list</b> of batch sizes
+    """
+    return [min(batchSize, n - i) for i in range(0, n, batchSize)]
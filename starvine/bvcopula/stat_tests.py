@@ -2,10 +2,8 @@
 #-*- coding: utf-8 -*-
 from __future__ import print_function, absolute_import, division
 import numpy as np
-from numpy import random
 #
 from functools import partial
-from multiprocessing import Pool
 #
 from scipy.spatial.distance import pdist, cdist
 from scipy.stats import kstwobign, pearsonr
@@ -14,10 +12,12 @@ from scipy.interpolate import interp1d
 from numba import jit
 # starvine imports
 from starvine.bvcopula.pc_base import PairCopula
+from starvine.bvcopula.pc_workers import workerPool, shareArrays, attachArrays, \
+    unshare, batchSizes
 
 
 def gauss_copula_test(x1, y1, wgts=None, nboot=8000, dist='ks',
-                      alpha=0.05, procs=4, resample=8):
+                      alpha=0.05, procs=4, resample=8, executor=None, batchSize=500):
     """!
     @brief Tests if a gaussian copula is a good description of the
     dep structure of a bivaraiate data set.
@@ -26,9 +26,15 @@ def gauss_copula_test(x1, y1, wgts=None, nboot=8000, dist='ks',
     @param wgts  ndarray, shape (n1, )
     @param dist_metric  str.  in ('ad', 'ks'):
         'ad' for Anderson-Darling, 'ks' for Kolmogorov
-    @param procs int. number of processes to use. Default=4
+    @param procs int. number of processes to use if no executor is
+        given. Default=4
     @param resample int. Boostrap sample size. Only used if wgts are suppled.
     @param alpha float. test significance level.  Default=0.05
+    @param executor (optional) concurrent.futures style executor which
+        runs the bootstrap batches.
+    @param batchSize int. number of bootstrap samples per batch.  Each
+        batch draws from its own random stream seeded from np.random, so
+        the result does not depend on the executor.
     @return (p_val, d_0, h_dict)
         p_val float.  p-value of test
         d_0 float.    Distance metric
@@ -64,21 +70,16 @@ def gauss_copula_test(x1, y1, wgts=None, nboot=8000, dist='ks',
     print("KS-Gauss Dist= %f)" % d_0)
 
     # estimate p-value by boostrap resampling
-    d = np.zeros(nboot)
-    if procs > 1:
-        pool = Pool(procs)
-        d = pool.map(partial(sample_d,
-                             cov_hat=cov_hat,
-                             cov_hat_inv=cov_hat_inv,
-                             dist=dist,
-                             N=len(x1)
-                            ),
-                     list(range(nboot)))
-        d = np.array(d)
-        pool.close()
-    else:
-        for i in range(nboot):
-            d[i] = sample_d(i, cov_hat, cov_hat_inv, dist, len(x1))
+    sizes = batchSizes(nboot, batchSize)
+    seeds = np.random.randint(0, 2 ** 31 - 1, size=len(sizes))
+    with workerPool(executor, procs) as pool:
+        mapper = map if pool is None else pool.map
+        d = np.concatenate(list(mapper(partial(sample_d_batch,
+                                               cov_hat=cov_hat,
+                                               cov_hat_inv=cov_hat_inv,
+                                               dist=dist,
+                                               N=len(x1)),
+                                       seeds, sizes)))
     print("KS-Gauss Empirical Dist Range= (%f, %f))" % (np.min(d), np.max(d)))
 
     # compute p-val
@@ -96,6 +97,20 @@ def sample_d(i, cov_hat, cov_hat_inv, dist, N):
     return d
 
 
+def sample_d_batch(seed, size, cov_hat, cov_hat_inv, dist, N):
+    """!
+    @brief Batch of bootstrap distances, see gauss_copula_test()
+    @param seed int. seed of the batch's random stream
+    @param size int. number of bootstrap samples
+    """
+    rs = np.random.RandomState(seed)
+    d = np.zeros(size)
+    for i in range(size):
+        y_sampled = rs.multivariate_normal(mean=[0., 0.], cov=cov_hat, size=N)
+        d[i] = dist_measure(y_sampled, cov_hat_inv, dist)
+    return d
+
+
 def dist_measure(y_hat, cov_hat_inv, dist):
     # gen z^2 RV which should be distributed according to a chi-squared
     # distribution if h0 is true (Malevergne 2001)
@@ -167,13 +182,21 @@ def ecdf(x):
     return xs, ys
 
 
-def ks2d2s(x1, y1, x2, y2, nboot=None):
+def ks2d2s(x1, y1, x2, y2, nboot=None, executor=None, batchSize=100, shareDir=None):
     """!
     @brief Two-dimensional Kolmogorov-Smirnov test on two samples.
     @param x1  ndarray, shape (n1, )
     @param y1  ndarray, shape (n1, )
     @param x2 ndarray, shape (n2, )
     @param y2 ndarray, shape (n2, )
+    @param nboot int. (optional) number of bootstrap samples.  If None the
+        p-value is approximated analytically.
+    @param executor (optional) concurrent.futures style executor which
+        runs the bootstrap batches.  The pooled samples are published once
+        to memory mapped files, see starvine.bvcopula.pc_workers.shareArrays()
+    @param batchSize int. number of bootstrap samples per batch.  Each
+        batch draws from its own random stream seeded from np.random.
+    @param shareDir str. (optional) parent directory of the shared files
     @return tuple of floats (p-val, KS_stat)
         Two-tailed p-value,
         KS statistic
@@ -204,20 +227,50 @@ def ks2d2s(x1, y1, x2, y2, nboot=None):
         d = D * sqen / (1 + r * (0.25 - 0.75 / sqen))
         p = kstwobign.sf(d)
     else:
-        n = n1 + n2
         x = np.concatenate([x1, x2])
         y = np.concatenate([y1, y2])
-        d = np.empty(nboot, 'f')
-        for i in range(nboot):
-            idx = random.choice(n, n, replace=True)
-            ix1, ix2 = idx[:n1], idx[n1:]
-            #ix1 = random.choice(n, n1, replace=True)
-            #ix2 = random.choice(n, n2, replace=True)
-            d[i] = avgmaxdist(x[ix1], y[ix1], x[ix2], y[ix2])
+        sizes = batchSizes(nboot, batchSize)
+        seeds = np.random.randint(0, 2 ** 31 - 1, size=len(sizes))
+        if executor is None:
+            d = [ks2d_boot_batch(x, y, n1, seed, size) for seed, size in zip(seeds, sizes)]
+        else:
+            ref = shareArrays({"x": x, "y": y}, shareDir)
+            try:
+                d = list(executor.map(ks2d_boot_shared, [ref] * len(sizes),
+                                      [n1] * len(sizes), seeds, sizes))
+            finally:
+                unshare(ref)
+        d = np.concatenate(d)
         p = np.sum(d > D).astype('f') / nboot
     return p, D
 
 
+def ks2d_boot_batch(x, y, n1, seed, size):
+    """!
+    @brief Batch of bootstrap KS distances of the pooled samples, see ks2d2s()
+    @param x ndarray. pooled first coordinates, the first n1 from sample 1
+    @param y ndarray. pooled second coordinates
+    @param seed int. seed of the batch's random stream
+    @param size int. number of bootstrap samples
+    """
+    rs = np.random.RandomState(seed)
+    n = len(x)
+    d = np.empty(size, 'f')
+    for i in range(size):
+        idx = rs.choice(n, n, replace=True)
+        ix1, ix2 = idx[:n1], idx[n1:]
+        d[i] = avgmaxdist(x[ix1], y[ix1], x[ix2], y[ix2])
+    return d
+
+
+def ks2d_boot_shared(ref, n1, seed, size):
+    """!
+    @brief ks2d_boot_batch() on shared data.  Executed by the workers of ks2d2s()
+    """
+    data = attachArrays(ref)
+    return ks2d_boot_batch(data["x"], data["y"], n1, seed, size)
+
+
 def avgmaxdist(x1, y1, x2, y2):
     D1 = maxdist(x1, y1, x2, y2)
     D2 = maxdist(x2, y2, x1, y1)
@@ -346,9 +399,14 @@ def estat2d(x1, y1, x2, y2, **kwds):
     return estat(np.c_[x1, y1], np.c_[x2, y2], **kwds)
 
 
-def estat(x, y, nboot=1000, replace=False, method='log', fitting=False):
+def estat(x, y, nboot=1000, replace=False, method='log', fitting=False,
+          executor=None, batchSize=100, shareDir=None):
     """!
     @breif Energy distance test.
+    The bootstrap runs in batches, each with its own random stream seeded
+    from np.random.  With an executor the batches run concurrently on the
+    standardized samples, published once to memory mapped files.  See
+    ks2d2s() for executor, batchSize and shareDir.
     Aslan, B, Zech, G (2005) Statistical energy as a tool for binning-free
       multivariate goodness-of-fit tests, two-sample comparison and unfolding.
       Nuc Instr and Meth in Phys Res A 537: 626-636
@@ -360,16 +418,22 @@ def estat(x, y, nboot=1000, replace=False, method='log', fitting=False):
     n, N = len(x), len(x) + len(y)
     stack = np.vstack([x, y])
     stack = (stack - stack.mean(0)) / stack.std(0)
-    if replace:
-        rand = lambda x: random.randint(x, size=x)
-    else:
-        rand = random.permutation
 
     en = energy(stack[:n], stack[n:], method)
-    en_boot = np.zeros(nboot, 'f')
-    for i in range(nboot):
-        idx = rand(N)
-        en_boot[i] = energy(stack[idx[:n]], stack[idx[n:]], method)
+    sizes = batchSizes(nboot, batchSize)
+    seeds = np.random.randint(0, 2 ** 31 - 1, size=len(sizes))
+    if executor is None:
+        en_boot = [estat_boot_batch(stack, n, seed, size, replace, method)
+                   for seed, size in zip(seeds, sizes)]
+    else:
+        ref = shareArrays({"stack": stack}, shareDir)
+        try:
+            en_boot = list(executor.map(estat_boot_shared, [ref] * len(sizes),
+                                        [n] * len(sizes), seeds, sizes,
+                                        [replace] * len(sizes), [method] * len(sizes)))
+        finally:
+            unshare(ref)
+    en_boot = np.concatenate(en_boot)
 
     if fitting:
         param = genextreme.fit(en_boot)
@@ -380,6 +444,29 @@ def estat(x, y, nboot=1000, replace=False, method='log', fitting=False):
         return p, en, en_boot
 
 
+def estat_boot_batch(stack, n, seed, size, replace=False, method='log'):
+    """!
+    @brief Batch of bootstrap energy statistics, see estat()
+    @param stack ndarray. pooled standardized samples, the first n from x
+    @param seed int. seed of the batch's random stream
+    @param size int. number of bootstrap samples
+    """
+    rs = np.random.RandomState(seed)
+    N = len(stack)
+    en_boot = np.zeros(size, 'f')
+    for i in range(size):
+        idx = rs.randint(N, size=N) if replace else rs.permutation(N)
+        en_boot[i] = energy(stack[idx[:n]], stack[idx[n:]], method)
+    return en_boot
+
+
+def estat_boot_shared(ref, n, seed, size, replace=False, method='log'):
+    """!
+    @brief estat_boot_batch() on shared data.  Executed by the workers of estat()
+    """
+    return estat_boot_batch(attachArrays(ref)["stack"], n, seed, size, replace, method)
+
+
 def energy(x, y, method='log'):
     dx, dy, dxy = pdist(x), pdist(y), cdist(x, y)
     n, m = len(x), len(y)
@@ -0,0 +1,27 @@
+##
+# \brief Test the analytic log density derivatives of the copula
+from __future__ import print_function, division
+from starvine.bvcopula import copula_factory
+import unittest
+import numpy as np
+
+
+class TestDlogpdf(unittest.TestCase):
+    def testCentralDifference(self):
+        families = {'gauss': (0.6, -0.6), 'frank': (0.5, 5.0),
+                    'clayton': (0.5, 2.0), 'gumbel': (1.2, 2.0)}
+        u = np.linspace(0.02, 0.98, 25)
+        v = np.random.RandomState(3).permutation(u)
+        for name, thetas in families.items():
+            for rotation in range(4):
+                copula = copula_factory.Copula(name, rotation)
+                for theta in thetas:
+                    eps = 1e-6 * max(1.0, abs(theta))
+                    fd = (np.log(copula.pdf(u, v, theta + eps)) -
+                          np.log(copula.pdf(u, v, theta - eps))) / (2 * eps)
+                    msg = "%s rotation %d theta %.2f" % (name, rotation, theta)
+                    self.assertTrue(np.allclose(copula.dlogpdf(u, v, theta), fd, atol=1e-6), msg)
+
+
+if __name__ == "__main__":
+    unittest.main()
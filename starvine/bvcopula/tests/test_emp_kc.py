@@ -0,0 +1,64 @@
+##
+# \brief Test the O(n log n) empirical kendall's function
+from __future__ import print_function, division
+from starvine.bvcopula.pc_base import PairCopula, fast_empKc, jit_empKc
+import unittest
+import numpy as np
+import os
+pwd_ = os.getcwd()
+dataDir = pwd_ + "/tests/data/"
+np.random.seed(123)
+
+
+class TestFastEmpKc(unittest.TestCase):
+    def testFastEmpKcStocks(self):
+        stocks = np.loadtxt(dataDir + 'stocks.csv', delimiter=',')
+        stockModel = PairCopula(stocks[:, 0], stocks[:, 1])
+        t_ref, kc_ref = jit_empKc(stockModel.UU, stockModel.VV)
+        t_emp, kc_emp = stockModel.empKc()
+        self.assertTrue(np.array_equal(t_ref, t_emp))
+        self.assertTrue(np.array_equal(kc_ref, kc_emp))
+
+    def testFastEmpKcTies(self):
+        u = np.round(np.random.uniform(0, 1, 500), 1)
+        v = np.round(0.5 * u + np.random.uniform(0, 1, 500), 1)
+        t_ref, kc_ref = jit_empKc(u, v)
+        t_emp, kc_emp = fast_empKc(u, v)
+        self.assertTrue(np.array_equal(t_ref, t_emp))
+        self.assertTrue(np.array_equal(kc_ref, kc_emp))
+
+    def testFastEmpKcWeighted(self):
+        u = np.random.uniform(0, 1, 400)
+        v = np.random.uniform(0, 1, 400)
+        t_ref, kc_ref = jit_empKc(u, v)
+        # equal weights reproduce the unweighted result
+        t_emp, kc_emp = fast_empKc(u, v, np.ones(400) * 2.5)
+        self.assertTrue(np.allclose(t_ref, t_emp))
+        self.assertTrue(np.allclose(kc_ref, kc_emp))
+        # unequal weights: K(t) is a weighted ecdf on [0, 1]
+        wgts = np.random.uniform(0.1, 2.0, 400)
+        t_emp, kc_emp = fast_empKc(u, v, wgts)
+        self.assertTrue(np.all(np.diff(t_emp) >= 0))
+        self.assertTrue(np.all(np.diff(kc_emp) >= 0))
+        self.assertAlmostEqual(kc_emp[0], 0.0)
+        self.assertAlmostEqual(kc_emp[-1], 1.0)
+        self.assertTrue(np.all((t_emp >= 0) & (t_emp <= 1)))
+
+    def testKcMetricCache(self):
+        stocks = np.loadtxt(dataDir + 'stocks.csv', delimiter=',')
+        family = {'clayton': 0, 'clayton-90': 1, 'frank-270': 3}
+        stockModel = PairCopula(stocks[:, 0], -1 * stocks[:, 1], family=family)
+        stockModel.empKTau()
+        for name, rotation in family.items():
+            copula = stockModel.copulaBank[name]
+            fitted = stockModel.fitCopula(copula)
+            kc_reuse = stockModel.compute_kc_metric(copula, log=False,
+                                                    params=fitted[1])
+            kc_refit = stockModel.compute_kc_metric(copula, log=False)
+            self.assertAlmostEqual(kc_reuse, kc_refit, delta=1e-3)
+        # one empirical Kc per distinct data rotation
+        self.assertEqual(sorted(stockModel._kcEmpCache.keys()), [0, 1, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
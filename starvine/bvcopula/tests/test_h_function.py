@@ -0,0 +1,62 @@
+##
+# \brief Test copula h functions against the integrated copula density
+from __future__ import print_function, division
+from starvine.bvcopula import copula_factory
+from scipy.integrate import quad
+from scipy.stats import kendalltau
+import unittest
+import numpy as np
+
+
+class TestHFunction(unittest.TestCase):
+    def setUp(self):
+        # copula families and parameters of the default vine trial copula
+        self.families = {'gauss': (0.6,), 'frank': (5.0,),
+                         'clayton': (2.0,), 'gumbel': (2.0,)}
+        self.points = [(0.2, 0.3), (0.7, 0.4), (0.5, 0.9), (0.85, 0.15)]
+
+    def testHIntegratedPdf(self):
+        for name, theta in self.families.items():
+            for rotation in range(4):
+                copula = copula_factory.Copula(name, rotation)
+                for u, v in self.points:
+                    uu, vv = np.array([u]), np.array([v])
+                    # h(u, v) = F(v | u), hT(u, v) = F(u | v)
+                    h_int = quad(lambda t: copula.pdf(uu, np.array([t]), *theta)[0],
+                                 0., v, limit=200)[0]
+                    hT_int = quad(lambda t: copula.pdf(np.array([t]), vv, *theta)[0],
+                                  0., u, limit=200)[0]
+                    msg = "%s rotation %d at (%.2f, %.2f)" % (name, rotation, u, v)
+                    self.assertAlmostEqual(copula.h(uu, vv, *theta)[0], h_int, 6, msg)
+                    self.assertAlmostEqual(copula.hT(uu, vv, *theta)[0], hT_int, 6, msg)
+
+    def testHinvRoundTrip(self):
+        u = np.linspace(0.02, 0.98, 25)
+        v = np.random.RandomState(3).permutation(u)
+        for name, theta in self.families.items():
+            for rotation in range(4):
+                copula = copula_factory.Copula(name, rotation)
+                msg = "%s rotation %d" % (name, rotation)
+                w = copula.h(u, v, *theta)
+                self.assertTrue(np.allclose(copula.hinv(u, w, *theta), v, atol=1e-8), msg)
+                w = copula.hT(u, v, *theta)
+                self.assertTrue(np.allclose(copula.hinvT(w, v, *theta), u, atol=1e-8), msg)
+
+    def testGaussNegativeRho(self):
+        # negative dependence is carried by rho, the data is not flipped
+        copula = copula_factory.Copula('gauss')
+        rho = -0.6
+        for u, v in self.points:
+            uu, vv = np.array([u]), np.array([v])
+            h_int = quad(lambda t: copula.pdf(uu, np.array([t]), rho)[0], 0., v)[0]
+            self.assertAlmostEqual(copula.h(uu, vv, rho)[0], h_int, 6)
+            w = copula.h(uu, vv, rho)
+            self.assertAlmostEqual(copula.hinv(uu, w, rho)[0], v)
+        # samples have the dependence of the density
+        np.random.seed(11)
+        x, y = copula.sample(4000, rho)
+        self.assertAlmostEqual(kendalltau(x, y)[0], copula.kTau(0, rho), delta=0.04)
+
+
+if __name__ == "__main__":
+    unittest.main()
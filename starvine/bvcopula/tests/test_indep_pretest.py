@@ -0,0 +1,49 @@
+##
+# \brief Test the independence pre-test of the copula tournament
+from __future__ import print_function, division
+from starvine.bvcopula.pc_base import PairCopula
+import unittest
+import numpy as np
+np.random.seed(123)
+
+
+class TestIndepPretest(unittest.TestCase):
+    def testIndepSelected(self):
+        x, y = np.random.normal(size=(2, 800))
+        family = {'gauss': 0, 'frank': 0, 'clayton': 0}
+        model = PairCopula(x, y, family=family, indepAlpha=0.05)
+        copula, params = model.copulaTournament()
+        self.assertEqual(copula.name, 'indep')
+        self.assertEqual(len(params[1]), 0)
+        self.assertEqual(params[2], 0.0)
+        # no trial copula was fit
+        self.assertEqual(list(model.tournamentResults.keys()), ['indep'])
+        # h functions are identity operations
+        u, v = np.random.uniform(0.01, 0.99, (2, 100))
+        self.assertTrue(np.array_equal(copula.hT(u, v, *params[1]), u))
+        self.assertTrue(np.array_equal(copula.hinvT(u, v, *params[1]), u))
+        self.assertTrue(np.array_equal(copula.pdf(u, v, *params[1]), np.ones(100)))
+        # the pre-test is off by default: weakly dependent data gets a
+        # gauss copula, or the full tournament without a gauss trial copula
+        model = PairCopula(x, y, family=family)
+        self.assertFalse(model.indepTest())
+        copula, params = model.copulaTournament(verbosity=False)
+        self.assertEqual(copula.name, 'gauss')
+        self.assertEqual(list(model.tournamentResults.keys()), ['gauss'])
+        family = {'frank': 0, 'clayton': 0}
+        model = PairCopula(x, y, family=family)
+        copula, params = model.copulaTournament(verbosity=False)
+        self.assertIn(copula.name, family)
+        self.assertEqual(sorted(model.tournamentResults.keys()), sorted(family.keys()))
+
+    def testDependentData(self):
+        x = np.random.normal(size=800)
+        y = 0.6 * x + np.random.normal(size=800)
+        model = PairCopula(x, y, family={'gauss': 0, 'frank': 0}, indepAlpha=0.05)
+        self.assertFalse(model.indepTest())
+        copula, params = model.copulaTournament(verbosity=False)
+        self.assertNotEqual(copula.name, 'indep')
+
+
+if __name__ == "__main__":
+    unittest.main()
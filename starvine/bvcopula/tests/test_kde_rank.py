@@ -0,0 +1,38 @@
+##
+# \brief Test the vectorized KDE-CDF rank transform
+from __future__ import print_function, division
+from starvine.bvcopula.pc_base import PairCopula, kde_cdf
+from scipy.stats import gaussian_kde
+import unittest
+import numpy as np
+import os
+pwd_ = os.getcwd()
+dataDir = pwd_ + "/tests/data/"
+np.random.seed(123)
+
+
+class TestKdeRank(unittest.TestCase):
+    def testKdeRankStocks(self):
+        stocks = np.loadtxt(dataDir + 'stocks.csv', delimiter=',')
+        x = stocks[:, 0]
+        y = stocks[:, 1]
+        stockModel = PairCopula(x, y, rankMethod=1)
+        kde_x = gaussian_kde(x)
+        kde_y = gaussian_kde(y)
+        u_ref = np.array([kde_x.integrate_box_1d(-np.inf, xp) for xp in x])
+        v_ref = np.array([kde_y.integrate_box_1d(-np.inf, yp) for yp in y])
+        self.assertTrue(np.allclose(stockModel.UU, u_ref, atol=1e-12))
+        self.assertTrue(np.allclose(stockModel.VV, v_ref, atol=1e-12))
+
+    def testKdeRankBinned(self):
+        x = np.random.standard_t(4, size=20000)
+        u_exact = kde_cdf(x, n_exact=20000)
+        u_binned = kde_cdf(x, n_exact=100)
+        self.assertTrue(np.allclose(u_exact, u_binned, atol=1e-4))
+        # the transform preserves the sample ordering
+        x_order = np.argsort(x)
+        self.assertTrue(np.all(np.diff(u_binned[x_order]) >= 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
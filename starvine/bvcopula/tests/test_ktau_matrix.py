@@ -0,0 +1,37 @@
+##
+# \brief Test the pairwise kendall's tau matrix kernel
+from __future__ import print_function, division
+from starvine.bvcopula.pc_base import kendalltau_matrix, weighted_kendalltau
+from scipy.stats import kendalltau
+import unittest
+import numpy as np
+np.random.seed(123)
+
+
+class TestKtauMatrix(unittest.TestCase):
+    def testKtauMatrix(self):
+        X = np.random.uniform(0, 1, (800, 5))
+        X[:, 1] += X[:, 0]
+        X[:, 3] -= 0.5 * X[:, 2]
+        # heavy ties in two columns
+        X[:, [2, 4]] = np.round(X[:, [2, 4]], 1)
+        tau = kendalltau_matrix(X)
+        for i in range(5):
+            self.assertEqual(tau[i, i], 1.0)
+            for j in range(5):
+                if i != j:
+                    self.assertAlmostEqual(tau[i, j], kendalltau(X[:, i], X[:, j])[0])
+                    self.assertEqual(tau[i, j], tau[j, i])
+
+    def testWeightedKtauMatrix(self):
+        X = np.round(np.random.uniform(0, 1, (600, 4)), 2)
+        X[:, 1] += X[:, 0]
+        wgts = np.random.uniform(0.1, 2.0, 600)
+        tau = kendalltau_matrix(X, wgts)
+        for i in range(4):
+            for j in range(i + 1, 4):
+                self.assertAlmostEqual(tau[i, j], weighted_kendalltau(X[:, i], X[:, j], wgts)[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
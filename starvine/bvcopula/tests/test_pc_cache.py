@@ -0,0 +1,65 @@
+##
+# \brief Test the copula tournament result cache
+from __future__ import print_function, division
+from starvine.bvcopula.pc_base import PairCopula
+from starvine.bvcopula.pc_cache import TournamentCache
+import unittest
+import tempfile
+import shutil
+import numpy as np
+import os
+pwd_ = os.getcwd()
+dataDir = pwd_ + "/tests/data/"
+np.random.seed(123)
+
+
+class TestTournamentCache(unittest.TestCase):
+    def setUp(self):
+        self.cacheDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cacheDir)
+
+    def testCacheHit(self):
+        stocks = np.loadtxt(dataDir + 'stocks.csv', delimiter=',')
+        x, y = stocks[:, 0], stocks[:, 1]
+        family = {'gauss': 0, 'frank': 0, 'clayton': 0, 'gumbel-90': 1}
+        cache = TournamentCache(maxEntries=2, cacheDir=self.cacheDir)
+        model = PairCopula(x, y, family=family)
+        model.copulaTournament(cache=cache, verbosity=False)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertEqual(sorted(model.tournamentResults.keys()), sorted(family.keys()))
+        # same data: result restored without fitting
+        rerun = PairCopula(x, y, family=family)
+        rerun.fitCopula = None
+        rerun.copulaTournament(cache=cache, verbosity=False)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(rerun.copulaModel.name, model.copulaModel.name)
+        self.assertTrue(np.allclose(rerun.copulaParams[1], model.copulaParams[1]))
+        self.assertTrue(np.allclose(rerun.copulaModel.fittedParams, model.copulaParams[1]))
+        self.assertAlmostEqual(rerun.empKTau_, model.empKTau_)
+        # on-disk entries survive a new in-memory cache
+        cache_b = TournamentCache(cacheDir=self.cacheDir)
+        rerun = PairCopula(x, y, family=family)
+        rerun.copulaTournament(cache=cache_b, verbosity=False)
+        self.assertEqual(cache_b.hits, 1)
+        # different criterion or trial family is a different key
+        key_a = TournamentCache.key(model.UU, model.VV, None, family, 'AIC')
+        key_b = TournamentCache.key(model.UU, model.VV, None, family, 'Kc')
+        key_c = TournamentCache.key(model.UU, model.VV, None, {'gauss': 0}, 'AIC')
+        self.assertEqual(len(set([key_a, key_b, key_c])), 3)
+
+    def testCacheEviction(self):
+        cache = TournamentCache(maxEntries=2, cacheDir=self.cacheDir, maxBytes=1)
+        for i in range(4):
+            cache.put(str(i), {"data": np.zeros(10)})
+        self.assertEqual(len(cache), 2)
+        self.assertTrue("3" in cache)
+        self.assertFalse("0" in cache)
+        self.assertEqual(len(os.listdir(self.cacheDir)), 1)
+        self.assertTrue(cache.get("2") is not None)
+        self.assertTrue(cache.get("1") is None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+##
+# \brief Test the shared column store for pair copula data
+from __future__ import print_function, division
+from starvine.bvcopula.pc_base import PairCopula
+from starvine.bvcopula.pc_store import ColumnStore
+import unittest
+import numpy as np
+import pandas as pd
+import os
+pwd_ = os.getcwd()
+dataDir = pwd_ + "/tests/data/"
+np.random.seed(123)
+
+
+class TestColumnStore(unittest.TestCase):
+    def setUp(self):
+        stocks = np.loadtxt(dataDir + 'stocks.csv', delimiter=',')
+        self.frame = pd.DataFrame(stocks[:, [0, 1, 4]], columns=['a', 'b', 'c'])
+
+    def testZeroCopyViews(self):
+        store = ColumnStore(self.frame)
+        self.assertTrue(store.values.flags['F_CONTIGUOUS'])
+        self.assertTrue(np.shares_memory(store.frame()['b'].values, store.values))
+        pair = store.pairCopula('a', 'b', family={'gauss': 0})
+        self.assertTrue(np.shares_memory(pair.x, store.values))
+        self.assertTrue(np.shares_memory(pair.UU, store.ranks))
+        self.assertTrue(np.shares_memory(pair.VV, store.ranks))
+        # store ranks match the pair copula rank transform
+        ref = PairCopula(self.frame['a'].values, self.frame['b'].values, family={'gauss': 0})
+        self.assertTrue(np.array_equal(ref.UU, pair.UU))
+        self.assertTrue(np.array_equal(ref.VV, pair.VV))
+        self.assertEqual(ref.empKTau()[0], pair.empKTau()[0])
+        # a fortran ordered double array is not copied
+        buf = np.asfortranarray(self.frame.values)
+        self.assertTrue(ColumnStore(buf).values is buf)
+
+    def testSinglePrecisionRanks(self):
+        store64 = ColumnStore(self.frame)
+        store32 = ColumnStore(self.frame, rankDtype=np.float32)
+        self.assertEqual(store32.ranks.dtype, np.float32)
+        self.assertEqual(store32.ranks.nbytes * 2, store64.ranks.nbytes)
+        pair64 = store64.pairCopula('a', 'c', family={'frank': 0})
+        pair32 = store32.pairCopula('a', 'c', family={'frank': 0})
+        self.assertAlmostEqual(pair32.empKTau()[0], pair64.empKTau()[0])
+        fit64 = pair64.fitCopula(pair64.copulaBank['frank'])
+        fit32 = pair32.fitCopula(pair32.copulaBank['frank'])
+        self.assertTrue(np.allclose(fit64[1], fit32[1], rtol=1e-4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+##
+# \brief Test incremental pair copula updates
+from __future__ import print_function, division
+from starvine.bvcopula.pc_base import PairCopula, weighted_kendalltau
+from starvine.bvcopula.copula_factory import Copula
+from scipy.stats import kendalltau, rankdata
+import unittest
+import numpy as np
+import os
+pwd_ = os.getcwd()
+dataDir = pwd_ + "/tests/data/"
+np.random.seed(123)
+
+
+class TestPairCopulaUpdate(unittest.TestCase):
+    def testUpdateStocks(self):
+        stocks = np.loadtxt(dataDir + 'stocks.csv', delimiter=',')
+        x = stocks[:, 0]
+        y = stocks[:, 1]
+        family = {'gauss': 0, 'frank': 0, 'clayton-90': 1}
+        stockModel = PairCopula(x[:50], y[:50], family=family)
+        stockModel.copulaTournament(verbosity=False)
+        for i in range(50, len(x), 25):
+            stockModel.update(x[i:i + 25], y[i:i + 25], verbosity=False)
+        # incremental ranks and tau match a fresh pair copula
+        fullModel = PairCopula(x, y, family=family)
+        self.assertTrue(np.array_equal(stockModel.UU, fullModel.UU))
+        self.assertTrue(np.array_equal(stockModel.VV, fullModel.VV))
+        self.assertAlmostEqual(stockModel.empKTau_, kendalltau(x, y)[0], places=12)
+        # warm started refit matches the fit on the full data
+        fullModel.copulaTournament(verbosity=False)
+        self.assertEqual(stockModel.copulaModel.name, fullModel.copulaModel.name)
+        self.assertAlmostEqual(stockModel.copulaParams[1][0],
+                               fullModel.copulaParams[1][0], delta=1e-3)
+
+    def testUpdateWeightedTies(self):
+        x = np.round(np.random.uniform(0, 1, 400), 2)
+        y = np.round(x + np.random.uniform(0, 1, 400), 2)
+        wgts = np.random.uniform(0.5, 2.0, 400)
+        model = PairCopula(x[:100], y[:100], weights=wgts[:100])
+        for i in range(100, 400, 100):
+            model.update(x[i:i + 100], y[i:i + 100], weights=wgts[i:i + 100],
+                         refit=False)
+        self.assertAlmostEqual(model.empKTau_,
+                               weighted_kendalltau(x, y, wgts)[0], places=12)
+        self.assertTrue(np.allclose(model.weights, wgts / np.average(wgts)))
+        self.assertTrue(np.array_equal(model.UU, rankdata(x) / 401.))
+
+    def testUpdateDrift(self):
+        # dependence changes sign: the tournament is re-run
+        family = {'gauss': 0, 'clayton': 0, 'clayton-90': 1}
+        clayton = Copula("clayton", 0)
+        u0, v0 = clayton.sample(500, *(3.0,))
+        model = PairCopula(u0, v0, family=family)
+        model.copulaTournament(verbosity=False)
+        self.assertEqual(model.copulaParams[3], 0)
+        u1, v1 = clayton.sample(2000, *(3.0,))
+        model.update(1. - u1, v1, driftTol=0.1, verbosity=False)
+        self.assertEqual(model.copulaParams[3], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+##
+# \brief Test executor plumbing of tournaments and bootstrap tests
+from __future__ import print_function, division
+from starvine.bvcopula.pc_base import PairCopula
+from starvine.bvcopula.pc_workers import shareArrays, attachArrays, unshare, batchSizes
+from starvine.bvcopula.stat_tests import gauss_copula_test, ks2d2s, estat2d
+from starvine.bvcopula import copula_factory
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import unittest
+import numpy as np
+import os
+pwd_ = os.getcwd()
+dataDir = pwd_ + "/tests/data/"
+
+
+class TestWorkers(unittest.TestCase):
+    def testSharedArrays(self):
+        x = np.random.rand(100)
+        ref = shareArrays({"x": x, "w": None})
+        data = attachArrays(ref)
+        self.assertEqual(list(data), ["x"])
+        self.assertTrue(np.array_equal(data["x"], x))
+        unshare(ref)
+        self.assertFalse(os.path.exists(ref["dir"]))
+        self.assertEqual(batchSizes(10, 4), [4, 4, 2])
+
+    def testParallelTournament(self):
+        stocks = np.loadtxt(dataDir + 'stocks.csv', delimiter=',')
+        x, y = stocks[:, 0], stocks[:, 1]
+        family = {'gauss': 0, 'frank': 0, 'clayton': 0, 'gumbel-90': 1}
+        model = PairCopula(x, y, family=family)
+        model.copulaTournament(verbosity=False)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            parModel = PairCopula(x, y, family=family)
+            parModel.copulaTournament(verbosity=False, executor=executor)
+        self.assertIs(parModel.copulaModel, parModel.copulaBank[model.copulaModel.name])
+        self.assertTrue(np.allclose(parModel.copulaParams[1], model.copulaParams[1]))
+        for name, result in model.tournamentResults.items():
+            self.assertAlmostEqual(parModel.tournamentResults[name][2], result[2])
+
+    def testParallelBootstrap(self):
+        copula = copula_factory.Copula('gauss')
+        copula.fitKtau(0.4)
+        x1, y1 = copula.sample(n=300)
+        x2, y2 = copula.sample(n=200)
+        np.random.seed(7)
+        g_seq = gauss_copula_test(x1, y1, nboot=400, procs=1, batchSize=64)
+        ks_seq = ks2d2s(x1, y1, x2, y2, nboot=200, batchSize=32)
+        en_seq = estat2d(x1, y1, x2, y2, nboot=100, batchSize=32)
+        # the result does not depend on the executor
+        np.random.seed(7)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            g_par = gauss_copula_test(x1, y1, nboot=400, executor=executor, batchSize=64)
+            ks_par = ks2d2s(x1, y1, x2, y2, nboot=200, executor=executor, batchSize=32)
+            en_par = estat2d(x1, y1, x2, y2, nboot=100, executor=executor, batchSize=32)
+        self.assertEqual(g_seq[:2], g_par[:2])
+        self.assertEqual(ks_seq, ks_par)
+        self.assertEqual(en_seq[:2], en_par[:2])
+        np.random.seed(7)
+        gauss_copula_test(x1, y1, nboot=400, procs=1, batchSize=64)
+        with ProcessPoolExecutor(max_workers=2,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            ks_proc = ks2d2s(x1, y1, x2, y2, nboot=200, executor=executor, batchSize=32)
+        self.assertEqual(ks_seq, ks_proc)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+##
+# \brief Test weighted kendall's tau and weighted rank transform
+from __future__ import print_function, division
+from starvine.bvcopula.pc_base import PairCopula, weighted_kendalltau, \
+    weighted_rankdata
+from starvine.bvcopula.copula_factory import Copula
+from scipy.stats import kendalltau, rankdata
+import unittest
+import numpy as np
+import os
+pwd_ = os.getcwd()
+dataDir = pwd_ + "/tests/data/"
+np.random.seed(123)
+
+
+class TestWeightedKtau(unittest.TestCase):
+    def testUnitWeights(self):
+        stocks = np.loadtxt(dataDir + 'stocks.csv', delimiter=',')
+        x = np.round(stocks[:, 0], 1)
+        y = np.round(stocks[:, 1], 1)
+        n = len(x)
+        # with ties, unit weights reproduce scipy's tau-b
+        self.assertAlmostEqual(weighted_kendalltau(x, y, np.ones(n))[0],
+                               kendalltau(x, y)[0], places=12)
+        self.assertTrue(np.allclose(weighted_rankdata(x, np.ones(n)),
+                                    rankdata(x) / (n + 1)))
+
+    def testIntegerWeights(self):
+        # integer weights are equivalent to replicated samples
+        x = np.random.uniform(0, 1, 500)
+        y = x + np.random.uniform(0, 1, 500)
+        wgts = np.random.randint(1, 5, 500)
+        x_rep, y_rep = np.repeat(x, wgts), np.repeat(y, wgts)
+        self.assertAlmostEqual(weighted_kendalltau(x, y, wgts)[0],
+                               kendalltau(x_rep, y_rep)[0], places=12)
+        u_rep = rankdata(x_rep) / (len(x_rep) + 1)
+        u_wgt = np.repeat(weighted_rankdata(x, wgts), wgts)
+        self.assertTrue(np.allclose(u_rep, u_wgt, atol=1. / len(x)))
+
+    def testWeightedPairCopula(self):
+        # mix of positive and negative dependence, positive side dominant
+        cop1 = Copula("gauss")
+        cop2 = Copula("gauss")
+        u1, v1 = cop1.sample(2000, *(0.7,))
+        u2, v2 = cop2.sample(2000, *(-0.7,))
+        x, y = np.append(u1, u2), np.append(v1, v2)
+        wgts = np.append(np.ones(2000) * 0.95, np.ones(2000) * 0.05)
+        pc = PairCopula(x, y, weights=wgts, weightedRank=True)
+        ktau, pval = pc.empKTau()
+        self.assertEqual(len(pc.UU), 4000)
+        self.assertTrue(ktau > 0.35)
+        self.assertTrue(pval < 0.05)
+        self.assertTrue(np.allclose(np.average(pc.UU, weights=wgts), 0.5, atol=1e-3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,13 +7,17 @@
 # implementation.
 #
 from starvine.vine.base_vine import BaseVine
-from pandas import DataFrame
+from pandas import DataFrame, concat
 from scipy.optimize import minimize
 import networkx as nx
 from starvine.bvcopula import pc_base as pc
 import numpy as np
 from six import iteritems
+from collections import Counter
 from starvine.vine.tree import Vtree
+from starvine.vine.vine_matrix import VineMatrix
+from starvine.vine.vine_checkpoint import VineCheckpoint
+from starvine.bvcopula.pc_store import ColumnStore
 
 
 class Cvine(BaseVine):
@@ -73,41 +77,446 @@ class Cvine(BaseVine):
     the pair copula constructions (PCC) withen the given tree.
     """
     def __init__(self, data, dataWeights=None, **kwargs):
+        """!
+        @brief Canonical vine.
+        @param data <b>DataFrame</b> multivariate data set
+        @param dataWeights <b>np_1darray</b> (optional) data weights
+        @param truncLevel <b>int</b> (optional) number of fitted trees.
+            All trees below are independence trees.  Default is d - 1.
+        @param truncCriterion <b>str</b> (optional) automatic truncation.
+            'indep': stop at the first tree in which no edge rejects
+            independence.  'AIC': stop at the first tree whose fitted
+            copulas give no AIC gain over independence.  Default is None.
+        @param indepAlpha <b>float</b> (optional) significance level of the
+            edge independence pre-test, see PairCopula.indepTest(), and of
+            the 'indep' truncation criterion.  Default is 0: the pre-test
+            is off and the truncation criterion tests at the 0.05 level.
+        @param subsample <b>int</b> (optional) number of rows on which the
+            tree structure and copula families are selected.  Only the
+            parameters are estimated on the full data.  Default is None,
+            everything is selected on the full data.  See selectStructure()
+        @param subsampleMethod <b>str</b> (optional) 'random' or 'stratified'.
+            Default is 'random'.
+        @param nSubsamples <b>int</b> (optional) number of subsamples drawn
+            for the structure stability diagnostics.  Default is 3.
+        @param stratifyBy (optional) data label of the stratification
+            variable.  Default is the first data column.
+        @param checkpointDir <b>str</b> (optional) directory in which each
+            completed tree level is stored.  constructVine() resumes from
+            the stored levels.  See starvine.vine.vine_checkpoint.VineCheckpoint
+        """
         super(Cvine, self).__init__(data, dataWeights, **kwargs)
+        self._kwargs = kwargs
         self.nLevels = int(data.shape[1] - 1)
         self.vine = []
+        self.truncLevel = kwargs.get("truncLevel", None)
+        if self.truncLevel is None:
+            self.truncLevel = self.nLevels
+        assert 1 <= self.truncLevel <= self.nLevels
+        self.truncCriterion = kwargs.get("truncCriterion", None)
+        assert self.truncCriterion in (None, 'indep', 'AIC')
+        self.subsample = kwargs.get("subsample", None)
+        self.subsampleMethod = kwargs.get("subsampleMethod", "random")
+        assert self.subsampleMethod in ('random', 'stratified')
+        self.nSubsamples = kwargs.get("nSubsamples", 3)
+        self.stratifyBy = kwargs.get("stratifyBy", None)
+        # fixed root and edge families of each tree, see selectStructure()
+        self.structure = None
+        self.checkpointDir = kwargs.get("checkpointDir", None)
+        self._checkpoint = None
 
     def constructVine(self):
         """!
         @brief Sequentially construct the vine structure.
         Construct the top-level tree first, then recursively
         build all tree levels.
+        If a checkpointDir was given, the tree levels stored by a previous
+        run on the same data and settings are restored without a refit and
+        the construction continues below the last stored level.
         """
-        # 0th tree build
-        tree0 = Ctree(self.data, lvl=0, trial_copula=self.trial_copula_dict)
-        tree0.seqCopulaFit()
-        self.vine.append(tree0)
-        # build all other trees
-        self.buildDeepTrees()
-
-    def buildDeepTrees(self, level=1):
+        if self.checkpointDir is not None:
+            self._checkpoint = VineCheckpoint(self.checkpointDir, self.data,
+                                              self._checkpointSettings())
+            if self.structure is None:
+                self.structure = self._checkpoint.structure
+        if self.structure is None and self.subsample is not None and \
+                self.subsample < len(self.data):
+            self.selectStructure()
+            if self._checkpoint is not None:
+                self._checkpoint.saveStructure(self.structure)
+        with self._fitExecutor() as executor:
+            self.vine = self._restoreLevels()
+            if not self.vine:
+                # 0th tree build
+                tree0 = Ctree(self.data, lvl=0, trial_copula=self.trial_copula_dict,
+                              rankDtype=self.rankDtype,
+                              indepAlpha=self.indepAlpha,
+                              treeStructure=self._treeStructure(0))
+                tree0.seqCopulaFit(cache=self._edgeCache(), executor=executor,
+                                   shareDir=self.shareDir)
+                self._appendTree(tree0)
+            # build all other trees
+            if self._checkpoint is None or not self._checkpoint.complete:
+                self.buildDeepTrees(len(self.vine), executor)
+        if self._checkpoint is not None:
+            self._checkpoint.finish()
+            self._checkpoint = None
+        self.compileVine()
+
+    def buildDeepTrees(self, level=1, executor=None):
         """!
         @brief Recursivley build each tree in the vine.
         Must keep track of edge---node linkages between trees.
+        Stops at the truncation level, see truncLevel and truncCriterion.
+        Trees which are not built are independence trees.
         @param level <b>int</b> Current tree level.
+        @param executor (optional) concurrent.futures style executor
+            used to fit the edges of each tree.  See Vtree.seqCopulaFit()
         """
+        if level >= self.truncLevel:
+            return
+        if self.structure is not None and level >= len(self.structure):
+            return
         treeT = Ctree(self.vine[level - 1].evalH(),
                       lvl=level,
                       parentTree=self.vine[level - 1],
-                      trial_copula=self.trial_copula_dict)
-        treeT.seqCopulaFit()
+                      trial_copula=self.trial_copula_dict,
+                      rankDtype=self.rankDtype,
+                      indepAlpha=self.indepAlpha,
+                      treeStructure=self._treeStructure(level))
+        fixed = self.structure is not None
+        if self.truncCriterion == 'indep' and not fixed and \
+                treeT.isIndependent(self.indepAlpha or 0.05):
+            print("Vine truncated at tree level: %d. Independence not rejected." % level)
+            return
+        treeT.seqCopulaFit(cache=self._edgeCache(), executor=executor,
+                           shareDir=self.shareDir)
+        if self.truncCriterion == 'AIC' and not fixed and treeT.treeAIC() >= 0:
+            print("Vine truncated at tree level: %d. No AIC gain." % level)
+            return
         if self.nLevels > 1:
-            self.vine.append(treeT)
+            self._appendTree(treeT)
         if level < self.nLevels - 1:
-            self.buildDeepTrees(level + 1)
+            self.buildDeepTrees(level + 1, executor)
         elif level == self.nLevels - 1:
             self.vine[level].evalH()
 
+    def selectStructure(self):
+        """!
+        @brief Select the tree structure and pair copula families on row
+        subsamples of the data.
+        A C-vine is constructed on each of nSubsamples random or
+        stratified subsamples of size subsample.  The most frequent
+        sequence of root nodes is kept, and each edge gets the family most
+        often selected by the subsamples which agree on the roots.
+        constructVine() then only estimates the copula parameters on the
+        full data, with the structure and families fixed.
+        Stratified subsamples draw one row from each of subsample equal
+        count strata of the stratifyBy variable, so its tails are always
+        represented.
+        Sets self.structure and self.structureReport.  The report holds
+        the root sequence of every subsample and, per tree level, the
+        fraction of subsamples selecting the kept root (rootStability)
+        and the fraction of edge families which agree with the kept ones
+        among the subsamples agreeing on the roots (familyStability).
+        @return <b>list</b> self.structure, the root and the
+            (nodeID, rootID, kTau, family) edges of each tree
+        """
+        n = len(self.data)
+        size = min(self.subsample, n) if self.subsample is not None else n
+        strataKey = None
+        if self.subsampleMethod == 'stratified':
+            label = self.data.columns[0] if self.stratifyBy is None else self.stratifyBy
+            strataKey = self.data[label].values
+        subKwargs = dict(self._kwargs, subsample=None, tournamentCache=None,
+                         checkpointDir=None)
+        structures = []
+        for i in range(self.nSubsamples):
+            rows = subsampleRows(n, size, self.subsampleMethod, strataKey)
+            subVine = Cvine(self.data.iloc[rows], **subKwargs)
+            subVine.constructVine()
+            structures.append(subVine.treeStructures())
+        roots = [tuple(st["root"] for st in structure) for structure in structures]
+        keptRoots = Counter(roots).most_common(1)[0][0]
+        self.structure, rootStability, familyStability = [], [], []
+        for level in range(len(keptRoots)):
+            agree = [structure[level] for structure, r in zip(structures, roots)
+                     if r[:level + 1] == keptRoots[:level + 1]]
+            rootStability.append(float(len(agree)) / len(structures))
+            edges, nAgree = [], 0
+            for k, edge in enumerate(agree[0]["edges"]):
+                votes = Counter(st["edges"][k][3] for st in agree)
+                family = votes.most_common(1)[0][0]
+                nAgree += votes[family]
+                kTau = np.mean([st["edges"][k][2] for st in agree])
+                edges.append(edge[:2] + (kTau, family))
+            familyStability.append(float(nAgree) / (len(agree) * len(edges)))
+            self.structure.append({"root": keptRoots[level], "edges": edges})
+            print("Tree level: %d, root %s kept in %d of %d subsamples, family agreement: %.2f"
+                  % (level, str(keptRoots[level]), len(agree), len(structures),
+                     familyStability[-1]))
+        self.structureReport = {"subsample": size,
+                                "method": self.subsampleMethod,
+                                "roots": roots,
+                                "rootStability": rootStability,
+                                "familyStability": familyStability}
+        return self.structure
+
+    def treeStructures(self):
+        """!
+        @brief Root and edges of each fitted tree.
+        @return <b>list</b> of <b>dict</b> {"root": rootID, "edges": [(nodeID,
+            rootID, kTau, family), ...]} with edges sorted by node.  family is
+            the trial family name of the selected copula.
+        """
+        structures = []
+        for treeL in self.vine:
+            edges = []
+            for u, v, data in treeL.tree.edges(data=True):
+                pair = data["pc"]
+                family = [name for name, copula in iteritems(pair.copulaBank)
+                          if copula is pair.copulaModel][0]
+                edges.append(tuple(data["id"]) + (data["weight"], family))
+            edges.sort(key=lambda edge: str(edge[0]))
+            structures.append({"root": treeL.rootNodeID, "edges": edges})
+        return structures
+
+    def update(self, newData, newWeights=None, driftTol=None, tauDriftTol=None):
+        """!
+        @brief Refit the vine after new data rows arrive.
+        The new rows are appended to the data and the trees are refit
+        level by level, keeping the root and the copula family of every
+        edge.  Each parameter fit starts from the current parameters, no
+        tau matrix is computed and no copula tournament is run, unless:
+        the per sample AIC of an edge increased by more than driftTol, in
+        which case the family of that edge is re-selected (see
+        Vtree.warmRefit()), or the kendall's tau of an edge in a tree
+        changed by more than tauDriftTol, in which case the structure of
+        that tree and of all trees below it is re-selected as in
+        constructVine().
+        @param newData <b>DataFrame</b> new rows with the data columns
+        @param newWeights <b>np_1darray</b> (optional) weights of the new
+            rows, appended to the data weights.  Required if the vine has
+            data weights.
+        @param driftTol <b>float</b> (optional) max allowed increase of the
+            per sample AIC of an edge.  Default None, families are kept.
+        @param tauDriftTol <b>float</b> (optional) max allowed change of the
+            edge kendall's tau.  Default None, the structure is kept.
+        @return <b>dict</b> the update report, also set as
+            self.updateReport: the max tau change of each refit tree
+            (tauDrift), the ids of the edges with re-selected families
+            (reselected) and the first tree level with a re-selected
+            structure (reselectedLevel, None if the structure was kept).
+        """
+        if (self.weights is None) != (newWeights is None):
+            raise RuntimeError("Data weights of the new rows must be given if and only if "
+                               "the vine has data weights.")
+        oldVine, oldStructure = self.vine, self.treeStructures()
+        self.data = concat([self.data, newData[list(self.data.columns)]], ignore_index=True)
+        if newWeights is not None:
+            self.weights = np.concatenate([np.asarray(self.weights).ravel(),
+                                           np.asarray(newWeights).ravel()])
+        self.vine, self.structure = [], None
+        report = {"tauDrift": [], "reselected": [], "reselectedLevel": None}
+        for level, oldTree in enumerate(oldVine):
+            parent = self.vine[level - 1] if level > 0 else None
+            treeT = Ctree(self.data if parent is None else parent.evalH(),
+                          lvl=level,
+                          parentTree=parent,
+                          trial_copula=self.trial_copula_dict,
+                          rankDtype=self.rankDtype,
+                          indepAlpha=self.indepAlpha,
+                          treeStructure=oldStructure[level])
+            drift = treeT.tauDrift(oldTree)
+            report["tauDrift"].append(drift)
+            if tauDriftTol is not None and drift > tauDriftTol:
+                report["reselectedLevel"] = level
+                break
+            report["reselected"] += treeT.warmRefit(oldTree, driftTol, self.tournamentCache)
+            self.vine.append(treeT)
+        level = report["reselectedLevel"]
+        if level == 0:
+            self.constructVine()
+        elif level is not None:
+            with self._fitExecutor() as executor:
+                self.buildDeepTrees(level, executor)
+        self.compileVine()
+        self.updateReport = report
+        return report
+
+    def _checkpointSettings(self):
+        """!
+        @brief Construction settings which must match for a checkpoint
+        to be resumed.
+        """
+        return {"trialCopula": sorted(iteritems(self.trial_copula_dict)),
+                "indepAlpha": self.indepAlpha,
+                "rankDtype": str(np.dtype(self.rankDtype)),
+                "truncLevel": self.truncLevel,
+                "truncCriterion": self.truncCriterion,
+                "subsample": (self.subsample, self.subsampleMethod,
+                              self.nSubsamples, self.stratifyBy)}
+
+    def _edgeCache(self):
+        """!
+        @brief Tournament cache used to fit the edges.  Without a user
+        supplied tournamentCache the edge fits of a checkpointed
+        construction are cached in the checkpoint directory.
+        """
+        if self.tournamentCache is None and self._checkpoint is not None:
+            return self._checkpoint.edgeCache()
+        return self.tournamentCache
+
+    def _appendTree(self, treeT):
+        """!
+        @brief Append a fitted tree to the vine and checkpoint it.
+        """
+        self.vine.append(treeT)
+        if self._checkpoint is not None:
+            self._checkpoint.saveLevel(len(self.vine) - 1, treeT)
+
+    def _restoreLevels(self):
+        """!
+        @brief Rebuild the tree levels stored in the checkpoint.  The edge
+        copulas are restored from their stored tournament results.
+        @return <b>list</b> of restored Ctree
+        """
+        vine = []
+        nLevels = 0 if self._checkpoint is None else self._checkpoint.levels
+        for level in range(nLevels):
+            stored, values = self._checkpoint.loadLevel(level)
+            data = self.data if values is None else \
+                ColumnStore(values, labels=stored["labels"], rankDtype=self.rankDtype)
+            edges = [edge["id"] + (edge["weight"], edge["tournament"]["gold"])
+                     for edge in stored["edges"]]
+            treeT = Ctree(data, lvl=level,
+                          parentTree=vine[-1] if vine else None,
+                          trial_copula=self.trial_copula_dict,
+                          rankDtype=self.rankDtype,
+                          indepAlpha=self.indepAlpha,
+                          treeStructure={"root": stored["root"], "edges": edges})
+            storedEdges = dict((edge["id"], edge) for edge in stored["edges"])
+            for u, v, data in treeT.tree.edges(data=True):
+                edge = storedEdges[tuple(data["id"])]
+                data["pc"].setTrialCopula(edge["trialFamily"])
+                data["pc"].indepAlpha = edge["indepAlpha"]
+                data["pc"]._loadTournament(edge["tournament"], vb=False)
+            treeT._initTreeParamMap()
+            print("Tree level: %d restored from checkpoint." % level)
+            vine.append(treeT)
+        return vine
+
+    def _treeStructure(self, level):
+        if self.structure is None:
+            return None
+        return self.structure[level]
+
+    def compileMatrix(self):
+        """!
+        @brief Encode the fitted vine as a VineMatrix.
+        The sampling order of a C-vine is the root variable of each tree
+        followed by the last remaining variable.  Column i of the C-vine
+        matrix holds the sampling order reversed from row i down, so entry
+        (k, i) is the edge of tree d-1-k between its root and
+        \f$ M_{i,i} \f$.  The copula's first argument is the non-root
+        variable.  Entries of truncated trees are independence copulas.
+        @return <b>starvine.vine.vine_matrix.VineMatrix</b>
+        """
+        labels = list(self.data.columns)
+        d = len(labels)
+        roots = [treeL.rootNodeID for treeL in self.vine]
+        others = [n for n in self.vine[-1].tree.nodes() if n != roots[-1]]
+        order = [nodeVariable(root, j) for j, root in enumerate(roots)] + \
+            [nodeVariable(n, len(roots) - 1) for n in others]
+        M = -np.ones((d, d), dtype=int)
+        for i in range(d):
+            for k in range(i, d):
+                M[k, i] = labels.index(order[d - 1 - k])
+        entries = {}
+        for j, treeL in enumerate(self.vine):
+            varNode = dict((nodeVariable(node, j), node) for node in treeL.tree.nodes())
+            for m in range(j + 1, d):
+                pc = treeL.tree[varNode[order[m]]][roots[j]]["pc"]
+                if pc.copulaModel.name != 'indep':
+                    entries[(d - 1 - j, d - 1 - m)] = (pc.copulaModel.name, pc.copulaModel.rotation,
+                                                       pc.copulaParams[1], False)
+        return VineMatrix.fromEntries(labels, M, entries)
+
+    @property
+    def sampleOrder(self):
+        """!
+        @brief Data column indices of the root variable of each tree
+        followed by the last remaining variable.  Variables are drawn in
+        this order by sample().  See VineMatrix.sampleOrder
+        """
+        if not hasattr(self, "matrix"):
+            self.compileVine()
+        return self.matrix.sampleOrder
+
+    def sample_conditional(self, n, given):
+        """!
+        @brief Draws n samples from the vine given fixed values of the
+        leading variables of the sampling order (the root nodes of the
+        first trees, see sampleOrder).
+        The given variables are fixed at the top of the sampling order
+        and only the remaining variables are drawn, each by inverting its
+        conditional distribution given all previous variables.  Every
+        sample may have its own conditioning values.
+        @param n int. number of samples to draw
+        @param given <b>dict</b> {data label: values}.  Values are points in
+            [0, 1], a scalar or an array of length n (one conditioning row
+            per sample).
+        @returns  size == (n, nvars) <b>pandas.DataFrame</b>
+            samples from the conditional vine.  The given columns hold the
+            conditioning values.
+        """
+        if not hasattr(self, "matrix"):
+            self.compileVine()
+        labels = list(self.data.columns)
+        x = np.empty((n, len(labels)), order='F')
+        for label, values in given.items():
+            x[:, labels.index(label)] = np.broadcast_to(np.asarray(values, dtype=np.float64), (n, ))
+        samples = self.matrix.inverseRosenblatt(np.random.rand(n, len(labels)), x,
+                                                [labels.index(label) for label in given])
+        return DataFrame(samples, columns=self.data.columns)
+
+    def rosenblatt(self, U, chunkSize=65536, executor=None):
+        """!
+        @brief Forward Rosenblatt transform.  Maps points of the vine
+        copula to independent uniforms.
+        Variable i of the sampling order is mapped to
+        \f$ F(u_i|u_0, ..., u_{i-1}) \f$, propagated tree by tree with
+        each edge's h-function.
+        @param U <b>DataFrame</b> or <b>np_2darray</b> of shape (n, nvars).
+            Points in the unit hypercube.  Columns are in the order of
+            the data columns.
+        @param chunkSize <b>int</b> number of rows transformed at once
+        @param executor (optional) concurrent.futures style executor
+            used to transform the chunks in parallel.
+        @return (n, nvars) <b>np_2darray</b>, or <b>DataFrame</b> if U is a
+            DataFrame.  Independent uniforms in the order of the data columns.
+        """
+        W = np.concatenate(self._mapChunks("rosenblatt", U, chunkSize, executor))
+        return DataFrame(W, columns=self.data.columns) if isinstance(U, DataFrame) else W
+
+    def inverse_rosenblatt(self, W, chunkSize=65536, executor=None):
+        """!
+        @brief Inverse Rosenblatt transform.  Maps independent uniforms to
+        points of the vine copula, the inverse of rosenblatt().
+        Samples drawn with sample() are the inverse Rosenblatt transform of
+        uniform random numbers.
+        @param W <b>DataFrame</b> or <b>np_2darray</b> of shape (n, nvars).
+            Independent uniforms.  Columns are in the order of the data
+            columns.
+        @param chunkSize <b>int</b> number of rows transformed at once
+        @param executor (optional) concurrent.futures style executor
+            used to transform the chunks in parallel.
+        @return (n, nvars) <b>np_2darray</b>, or <b>DataFrame</b> if W is a
+            DataFrame.
+        """
+        U = np.concatenate(self._mapChunks("inverseRosenblatt", W, chunkSize, executor))
+        return DataFrame(U, columns=self.data.columns) if isinstance(W, DataFrame) else U
+
 
 class Ctree(Vtree):
     """!
@@ -122,58 +531,28 @@ class Ctree(Vtree):
         @param lvl <b>int</b>: tree level in the vine
         @param weights <b>DataFrame</b>: (optional) data weights
         @param labels <b>list</b> of <b>str</b> or <b>ints</b>: (optional) data labels
+        @param treeStructure <b>dict</b>: (optional) fixed root and edge
+            families.  See Cvine.selectStructure()
         """
+        self.treeStructure = kwargs.get("treeStructure", None)
         super(Ctree, self).__init__(data, lvl, **kwargs)
-
-    def seqCopulaFit(self):
-        """!
-        @brief Iterate through all edges in tree, fit copula models
-        at each edge.  This is a sequential fitting operation.
-
-        See simultaneousCopulaFit() for a tree-wide simulltaneous
-        parameter estimation.
-        """
-        for u, v, data in self.tree.edges(data=True):
-            data["pc"].copulaTournament()
-        self._initTreeParamMap()
-
-    def treeNLLH(self, treeCopulaParams=None):
-        """!
-        @brief Compute this tree's negative log likelihood.
-        For C-trees this is just the sum of copula-log-likelihoods over all
-        node-pairs.
-        @param treeCopulaParams <b>np_1darray</b> Copula parameter array.
-        Contains parameters for all PCC in the tree.
-
-        @param paramMap  Maps edges to parameter len and location in
-        treeCopulaParams
-        {[u, v]: (start, Params_len_0), [u, v]: (start, Params_len), ...}
-        """
-        if not treeCopulaParams:
-            if not hasattr(self, "treeCopulaParams"):
-                raise RuntimeError("Sequential copula model fitting must be performed first.")
-            treeCopulaParams = self.treeCopulaParams
-        nLL = 0
-        for u, v, data in self.tree.edges(data=True):
-            nLL += \
-                self.tree.adj[u][v]["pc"].copulaModel.\
-                _nlogLike(self.tree.nodes[u]["data"].values,
-                          self.tree.nodes[v]["data"].values,
-                          0,
-                          *treeCopulaParams[data["paramMap"][0]: data["paramMap"][1]])
-        return nLL
+        if self.treeStructure is not None:
+            self._fixEdgeFamilies()
 
     def evalH(self):
         """!
         @brief Define nodes of the T+1 level tree.  Use the conditional distribution
         (h()) to obtain marginal distributions at the next tree level.
         """
-        for u, v, data in self.tree.edges(data=True):
-            self.tree.adj[u][v]["h-dist"] = data["pc"].copulaModel.h
-            self.tree.adj[u][v]["hinv-dist"] = data["pc"].copulaModel.hinv
         return self._evalH()
 
     # ---------------------------- PRIVATE METHODS ------------------------------ #
+    def _edgeOutputs(self, n0, n1):
+        """!
+        @brief Only F(nonroot|root) is passed to the next tree level.
+        """
+        return (n0, n1), None
+
     def _optimNodePairs(self):
         """!
         @brief Selects the node-pairings which maximizes the sum
@@ -182,83 +561,89 @@ class Ctree(Vtree):
 
         It is feasible to try all C-tree configuations
         since if we have nT variables in the top level tree
-        the number of _unique_ C-trees is == nT.
+        the number of _unique_ C-trees is == nT.  The score of each
+        candidate root is a row sum of the abs(kendall's tau) matrix.
 
         @return <b>nd_array</b>: (nT-1, 3) shape array with PCC pairs
                 Each row is a len 3 tuple: (rootNodeID, nodeID, kTau)
         """
-        trialKtauSum = np.zeros(len(self.tree.nodes()))
-        trialPairings = []
-        # Generate all possible node pairings
-        for i, rootNodeID in enumerate(self.tree.nodes()):
-            trialPairings.append([])
-            for nodeID in self.tree.nodes():
-                # iterate though all child nodes,
-                # root dataset cannot be paired with itself
-                if nodeID != rootNodeID:
-                    trialPair = pc.PairCopula(self.tree.nodes[nodeID]["data"].values,
-                                              self.tree.nodes[rootNodeID]["data"].values)
-                    trialKtau, trialP = trialPair.empKTau()
-                    trialKtauSum[i] += abs(trialKtau)
-                    trialPairings[i].append((nodeID, rootNodeID, trialKtau))
-            print("Tree level: %d, configuration: %d, Ktau Metric: %f" % (self.level, i, trialKtauSum[i]))
-        bestPairingIndex = np.argmax(np.abs(trialKtauSum))
-        print(" === Configuration %d selected === " % (bestPairingIndex))
-        self.rootNodeID = trialPairings[bestPairingIndex][0][1]
-        return trialPairings[bestPairingIndex]
+        if self.treeStructure is not None:
+            # selected beforehand, see Cvine.selectStructure()
+            self.rootNodeID = self.treeStructure["root"]
+            return [edge[:3] for edge in self.treeStructure["edges"]]
+        # pairwise kendall's tau of all nodes, computed once per level
+        labels = self.store.labels
+        tauMatrix = pc.kendalltau_matrix(self.store.ranks)
+        trialKtauSum = np.sum(np.abs(tauMatrix), axis=1) - 1.0
+        bestPairingIndex = np.argmax(trialKtauSum)
+        self.rootNodeID = labels[bestPairingIndex]
+        print("Tree level: %d, root: %s, Ktau Metric: %f" %
+              (self.level, str(self.rootNodeID), trialKtauSum[bestPairingIndex]))
+        return [(nodeID, self.rootNodeID, tauMatrix[j, bestPairingIndex])
+                for j, nodeID in enumerate(labels) if j != bestPairingIndex]
+
+    def _fixEdgeFamilies(self):
+        """!
+        @brief Restrict the trial family of each edge to the family given
+        by the tree structure.  Only its parameters are fit.
+        """
+        families = dict((tuple(edge[:2]), edge[3]) for edge in self.treeStructure["edges"])
+        for u, v, data in self.tree.edges(data=True):
+            family = families[tuple(data["id"])]
+            data["pc"].setTrialCopula({family: self.trial_copula_dict.get(family, 0)})
+            if family != 'indep':
+                # the family is kept even if independence is not rejected
+                data["pc"].indepAlpha = 0.0
 
     def _evalH(self):
         """!
         @brief Computes \f$ F(x|v, \theta) \f$ data set at each node
         for use in the next level tree.
-        @return <b>DataFame</b> : conditional distribution at tree edges.
+        @return <b>ColumnStore</b> : conditional distribution at tree edges.
         """
         # TODO: Establish linkage between tree levels
-        condData = DataFrame()
-        for u, v, data in self.tree.edges(data=True):
+        # conditional data is written into one column-major buffer
+        # which backs the next tree's column store without a copy
+        edges = list(self.tree.edges(data=True))
+        condBuffer = np.empty((self.store.shape[0], len(edges)), order='F')
+        condLabels = []
+        for i, (u, v, data) in enumerate(edges):
             # eval h() of pair-copula model at current edge
             # use rank transformed data as input to conditional dist
-            # identify rootID
             rootID = self.rootNodeID
-            if u is not rootID:
-                nonRootID = u
-                nonRootData = data["pc"].UU
-                rootData = data["pc"].VV
-            else:
-                nonRootID = v
-                nonRootData = data["pc"].VV
-                rootData = data["pc"].UU
-            condData[(nonRootID, rootID)] = data["h-dist"](data["pc"].VV,
-                                                           data["pc"].UU)
-        return condData
-
-    def _getEdgeCopulaParams(self, u, v):
-        """!
-        @brief Get copula paramters of particular edge in tree.
-        @returns <b>np_1darray</b> Copula parameters of edge
-        """
-        cp = self.tree.adj[u][v]["pc"].copulaParams
-        if cp is not None:
-            return cp
-        else:
-            raise RuntimeError("ERROR: Must execute sequential fit first")
+            nonRootID = u if u != rootID else v
+            # F(nonroot|root) of the pair copula c(nonroot, root)
+            params = data["pc"].copulaParams[1]
+            condBuffer[:, i] = data["pc"].copulaModel.hT(data["pc"].UU, data["pc"].VV, *params)
+            condLabels.append((nonRootID, rootID))
+        return self._nextStore(condBuffer, condLabels)
 
-    def _initTreeParamMap(self):
-        """!
-        @brief Pack all copula paramters in the tree into a 1d numpy array for
-        simulatneous MLE optimization.  Sets the tree copula paramters.
-        """
-        currentMarker = 0
-        self.treeCopulaParams = []
-        edgeList = self.tree.edges(data=True)
-        for u, v, data in edgeList:
-            edgeParams = self._getEdgeCopulaParams(u, v)
-            self.treeCopulaParams.append(edgeParams[1])
-            nEdgeParams = len(edgeParams[1])
-            self.tree.adj[u][v]["paramMap"] = \
-                [currentMarker, currentMarker + nEdgeParams]
-            currentMarker += nEdgeParams
-        self.treeCopulaParams = [item for sublist in self.treeCopulaParams
-                                 for item in sublist]
-        self.treeCopulaParams = np.array(self.treeCopulaParams)
-        return self.treeCopulaParams
+
+def subsampleRows(n, size, method='random', strataKey=None):
+    """!
+    @brief Sorted row indices of a subsample.
+    @param n <b>int</b> number of rows
+    @param size <b>int</b> subsample size
+    @param method <b>str</b> 'random': rows are drawn without replacement.
+        'stratified': one row is drawn from each of size equal count
+        strata of strataKey.
+    @param strataKey <b>np_1darray</b> (n, ) stratification variable
+    """
+    if method == 'random' or strataKey is None:
+        return np.sort(np.random.choice(n, size, replace=False))
+    order = np.argsort(strataKey, kind='mergesort')
+    bounds = np.linspace(0, n, size + 1).astype(int)
+    picks = bounds[:-1] + (np.random.rand(size) * np.diff(bounds)).astype(int)
+    return np.sort(order[picks])
+
+
+def nodeVariable(node, level):
+    """!
+    @brief Data label of the non-root variable carried by a C-tree node.
+    Nodes below the top tree are labeled (nonRootID, rootID).
+    @param node  node label
+    @param level <b>int</b> tree level of the node
+    """
+    for lvl in range(level):
+        node = node[0]
+    return node
@@ -0,0 +1,308 @@
+##
+# \brief D-Vine structure.
+# Each tree in a D-vine is a path.  The variable ordering of the
+# first tree fixes the structure of the entire vine.  The ordering
+# is selected to maximize the sum of abs(empirical kendall's tau)
+# between neighboring variables along the path.
+#
+from __future__ import print_function, absolute_import, division
+from starvine.vine.base_vine import BaseVine
+from scipy.stats import kendalltau
+from starvine.bvcopula.pc_base import kendalltau_matrix
+import numpy as np
+from starvine.vine.tree import Vtree
+from starvine.vine.R_vine import rvineMatrix
+from starvine.vine.vine_matrix import VineMatrix
+
+
+class Dvine(BaseVine):
+    """!
+    @brief Drawable vine (D-vine).  Provides methods to fit pair
+    copula constructions sequentially and to draw samples from and
+    evaluate the density of a constructed D-vine.
+    Base class starvine.vine.base_vine.BaseVine .
+
+    Example 4 variable D-vine structure:
+
+    ### Tree level 1 ###
+
+        X1 ---C_12--- X2 ---C_23--- X3 ---C_34--- X4
+
+    ### Tree level 2 ###
+
+        F(X1|X2) ---C_13|2--- F(X3|X2)
+        F(X2|X3) ---C_24|3--- F(X4|X3)
+
+    ### Tree level 3 ###
+
+        F(X1|X2,X3) ---C_14|23--- F(X4|X2,X3)
+
+    Every node below the top tree is an edge of the tree above and
+    carries two conditional distributions, one for each end of the path
+    segment it spans.  The pair copula at edge \f$ (i, i+j) \f$ of tree
+    \f$ j \f$ couples
+
+    \f[ F(x_i|x_{i+1},...,x_{i+j-1}), \ F(x_{i+j}|x_{i+1},...,x_{i+j-1}) \f]
+
+    The n-dimensional density of a D-vine copula is given by:
+
+    \f[ \prod_{k=1}^n f(x_k) \prod_{j=1}^{n-1}
+    \prod_{i=1}^{n-j} c_{i,i+j|i+1,...i+j-1}
+    (F(x_i|x_{i+1}...,x_{i+j-1}), F(x_{i+j}|x_{i+1}...,x_{i+j-1}))\f]
+
+    Sampling and density evaluation are carried out on whole sample arrays
+    edge by edge over the compiled vine matrix, see compileVine().
+    """
+    def __init__(self, data, dataWeights=None, **kwargs):
+        """!
+        @param data <b>DataFrame</b> ranked data set
+        @param dataWeights <b>np_1darray</b> (optional) data weights
+        @param pathOrder <b>list</b> (optional) fixed variable ordering of
+            the first tree.  By default the ordering is selected from the
+            data.
+        """
+        super(Dvine, self).__init__(data, dataWeights, **kwargs)
+        self.nLevels = int(data.shape[1] - 1)
+        self.vine = []
+        self.pathOrder = kwargs.get("pathOrder", None)
+
+    def constructVine(self):
+        """!
+        @brief Sequentially construct the vine structure.
+        Construct the top-level tree first, then build all
+        tree levels in order.
+        """
+        with self._fitExecutor() as executor:
+            # 0th tree build
+            tree0 = Dtree(self.data, lvl=0, trial_copula=self.trial_copula_dict,
+                          rankDtype=self.rankDtype, pathOrder=self.pathOrder,
+                          indepAlpha=self.indepAlpha)
+            tree0.seqCopulaFit(cache=self.tournamentCache, executor=executor,
+                               shareDir=self.shareDir)
+            self.pathOrder = tree0.nodeOrder
+            self.vine.append(tree0)
+            # build all other trees
+            for level in range(1, self.nLevels):
+                treeT = Dtree(self.vine[level - 1].evalH(),
+                              lvl=level,
+                              parentTree=self.vine[level - 1],
+                              trial_copula=self.trial_copula_dict,
+                              rankDtype=self.rankDtype,
+                              indepAlpha=self.indepAlpha)
+                treeT.seqCopulaFit(cache=self.tournamentCache, executor=executor,
+                                   shareDir=self.shareDir)
+                self.vine.append(treeT)
+        self.vine[-1].evalH()
+        self.compileVine()
+
+    def pathCopulas(self):
+        """!
+        @brief Fitted pair copula models of each tree in path order.
+        @return <b>list</b> of <b>list</b> of (copula, params) tuples.
+            Entry [j][k] is the copula between the k-th and the
+            (k+j+1)-th variable of the path.
+        """
+        pcc = []
+        for treeL in self.vine:
+            pcc.append([(treeL.tree[n0][n1]["pc"].copulaModel,
+                         treeL.tree[n0][n1]["pc"].copulaParams[1])
+                        for n0, n1 in treeL.pathEdges()])
+        return pcc
+
+    def compileMatrix(self):
+        """!
+        @brief Encode the fitted vine as a VineMatrix.
+        @return <b>starvine.vine.vine_matrix.VineMatrix</b>
+        """
+        labels = list(self.data.columns)
+        path = [labels.index(label) for label in self.pathOrder]
+        pcc = self.pathCopulas()
+        treeEdges = [[(path[k], path[k + j + 1], frozenset(path[k + 1:k + j + 1]), (j, k))
+                      for k in range(len(treeCopulas))]
+                     for j, treeCopulas in enumerate(pcc)]
+        M, edgeKeys = rvineMatrix(treeEdges, len(labels))
+        entries = {}
+        for (k, i), (j, kk) in edgeKeys.items():
+            copula, params = pcc[j][kk]
+            # the first copula argument is the left end of the path segment
+            entries[(k, i)] = (copula.name, copula.rotation, params, M[i, i] != path[kk])
+        return VineMatrix.fromEntries(labels, M, entries)
+
+
+class Dtree(Vtree):
+    """!
+    @brief A D-tree is a path.
+    Each level of a drawable vine is a D-tree.
+    """
+    def __init__(self, data, lvl=None, **kwargs):
+        """!
+        @brief A single tree within vine.
+        @param data <b>DataFrame</b>  multivariate data set.
+            In the top tree each data column is assigned to a node.  In
+            lower trees each node owns two columns labeled (node, 0) and
+            (node, 1), the conditional distribution of the left and right
+            end of the path segment spanned by the node.
+        @param lvl <b>int</b>: tree level in the vine
+        @param pathOrder <b>list</b> (optional) fixed node ordering
+            of the top tree.
+        """
+        self.nodeOrder = kwargs.get("pathOrder", None)
+        super(Dtree, self).__init__(data, lvl, **kwargs)
+
+    def buildNodes(self):
+        """!
+        @brief Assign data columns to networkx nodes.
+        """
+        if self.level == 0:
+            return super(Dtree, self).buildNodes()
+        self.nodeOrder = []
+        for colName in self.store.labels:
+            if colName[0] not in self.nodeOrder:
+                self.nodeOrder.append(colName[0])
+        for node in self.nodeOrder:
+            self.tree.add_node(node, data=(self.store.column((node, 0)),
+                                           self.store.column((node, 1))))
+
+    def pathEdges(self):
+        """!
+        @brief Edges of the tree in path order.
+        """
+        return list(zip(self.nodeOrder[:-1], self.nodeOrder[1:]))
+
+    def evalH(self):
+        """!
+        @brief Define nodes of the T+1 level tree.  Both conditional
+        distributions of each edge are passed to the next tree level.
+        @return <b>ColumnStore</b> : conditional distributions at tree edges.
+            Column (edge, 0) holds F(left|right) and (edge, 1)
+            holds F(right|left).
+        """
+        edges = self.pathEdges()
+        condBuffer = np.empty((self.store.shape[0], 2 * len(edges)), order='F')
+        condLabels = []
+        for i, (n0, n1) in enumerate(edges):
+            pair = self.tree[n0][n1]["pc"]
+            params = pair.copulaParams[1]
+            condBuffer[:, 2 * i] = pair.copulaModel.hT(pair.UU, pair.VV, *params)
+            condBuffer[:, 2 * i + 1] = pair.copulaModel.h(pair.UU, pair.VV, *params)
+            condLabels += [((n0, n1), 0), ((n0, n1), 1)]
+        return self._nextStore(condBuffer, condLabels)
+
+    # ---------------------------- PRIVATE METHODS ------------------------------ #
+    def _edgeColumns(self, n0, n1):
+        """!
+        @brief The pair copula between path neighbors n0, n1 couples the
+        left end of n0 with the right end of n1.
+        """
+        if self.level == 0:
+            return n0, n1
+        return (n0, 0), (n1, 1)
+
+    def _edgeOutputs(self, n0, n1):
+        """! @brief See evalH() """
+        return ((n0, n1), 0), ((n0, n1), 1)
+
+    def _optimNodePairs(self):
+        """!
+        @brief Selects the node ordering of the path.  In the top tree
+        the path maximizes the sum of abs(kendall's tau) between
+        neighbors.  Lower trees follow the ordering of the tree above.
+        @return <b>list</b> List of len 3 <b>tuples</b>:
+
+            [(dataLabel_1, dataLabel_2, kTau), ...]
+        """
+        if self.nodeOrder is None:
+            tauMatrix = self._kTauMatrix()
+            path = maxTauPath(np.abs(tauMatrix))
+            self.nodeOrder = [self.store.labels[i] for i in path]
+            print("Tree level: %d, path: %s, Ktau Metric: %f" %
+                  (self.level, str(self.nodeOrder),
+                   np.sum(np.abs(tauMatrix[path[:-1], path[1:]]))))
+            return [(self.nodeOrder[k], self.nodeOrder[k + 1], tauMatrix[path[k], path[k + 1]])
+                    for k in range(len(path) - 1)]
+        nodePairs = []
+        for n0, n1 in self.pathEdges():
+            c0, c1 = self._edgeColumns(n0, n1)
+            tau = kendalltau(self.store.rankColumn(c0), self.store.rankColumn(c1))[0]
+            nodePairs.append((n0, n1, tau))
+        return nodePairs
+
+    def _kTauMatrix(self):
+        """!
+        @brief Matrix of pairwise empirical kendall's tau of the tree data.
+        """
+        return kendalltau_matrix(self.store.ranks)
+
+
+def maxTauPath(weights, nTrials=None):
+    """!
+    @brief Approximate max weight Hamiltonian path (TSP heuristic).
+    A greedy path is grown from both ends starting at each
+    of the nTrials strongest edges, then improved by 2-opt moves.
+    @param weights <b>np_2darray</b> symmetric (d, d) edge weights
+    @param nTrials <b>int</b> (optional) number of greedy starts.
+    @return <b>list</b> of node indices in path order
+    """
+    weights = np.array(weights, dtype=np.float64)
+    d = weights.shape[0]
+    if d < 3:
+        return list(range(d))
+    np.fill_diagonal(weights, -np.inf)
+    nTrials = min(d, 10) if nTrials is None else nTrials
+    upper = np.triu_indices(d, 1)
+    startEdges = np.argsort(-weights[upper])[:nTrials]
+    bestPath, bestWeight = None, -np.inf
+    for e in startEdges:
+        path = _twoOpt(_greedyPath(weights, upper[0][e], upper[1][e]), weights)
+        pathWeight = np.sum(weights[path[:-1], path[1:]])
+        if pathWeight > bestWeight:
+            bestPath, bestWeight = path, pathWeight
+    return list(bestPath)
+
+
+def _greedyPath(weights, i, j):
+    """!
+    @brief Grows a path from edge (i, j) by appending the strongest
+    remaining neighbor at either end.
+    """
+    d = weights.shape[0]
+    path = [i, j]
+    free = np.ones(d, dtype=bool)
+    free[[i, j]] = False
+    while len(path) < d:
+        w_head = np.where(free, weights[path[0]], -np.inf)
+        w_tail = np.where(free, weights[path[-1]], -np.inf)
+        if w_head.max() > w_tail.max():
+            k = np.argmax(w_head)
+            path.insert(0, k)
+        else:
+            k = np.argmax(w_tail)
+            path.append(k)
+        free[k] = False
+    return np.array(path)
+
+
+def _twoOpt(path, weights, maxIter=100):
+    """!
+    @brief Improve an open path by segment reversals.
+    Reversing path[i:j+1] replaces the edges (p[i-1], p[i]) and
+    (p[j], p[j+1]) by (p[i-1], p[j]) and (p[i], p[j+1]).
+    """
+    d = len(path)
+    for _ in range(maxIter):
+        improved = False
+        for i in range(d - 1):
+            j = np.arange(i + 1, d)
+            gain = np.zeros(len(j))
+            if i > 0:
+                gain += weights[path[i - 1], path[j]] - weights[path[i - 1], path[i]]
+            inner = j < d - 1
+            gain[inner] += weights[path[i], path[j[inner] + 1]] - \
+                weights[path[j[inner]], path[j[inner] + 1]]
+            k = np.argmax(gain)
+            if gain[k] > 1e-12:
+                path[i:j[k] + 1] = path[i:j[k] + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return path
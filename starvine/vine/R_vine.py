@@ -0,0 +1,273 @@
+##
+# \brief Regular vine (R-vine) structure.
+# Each tree in the vine is selected as the maximum spanning tree
+# of abs(empirical kendall's tau) among all edges which satisfy the
+# proximity condition (Dissmann's algorithm).  The fitted vine is stored
+# as an R-vine matrix.
+#
+from __future__ import print_function, absolute_import, division
+from starvine.vine.base_vine import BaseVine
+from scipy.stats import kendalltau
+from starvine.bvcopula.pc_base import kendalltau_matrix
+import networkx as nx
+import numpy as np
+from starvine.vine.tree import Vtree
+from starvine.vine.vine_matrix import VineMatrix
+
+
+class Rvine(BaseVine):
+    """!
+    @brief Regular vine (R-vine).  Provides methods to select the vine
+    structure and fit pair copula constructions sequentially, and to
+    draw samples from and evaluate the density of a constructed R-vine.
+    Base class starvine.vine.base_vine.BaseVine .
+
+    Tree \f$ T_1 \f$ is the maximum spanning tree on the complete graph
+    of the data columns with edge weights \f$ |\tau| \f$.  The nodes of
+    tree \f$ T_{j+1} \f$ are the edges of \f$ T_j \f$.  Two nodes may
+    only be joined if the corresponding edges of \f$ T_j \f$ share a node
+    (proximity condition).  Among the admissible edges the maximum spanning
+    tree is selected.  Each level costs \f$ O(d^2 \log d) \f$ for the
+    spanning tree on top of the \f$ O(d^2) \f$ kendall's tau evaluations.
+
+    The fitted vine is summarized by the lower triangular R-vine matrix
+    \f$ M \f$ (self.vineMatrix).  Entry \f$ (k, i), k > i \f$ encodes the pair
+    copula with conditioned set \f$ \{M_{i,i}, M_{k,i}\} \f$ and conditioning
+    set \f$ \{M_{k+1,i}, ..., M_{d,i}\} \f$.
+
+    See: J. Dissmann, et. al. Selecting and estimating regular vine
+    copulae and application to financial returns.  Computational Statistics
+    and Data Analysis. 2013.
+    """
+    def __init__(self, data, dataWeights=None, **kwargs):
+        super(Rvine, self).__init__(data, dataWeights, **kwargs)
+        self.nLevels = int(data.shape[1] - 1)
+        self.vine = []
+
+    def constructVine(self):
+        """!
+        @brief Sequentially construct the vine structure.
+        Construct the top-level tree first, then build all
+        tree levels in order.
+        """
+        with self._fitExecutor() as executor:
+            # 0th tree build
+            tree0 = Rtree(self.data, lvl=0, trial_copula=self.trial_copula_dict,
+                          rankDtype=self.rankDtype,
+                          indepAlpha=self.indepAlpha)
+            tree0.seqCopulaFit(cache=self.tournamentCache, executor=executor,
+                               shareDir=self.shareDir)
+            self.vine.append(tree0)
+            # build all other trees
+            for level in range(1, self.nLevels):
+                treeT = Rtree(self.vine[level - 1].evalH(),
+                              lvl=level,
+                              parentTree=self.vine[level - 1],
+                              trial_copula=self.trial_copula_dict,
+                              rankDtype=self.rankDtype,
+                              indepAlpha=self.indepAlpha)
+                treeT.seqCopulaFit(cache=self.tournamentCache, executor=executor,
+                                   shareDir=self.shareDir)
+                self.vine.append(treeT)
+        self.vine[-1].evalH()
+        self.buildVineMatrix()
+        self.compileVine()
+
+    def buildVineMatrix(self):
+        """!
+        @brief Encode the fitted trees as an R-vine matrix.
+        Sets self.vineMatrix, a (d, d) int array of data column indices
+        (-1 above the diagonal), and self.matrixEdges which maps each
+        (row, col) entry below the diagonal to its (tree level, edge) in
+        the vine.
+        @return <b>np_2darray</b> R-vine matrix
+        """
+        labels = list(self.data.columns)
+        treeEdges = []
+        for lvl, treeL in enumerate(self.vine):
+            treeEdges.append([])
+            for n0, n1, data in treeL.tree.edges(data=True):
+                v0, v1, cond = treeL.conditionedSets(*data["id"])
+                treeEdges[lvl].append((labels.index(v0), labels.index(v1),
+                                       frozenset(labels.index(c) for c in cond),
+                                       data["id"]))
+        self.vineMatrix, edgeKeys = rvineMatrix(treeEdges, len(labels))
+        self.matrixEdges = {}
+        for (k, i), edgeID in edgeKeys.items():
+            self.matrixEdges[(k, i)] = (len(labels) - 1 - k, edgeID)
+        return self.vineMatrix
+
+    def compileMatrix(self):
+        """!
+        @brief Encode the fitted vine as a VineMatrix.
+        @return <b>starvine.vine.vine_matrix.VineMatrix</b>
+        """
+        if not hasattr(self, "vineMatrix"):
+            self.buildVineMatrix()
+        labels = list(self.data.columns)
+        exported = [treeL._exportTree() for treeL in self.vine]
+        entries = {}
+        for (k, i), (lvl, edgeID) in self.matrixEdges.items():
+            first = labels.index(self.vine[lvl].conditionedSets(*edgeID)[0])
+            entries[(k, i)] = exported[lvl][edgeID] + (first != self.vineMatrix[i, i],)
+        return VineMatrix.fromEntries(labels, self.vineMatrix, entries)
+
+
+class Rtree(Vtree):
+    """!
+    @brief A tree within a regular vine.
+    """
+    def __init__(self, data, lvl=None, **kwargs):
+        """!
+        @brief A single tree within vine.
+        @param data <b>DataFrame</b>  multivariate data set.
+            In the top tree each data column is assigned to a node.  In
+            lower trees each node owns two columns labeled (node, var):
+            the conditional distribution of each variable in the node's
+            conditioned set given the rest of the node's complete set.
+        @param lvl <b>int</b>: tree level in the vine
+        """
+        super(Rtree, self).__init__(data, lvl, **kwargs)
+
+    def buildNodes(self):
+        """!
+        @brief Assign data columns to networkx nodes.  Sets the complete
+        set (all data labels below a node) of every node.
+        """
+        if self.level == 0:
+            self.completeSet = dict((colName, frozenset([colName]))
+                                    for colName in self.store.labels)
+            return super(Rtree, self).buildNodes()
+        parentSet = self.upperTree.completeSet
+        self.completeSet = {}
+        for colName in self.store.labels:
+            node = colName[0]
+            if node not in self.completeSet:
+                self.completeSet[node] = parentSet[node[0]] | parentSet[node[1]]
+                self.tree.add_node(node, data={})
+            self.tree.nodes[node]["data"][colName[1]] = self.store.column(colName)
+
+    def conditionedSets(self, n0, n1):
+        """!
+        @brief Conditioned and conditioning sets of the edge between n0 and n1.
+        @return (var_0, var_1, conditioning set) where var_0 belongs to n0
+        """
+        if self.level == 0:
+            return n0, n1, frozenset()
+        cs0, cs1 = self.completeSet[n0], self.completeSet[n1]
+        return list(cs0 - cs1)[0], list(cs1 - cs0)[0], cs0 & cs1
+
+    def evalH(self):
+        """!
+        @brief Define nodes of the T+1 level tree.  Both conditional
+        distributions of each edge are passed to the next tree level.
+        @return <b>ColumnStore</b> : conditional distributions at tree edges.
+            Column (edge, var) holds F(var|other var, conditioning set).
+        """
+        edges = list(self.tree.edges(data=True))
+        condBuffer = np.empty((self.store.shape[0], 2 * len(edges)), order='F')
+        condLabels = []
+        for i, (u, v, data) in enumerate(edges):
+            pair, edgeID = data["pc"], data["id"]
+            v0, v1, cond = self.conditionedSets(*edgeID)
+            params = pair.copulaParams[1]
+            condBuffer[:, 2 * i] = pair.copulaModel.hT(pair.UU, pair.VV, *params)
+            condBuffer[:, 2 * i + 1] = pair.copulaModel.h(pair.UU, pair.VV, *params)
+            condLabels += [(edgeID, v0), (edgeID, v1)]
+        return self._nextStore(condBuffer, condLabels)
+
+    # ---------------------------- PRIVATE METHODS ------------------------------ #
+    def _edgeColumns(self, n0, n1):
+        """!
+        @brief The pair copula between n0 and n1 couples the conditioned
+        variables of the two nodes.
+        """
+        if self.level == 0:
+            return n0, n1
+        v0, v1, cond = self.conditionedSets(n0, n1)
+        return (n0, v0), (n1, v1)
+
+    def _edgeOutputs(self, n0, n1):
+        """! @brief See evalH() """
+        v0, v1, cond = self.conditionedSets(n0, n1)
+        return ((n0, n1), v0), ((n0, n1), v1)
+
+    def _candidatePairs(self):
+        """!
+        @brief All node pairs which satisfy the proximity condition.
+        """
+        nodes = list(self.tree.nodes())
+        if self.level == 0:
+            return [(nodes[i], nodes[j]) for i in range(len(nodes))
+                    for j in range(i + 1, len(nodes))]
+        # nodes are edges of the upper tree which share an upper node
+        upper = self.upperTree.tree
+        pairs = []
+        for p in upper.nodes():
+            incident = [upper[p][q]["id"] for q in upper.neighbors(p)]
+            pairs += [(incident[i], incident[j]) for i in range(len(incident))
+                      for j in range(i + 1, len(incident))]
+        return pairs
+
+    def _optimNodePairs(self):
+        """!
+        @brief Computes the maximum spanning tree with edge weights
+        abs(kendall's tau) among all admissible node pairs.
+        @return <b>list</b> List of len 3 <b>tuples</b>:
+
+            [(dataLabel_1, dataLabel_2, kTau), ...]
+        """
+        trialGraph = nx.Graph()
+        if self.level == 0:
+            tauMatrix = kendalltau_matrix(self.store.ranks)
+            labels = self.store.labels
+            for i in range(len(labels)):
+                for j in range(i + 1, len(labels)):
+                    trialGraph.add_edge(labels[i], labels[j], weight=abs(tauMatrix[i, j]),
+                                        kTau=tauMatrix[i, j])
+        for n0, n1 in self._candidatePairs() if self.level > 0 else []:
+            c0, c1 = self._edgeColumns(n0, n1)
+            kTau = kendalltau(self.store.rankColumn(c0), self.store.rankColumn(c1))[0]
+            trialGraph.add_edge(n0, n1, weight=abs(kTau), kTau=kTau)
+        mst = nx.maximum_spanning_tree(trialGraph, weight="weight")
+        print("Tree level: %d, Ktau Metric: %f" % (self.level, mst.size(weight="weight")))
+        return [(n0, n1, data["kTau"]) for n0, n1, data in mst.edges(data=True)]
+
+
+def rvineMatrix(treeEdges, d):
+    """!
+    @brief Encode a regular vine as an R-vine matrix.
+    Columns are filled left to right.  Each column removes one variable
+    from the vine: a variable of the conditioned set of the single edge
+    left in the deepest remaining tree, along with the chain of edges
+    that conditions it on every other remaining variable.
+    @param treeEdges <b>list</b> of <b>list</b>.  treeEdges[l] holds the
+        edges of tree l as (var_0, var_1, conditioning set, key) tuples.
+    @param d <b>int</b> number of variables
+    @return (M, edgeKeys).  M is the (d, d) vine matrix and edgeKeys
+        maps each entry (row, col) below the diagonal to its edge key.
+    """
+    remaining = [list(edges) for edges in treeEdges]
+    M = -np.ones((d, d), dtype=int)
+    edgeKeys = {}
+    for i in range(d - 1):
+        lvl = d - 2 - i
+        assert len(remaining[lvl]) == 1
+        a, b, cond, key = remaining[lvl].pop()
+        M[i, i], M[i + 1, i] = a, b
+        edgeKeys[(i + 1, i)] = key
+        # peel the conditioning set of a one variable per tree
+        for k in range(i + 2, d):
+            lvl = d - 1 - k
+            for j, (e0, e1, eCond, eKey) in enumerate(remaining[lvl]):
+                if a in (e0, e1) and (eCond | frozenset([e0, e1])) == cond | frozenset([a]):
+                    break
+            else:
+                raise RuntimeError("Edge set does not form a regular vine.")
+            c = e1 if e0 == a else e0
+            M[k, i] = c
+            edgeKeys[(k, i)] = eKey
+            remaining[lvl].pop(j)
+            cond = cond - frozenset([c])
+    M[d - 1, d - 1] = M[d - 1, d - 2]
+    return M, edgeKeys
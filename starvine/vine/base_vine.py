@@ -1,11 +1,12 @@
 ##
 # \brief Base vine class
 import matplotlib.pyplot as plt
-from scipy.optimize import minimize
 import networkx as nx
 import numpy as np
 import pandas as pd
 from six import iteritems
+from starvine.vine.vine_mle import VineLikelihood
+from starvine.bvcopula.pc_workers import workerPool
 # from starvine.mvar.mv_plot import matrixPairPlot
 
 
@@ -19,12 +20,36 @@ class BaseVine(object):
                 kwargs.get("trial_copula", self._all_trial_copula))
         self.data = data
         self.weights = dataWeights
+        # optional starvine.bvcopula.pc_cache.TournamentCache
+        self.tournamentCache = kwargs.get("tournamentCache", None)
+        # storage type of ranked data in each tree, np.float32 or np.float64
+        self.rankDtype = kwargs.get("rankDtype", np.float64)
+        # edges which do not reject independence at this significance
+        # level are independence copulas and are not fit.  0 is off
+        self.indepAlpha = kwargs.get("indepAlpha", 0.0)
+        # optional concurrent.futures style executor used to fit the
+        # edges of each tree level.  If only nWorkers is given a process
+        # pool is started for the duration of constructVine()
+        self.executor = kwargs.get("executor", None)
+        self.nWorkers = kwargs.get("nWorkers", None)
+        # parent directory of the data files shared with the workers,
+        # must be visible to all workers.  Default is /dev/shm
+        self.shareDir = kwargs.get("shareDir", None)
+
+    def _fitExecutor(self):
+        """!
+        @brief Executor used to fit the edges within each tree level.
+        Yields None (sequential fitting) if neither an executor nor
+        nWorkers > 1 was given.  See starvine.bvcopula.pc_workers.workerPool()
+        """
+        return workerPool(self.executor, self.nWorkers)
 
     def _validate_trial_copula(self, trial_copula):
         assert isinstance(trial_copula, dict)
         for key, val in iteritems(trial_copula):
             assert key in self._all_trial_copula
             assert self._all_trial_copula[key] == val
+        return trial_copula
 
     @property
     def _all_trial_copula(self):
@@ -45,26 +70,62 @@ class BaseVine(object):
                          }
         return default_copula
 
-    def loadVineStructure(self, vS):
+    def compileMatrix(self):
+        """!
+        @brief Encode the fitted vine as a VineMatrix.
+        Virtual function.
+        @return <b>starvine.vine.vine_matrix.VineMatrix</b>
+        """
+        raise NotImplementedError
+
+    def compileVine(self):
+        """!
+        @brief Precompile the fitted vine for array based sampling and
+        density evaluation.  Sets self.matrix, the VineMatrix of the vine
+        with its precomputed evaluation order.  After compilation the
+        networkx trees are not traversed by sample() and logpdf().
+        @return <b>starvine.vine.vine_matrix.VineMatrix</b>
+        """
+        self.matrix = self.compileMatrix()
+        self.matrix.compile()
+        return self.matrix
+
+    def saveVine(self, fname):
+        """!
+        @brief Save the fitted vine structure, pair copula families,
+        rotations and parameters.  The training data is not stored.
+        @param fname <b>str</b> .npz or .json file name
+        """
+        self.compileMatrix().save(fname)
+
+    @staticmethod
+    def loadVineStructure(vS):
         """!
         @brief Load saved vine structure
+        @param vS <b>str</b> file written by saveVine() or a
+            <b>starvine.vine.vine_matrix.VineMatrix</b>
+        @return <b>starvine.vine.vine_matrix.MatrixVine</b> vine which
+            can be sampled from and evaluated without refitting.
         """
-        pass
+        from starvine.vine.vine_matrix import VineMatrix, MatrixVine
+        if not isinstance(vS, VineMatrix):
+            vS = VineMatrix.load(vS)
+        return MatrixVine(vS)
 
-    def vineNLLH(self, vineParams=[None], **kwargs):
+    def vineNLLH(self, vineParams=None, **kwargs):
         """!
         @brief Compute the vine negative log likelihood.  Used for
         simulatneous MLE estimation of PCC model parameters.
-        Loops through all tree levels and sums all NLL.
-        @param vineParams <b>np_array</b>  Flattened array of all copula parametrs in vine
+        The conditional distributions are propagated through all tree
+        levels with the given parameters.
+        See starvine.vine.vine_mle.VineLikelihood
+        @param vineParams <b>np_array</b>  Flattened array of all copula parametrs in vine.
+            Default is the current parameters.
         """
-        if not any(vineParams):
-            self._initVineParams()
-        self.nLLH = 0.
-        for lvl, tree in enumerate(self.vine):
-            treeNLLH = tree.treeNLLH(vineParams[self.vineParamsMap[lvl]:
-                                                self.vineParamsMap[lvl + 1]])
-            self.nLLH += treeNLLH
+        vineLLH = VineLikelihood(self, self.weights)
+        if vineParams is None:
+            vineParams = vineLLH.theta0
+        self.nLLH = -vineLLH.logLike(vineParams)
         return self.nLLH
 
     def _initVineParams(self):
@@ -77,13 +138,26 @@ class BaseVine(object):
     def sfitMLE(self, **kwargs):
         """!
         @brief Simulataneously estimate all copula paramters in the
-        vine by MLE.  Uses SLSQP method by default.
+        vine by MLE, starting from the sequential estimates.
+        The copula families are kept.  Each parameter stays within its
+        copula's thetaBounds.
+        @param blockwise <b>bool</b> (optional) block coordinate updates,
+            one tree level at a time.  Default is True.
+        @param maxSweeps <b>int</b> (optional) max number of sweeps over
+            the tree levels.  Default is 10.
+        @param method <b>str</b> (optional) bounded scipy minimize method.
+            Default is L-BFGS-B.
+        @param tol <b>float</b> (optional) convergence tolerance
+        @return <b>float</b> vine log likelihood at the fitted parameters
         """
-        self._initVineParams()
-        params0 = np.array(self.vineParams).flatten()
-        self.fittedParams = minimize(self.vineNLLH, params0, args=(),
-                                     method=kwargs.pop("method", "SLSQP"),
-                                     tol=kwargs.pop("tol", 1e-5))
+        vineLLH = VineLikelihood(self, self.weights)
+        self.fittedParams = vineLLH.fit(**kwargs)
+        vineLLH.apply(self.fittedParams)
+        for tree in self.vine:
+            tree._initTreeParamMap()
+        self.nLLH = -vineLLH.logLike(self.fittedParams)
+        self.compileVine()
+        return -self.nLLH
 
     def treeHfun(self, level=0):
         """!
@@ -97,56 +171,59 @@ class BaseVine(object):
     def sample(self, n=1000):
         """!
         @brief Draws n samples from the vine.
+        Each variable is drawn in the sampling order by inverting its
+        conditional distribution given all previously drawn variables, for
+        the whole sample at once over the compiled vine matrix.
+        See: K. Aas, et. al. Pair-copula constructions of multiple
+        dependence. Insurance: Mathematics and Economics. 2009. Algorithm 1.
         @param n int. number of samples to draw
         @returns  size == (n, nvars) <b>pandas.DataFrame</b>
             samples from vine
         """
-        # gen random samples
-        u_n0 = np.random.rand(n)
-        u_n1 = np.random.rand(n)
-
-        # obtain edge from last tree in vine
-        current_tree = self.vine[-1]
-        n0, n1 = list(current_tree.tree.edges())[0]
-        edge_info = current_tree.tree[n0][n1]
-
-        # sample from edge of last tree
-        u_n1 = edge_info["hinv-dist"](u_n0, u_n1)
-        edge_sample = {n0: u_n0, n1: u_n1}
-        # matrixPairPlot(pd.DataFrame(edge_sample), savefig="c_test/tree_1_edge_sample.png")
-
-        # store edge sample inside graph data struct
-        current_tree.tree[n0][n1]['sample'] = edge_sample
-
-        # Three nodes in the above tree that contributed to the
-        # construction of this edge.
-        # Node labels according to  (prev_n0|prev_n2), (prev_n1|prev_n2)
-        # Only applicable if the vine has atleast 2 levels
-        if len(self.vine) > 1:
-            prev_n0, prev_n1, prev_n2 = edge_info['one-fold']
-
-            ## \brief Entrance to starvine.vine.tree.Vtree._sampleEdge()
-            current_tree._sampleEdge(prev_n0, prev_n2, n0, n1, n, self.vine)
-            current_tree._sampleEdge(prev_n1, prev_n2, n0, n1, n, self.vine)
+        if not hasattr(self, "matrix"):
+            self.compileVine()
+        return pd.DataFrame(self.matrix.sample(n), columns=self.data.columns)
 
-        sample_result = {}
-        tree_0 = self.vine[0].tree
-        for edge in tree_0.edges():
-            n0, n1 = edge
-            edge_info = tree_0[n0][n1]
-            if not n0 in list(sample_result.keys()):
-                sample_result[n0] = edge_info['sample'][n0]
-            if not n1 in list(sample_result.keys()):
-                sample_result[n1] = edge_info['sample'][n1]
-
-        # clean up
-        for base_tree in self.vine:
-            for edge in base_tree.tree.edges():
-                n0, n1 = edge
-                base_tree.tree[n0][n1].pop('sample')
-
-        # convert sample dict of arrays to dataFrame
-        return pd.DataFrame(sample_result)
+    def logpdf(self, U, chunkSize=65536, executor=None):
+        """!
+        @brief Log density of the vine copula.
+        The conditional distributions are propagated tree by tree over
+        chunks of rows of U.
+        See: K. Aas, et. al. Pair-copula constructions of multiple
+        dependence. Insurance: Mathematics and Economics. 2009. Algorithm 3.
+        @param U <b>DataFrame</b> or <b>np_2darray</b> of shape (n, nvars).
+            Points in the unit hypercube.  Columns are in the order of
+            the data columns.
+        @param chunkSize <b>int</b> number of rows evaluated at once
+        @param executor (optional) concurrent.futures style executor
+            used to evaluate the chunks in parallel.
+        @return <b>np_1darray</b> log density at each point
+        """
+        logp = self._mapChunks("logpdf", U, chunkSize, executor)
+        return np.concatenate(logp) if logp else np.zeros(0)
+
+    def pdf(self, U, chunkSize=65536, executor=None):
+        """!
+        @brief Density of the vine copula.  See logpdf()
+        @param U <b>DataFrame</b> or <b>np_2darray</b> of shape (n, nvars).
+        @return <b>np_1darray</b> density at each point
+        """
+        return np.exp(self.logpdf(U, chunkSize, executor))
+
+    def _mapChunks(self, method, U, chunkSize, executor):
+        """!
+        @brief Apply a VineMatrix method to chunks of rows of U.
+        @param method <b>str</b> name of the VineMatrix method
+        @return <b>list</b> of results, one per chunk
+        """
+        if not hasattr(self, "matrix"):
+            self.compileVine()
+        if isinstance(U, pd.DataFrame):
+            U = U[list(self.data.columns)].values
+        U = np.asarray(U)
+        chunks = [U[i:i + chunkSize] for i in range(0, U.shape[0], chunkSize)]
+        mapper = map if executor is None else executor.map
+        return list(mapper(getattr(self.matrix, method), chunks))
 
     def sampleScale(self, n, frozen_margin_dict):
         """!
@@ -3,8 +3,7 @@
 # vine can be described as a tree.
 #
 from pandas import DataFrame
-from itertools import chain
-from starvine.bvcopula import pc_base as pc
+from starvine.bvcopula.pc_store import ColumnStore
 import networkx as nx
 import numpy as np
 
@@ -13,16 +12,28 @@ class Vtree(object):
     def __init__(self, data, lvl, parentTree=None, **kwargs):
         """!
         @brief A generic tree within vine.
-        @param data <b>DataFrame</b>  multivariate data set. Each data
-                                      column will be assigned to a node.
+        @param data <b>DataFrame</b> or <b>ColumnStore</b> multivariate data
+            set. Each data column will be assigned to a node.  Lower trees
+            receive the ColumnStore returned by the evalH() of the tree
+            above, which is used without a copy.
         @param lvl <b>int</b>: tree level in the vine
         @param weights <b>DataFrame</b>: (optional) data weights
         @param labels <b>list</b> of <b>str</b> or <b>ints</b>: (optional) data labels
+        @param rankDtype <b>np.dtype</b>: (optional) storage type of the
+            ranked data.  See starvine.bvcopula.pc_store.ColumnStore
+        @param indepAlpha <b>float</b>: (optional) significance level of the
+            edge independence pre-test.  See PairCopula.indepTest().
+            Default is 0, the pre-test is off.
         """
-        assert(type(data) is DataFrame)
+        assert(type(data) in (DataFrame, ColumnStore))
         assert(len(data.shape) == 2)
         self.trial_copula_dict = kwargs.get("trial_copula", {})
-        self.data = data
+        self.indepAlpha = kwargs.get("indepAlpha", 0.0)
+        # all nodes and edges hold views into a single column store
+        if isinstance(data, ColumnStore):
+            self.store = data
+        else:
+            self.store = ColumnStore(data, rankDtype=kwargs.get("rankDtype", np.float64))
         self._upperTree = parentTree
         #
         self.nT = data.shape[1]
@@ -32,6 +43,13 @@ class Vtree(object):
         self.buildNodes()  # Construct nodes
         self.setEdges()    # Build edges between nodes
 
+    @property
+    def data(self):
+        """!
+        @brief DataFrame view of the tree's data columns.
+        """
+        return self.store.frame()
+
     def addNode(self, dataLabel, data):
         """!
         @brief Add a node to the tree. Prevents adding duplicate nodes.
@@ -47,8 +65,8 @@ class Vtree(object):
         """!
         @brief Assign each data column to a networkx node.
         """
-        for colName in self.data:
-            self.tree.add_node(colName, data=self.data[colName])
+        for colName in self.store.labels:
+            self.tree.add_node(colName, data=self.store.column(colName))
 
     def setEdges(self, nodePairs=None):
         """!
@@ -61,16 +79,222 @@ class Vtree(object):
         for i, pair in enumerate(nodePairs):
             self.tree.add_edge(pair[0], pair[1], weight=pair[2],
                                           pc= \
-                                          pc.PairCopula(self.tree.nodes[pair[0]]["data"],
-                                                        self.tree.nodes[pair[1]]["data"],
-                                                        id=(pair[0], pair[1]),
-                                                        family=self.trial_copula_dict),
-                                          id=(pair[0], pair[1]),
-                                          edge_data={pair[0]: self.tree.nodes[pair[0]]["data"],
-                                                     pair[1]: self.tree.nodes[pair[1]]["data"]},
-                              )
+                                          self.store.pairCopula(*self._edgeColumns(pair[0], pair[1]),
+                                                                id=(pair[0], pair[1]),
+                                                                family=self.trial_copula_dict,
+                                                                indepAlpha=self.indepAlpha),
+                                          id=(pair[0], pair[1]))
         self._setEdgeTriplets()
 
+    def _nextStore(self, condBuffer, condLabels):
+        """!
+        @brief Column store of the next tree level.
+        @param condBuffer <b>np_2darray</b> (n, nEdgeOutputs) column-major
+            buffer of conditional distributions.  It backs the store
+            without a copy.
+        @param condLabels <b>list</b> label of each buffer column
+        """
+        return ColumnStore(condBuffer, labels=condLabels, rankDtype=self.store.rankDtype)
+
+    def _edgeColumns(self, n0, n1):
+        """!
+        @brief Labels of the data columns that form the pair copula
+        between nodes n0 and n1.  Each node holds a single data column
+        by default.
+        """
+        return n0, n1
+
+    def _edgeOutputs(self, n0, n1):
+        """!
+        @brief Labels of the next level's data columns which hold the
+        conditional distributions of the edge between nodes n0 and n1.
+        Virtual function.
+        @return (label of F(a|b), label of F(b|a)) where (a, b) are the
+            columns given by _edgeColumns().  A label is None if the
+            conditional distribution is not passed to the next level.
+        """
+        raise NotImplementedError
+
+    def seqCopulaFit(self, cache=None, executor=None, shareDir=None):
+        """!
+        @brief Iterate through all edges in tree, fit copula models
+        at each edge.  The edges of a tree are independent of each other
+        and may be fit concurrently.
+
+        See simultaneousCopulaFit() for a tree-wide simulltaneous
+        parameter estimation.
+        @param cache <b>TournamentCache</b> (optional) tournament result cache
+        @param executor (optional) concurrent.futures style executor.
+            The column store is published once per tree via
+            ColumnStore.share() and each worker maps the two columns of
+            its edge.  Edges are fit sequentially if None.
+        @param shareDir <b>str</b> (optional) parent directory of the
+            shared column store files.  See ColumnStore.share()
+        """
+        if executor is None:
+            for u, v, data in self.tree.edges(data=True):
+                data["pc"].copulaTournament(cache=cache)
+        else:
+            self._parCopulaFit(cache, executor, shareDir)
+        self._initTreeParamMap()
+
+    def _parCopulaFit(self, cache, executor, shareDir=None):
+        """!
+        @brief Fit the edge copulas of the tree with an executor.
+        Only the tournament results are returned by the workers.
+        """
+        pending = []
+        for u, v, data in self.tree.edges(data=True):
+            pair = data["pc"]
+            if pair.indepTest():
+                # independence copula, nothing to fit
+                pair._runTournament(vb=False)
+                continue
+            if cache is not None:
+                entry = cache.get(pair.tournamentKey())
+                if entry is not None:
+                    pair._loadTournament(entry, vb=False)
+                    continue
+            pending.append(data)
+        if not pending:
+            return
+        ref = self.store.share(shareDir)
+        try:
+            columns = [self._edgeColumns(*data["id"]) for data in pending]
+            results = executor.map(fitEdge,
+                                   [ref] * len(pending),
+                                   [c[0] for c in columns],
+                                   [c[1] for c in columns],
+                                   [data["pc"].trialFamily for data in pending],
+                                   [data["pc"].indepAlpha for data in pending])
+            for data, entry in zip(pending, results):
+                data["pc"]._loadTournament(entry, vb=False)
+                if cache is not None:
+                    cache.put(data["pc"].tournamentKey(), entry)
+        finally:
+            ColumnStore.unshare(ref)
+
+    def isIndependent(self, alpha=None):
+        """!
+        @brief Test the edges of the tree for independence before any
+        copula is fit.  See PairCopula.indepTest()
+        @param alpha <b>float</b> (optional) significance level of the
+            kendall's tau test.  Default is self.indepAlpha
+        @return <b>bool</b> True if no edge rejects independence
+        """
+        return all(data["pc"].indepTest(alpha)
+                   for u, v, data in self.tree.edges(data=True))
+
+    def tauDrift(self, oldTree):
+        """!
+        @brief Largest change of the edge kendall's tau relative to a tree
+        with the same edges fitted to other data.
+        @param oldTree <b>Vtree</b> tree with the same edge ids
+        @return <b>float</b> max abs(kTau - old kTau) over all edges
+        """
+        oldTau = dict((tuple(data["id"]), data["weight"])
+                      for u, v, data in oldTree.tree.edges(data=True))
+        return max([abs(data["pc"].empKTau()[0] - oldTau[tuple(data["id"])])
+                    for u, v, data in self.tree.edges(data=True)] + [0.])
+
+    def warmRefit(self, oldTree, driftTol=None, cache=None):
+        """!
+        @brief Fit the edge copulas keeping the copula family of the
+        matching edge of oldTree.  Each fit starts from the old edge's
+        parameters.  The copula tournament of an edge is re-run if the
+        per sample AIC of its refit copula increased by more than driftTol,
+        or if an independence edge now rejects independence.
+        @param oldTree <b>Vtree</b> tree with the same edge ids
+        @param driftTol <b>float</b> (optional) max allowed increase of the
+            per sample AIC.  If None, the copula families are kept.
+        @param cache <b>TournamentCache</b> (optional) tournament result cache
+        @return <b>list</b> ids of the edges whose family was re-selected
+        """
+        oldPairs = dict((tuple(data["id"]), data["pc"])
+                        for u, v, data in oldTree.tree.edges(data=True))
+        reselected = []
+        for u, v, data in self.tree.edges(data=True):
+            pair, old = data["pc"], oldPairs[tuple(data["id"])]
+            data["weight"] = pair.empKTau_ if hasattr(pair, "empKTau_") else pair.empKTau()[0]
+            pair.setTrialCopula(self.trial_copula_dict)
+            pair.indepAlpha = self.indepAlpha
+            if old.copulaModel.name == 'indep':
+                pair.copulaTournament(cache=cache)
+                if pair.copulaModel.name != 'indep':
+                    reselected.append(tuple(data["id"]))
+                continue
+            family = [name for name, copula in old.copulaBank.items()
+                      if copula is old.copulaModel][0]
+            copula = pair.copulaBank[family]
+            params = pair.fitCopula(copula, thetaGuess=tuple(old.copulaParams[1]))
+            pair.copulaModel, pair.copulaParams = copula, params
+            if driftTol is not None and not \
+                    (params[2] / len(pair.UU) - old.copulaParams[2] / len(old.UU) <= driftTol):
+                pair.copulaTournament(cache=cache)
+                reselected.append(tuple(data["id"]))
+        self._initTreeParamMap()
+        return reselected
+
+    def treeAIC(self):
+        """!
+        @brief Sum of the AIC of the fitted edge copulas.  The
+        independence copula has an AIC of zero so a non-negative tree AIC
+        shows no gain over an independence tree.
+        """
+        return sum(self._getEdgeCopulaParams(u, v)[2]
+                   for u, v in self.tree.edges())
+
+    def _getEdgeCopulaParams(self, u, v):
+        """!
+        @brief Get copula paramters of particular edge in tree.
+        @returns <b>np_1darray</b> Copula parameters of edge
+        """
+        cp = self.tree.adj[u][v]["pc"].copulaParams
+        if cp is not None:
+            return cp
+        else:
+            raise RuntimeError("ERROR: Must execute sequential fit first")
+
+    def _initTreeParamMap(self):
+        """!
+        @brief Pack all copula paramters in the tree into a 1d numpy array for
+        simulatneous MLE optimization.  Sets the tree copula paramters.
+        """
+        currentMarker = 0
+        self.treeCopulaParams = []
+        edgeList = self.tree.edges(data=True)
+        for u, v, data in edgeList:
+            edgeParams = self._getEdgeCopulaParams(u, v)
+            self.treeCopulaParams.append(edgeParams[1])
+            nEdgeParams = len(edgeParams[1])
+            self.tree.adj[u][v]["paramMap"] = \
+                [currentMarker, currentMarker + nEdgeParams]
+            currentMarker += nEdgeParams
+        self.treeCopulaParams = [item for sublist in self.treeCopulaParams
+                                 for item in sublist]
+        self.treeCopulaParams = np.array(self.treeCopulaParams)
+        return self.treeCopulaParams
+
+    def treeNLLH(self, treeCopulaParams=None):
+        """!
+        @brief Compute this tree's negative log likelihood.
+        The sum of copula-log-likelihoods over all edges.
+        @param treeCopulaParams <b>np_1darray</b> Copula parameter array.
+        Contains parameters for all PCC in the tree.  The slice of each
+        edge is given by the edge's paramMap.  Default is the parameters
+        of the sequential fit.
+        """
+        if treeCopulaParams is None:
+            if not hasattr(self, "treeCopulaParams"):
+                raise RuntimeError("Sequential copula model fitting must be performed first.")
+            treeCopulaParams = self.treeCopulaParams
+        nLL = 0
+        for u, v, data in self.tree.edges(data=True):
+            nLL += data["pc"].copulaModel._nlogLike(
+                data["pc"].UU, data["pc"].VV, None, 0,
+                *treeCopulaParams[data["paramMap"][0]: data["paramMap"][1]])
+        return nLL
+
     def _setEdgeTriplets(self):
         """!
         @brief Applies to all non-zero level trees in the vine.
@@ -123,17 +347,21 @@ class Vtree(object):
         # compute edge weights
         treeStructure = []
         for pair in existingTreeStruct:
-            trialPair = \
-                pc.PairCopula(self.tree.nodes[pair[0]]["data"].values,
-                              self.tree.nodes[pair[1]]["data"].values)
+            trialPair = self.store.pairCopula(pair[0], pair[1])
             treeStructure.append((pair[0], pair[1], trialPair.empKTau()[0]))
         return treeStructure
 
     def _exportTree(self):
         """!
         @brief Export tree for later use or storage.
+        @return <b>dict</b> edge id: (family name, rotation, params)
         """
-        pass
+        exported = {}
+        for u, v, data in self.tree.edges(data=True):
+            model = data["pc"].copulaModel
+            exported[data["id"]] = (model.name, model.rotation,
+                                    np.atleast_1d(data["pc"].copulaParams[1]))
+        return exported
 
     @property
     def lowerTree(self, lowerTree=None):
@@ -169,103 +397,20 @@ class Vtree(object):
             raise ValueError("Tree setter method takes tree type only.")
         self._upperTree = uTree
 
-    def _sampleEdge(self, n0, n1, old_n0, old_n1, size, vine):
-        """!
-        @brief Sample from edge in the tree.
-
-            Sample edge marked XXX:
-            ### Current Tree ###
-            (prev_n0)          XXX             (prev_n2)                              (prev_n1)
-                n0 ---------- edge_0 ------------- n1 ------------- edge_1 -------------- n0
-                                 :                                    :
-            ### Next Tree ###
-                          (next_u_n0) -------- next_edge --------- (next_u_n1)
-
-        To go "up" the vine requires evaluation of hinv-dist
-        To traverse down the vine, evaluate the conditional h-dist function.
-
-        @param n0  Wing node in current tree
-        @param n1  central node in current tree
-        @param old_n0  Node_0 from lowerTree edge
-        @param old_n1  Node_1 from lowerTree
-        @param size <b>int</b>  sample size
-        """
-        def unrollNodes(l):
-            try:
-                flt = list(chain.from_iterable(l))
-            except:
-                return l
-            return unrollNodes(flt)
-
-        if type(n0) is int or type(n0) is np.int64 or type(n0) is str:
-            tree_num = 0
-        else:
-            # Determine tree level from number of nodes (#nodes are powers of 2)
-            tree_num = int(np.log(len(unrollNodes(n0))) / np.log(2)) - 1
-        current_tree = vine[tree_num].tree
-        next_tree = vine[tree_num + 1].tree
-        edge_info = current_tree[n0][n1]
-
-        # if both marginal samples exist on this edge,
-        # nothing to do.
-        if 'sample' in edge_info and \
-                len(edge_info['sample']) == 2:
-            return
-
-        # if u_n0 and u_n1 both dont exist, or if only u_n0 exists
-        if 'sample' not in edge_info or n1 not in edge_info['sample']:
-            if tree_num == 0:
-                u_n1 = np.random.rand(size)
-            # if we are not in the first tree:
-            # try to get u_n1 from the H-function
-            else:
-                if not self.upperTree:
-                    raise RuntimeError("Upper tree requested but unavalible.")
-                prev_n0, prev_n1, prev_n2 = edge_info["one-fold"]
-                prev_tree = vine[tree_num - 1].tree
-                if not (prev_n0, prev_n2) == n1:
-                    prev_n0 = prev_n1
-                prev_edge_info = prev_tree[prev_n0][prev_n2]
-                if 'sample' in prev_edge_info and \
-                        len(prev_edge_info['sample']) == 2:
-                    u_prev_n0 = prev_edge_info['sample'][prev_n0]
-                    u_prev_n2 = prev_edge_info['sample'][prev_n2]
-                    u_n1 = prev_edge_info["h-dist"](u_prev_n2, u_prev_n0)
-                else:
-                    u_n1 = np.random.rand(size)
-        else:
-            u_n1 = edge_info['sample'][n1]
-
-        next_tree_info = next_tree[old_n0][old_n1]
-        try:
-            u_n0 = edge_info["hinv-dist"](u_n1, next_tree_info['sample'][(n0, n1)])
-        except:
-            # u_n0 = edge_info["hinv-dist"](u_n1, next_tree_info['sample'][(n1, n0)])
-            raise RuntimeError("Edge with nodes: " + str((n0, n1)), " does not exist.")
-        edge_sample = {n0: u_n0, n1: u_n1}
-        current_tree[n0][n1]['sample'] = edge_sample
-
-        # If current tree is 0th tree: copy marginal sample to
-        # neighbor edge
-        if tree_num == 0:
-            for one_node in current_tree.neighbors(n0):
-                if 'sample' not in current_tree[n0][one_node]:
-                    edge_sample = {n0:u_n0}
-                    current_tree[n0][one_node]['sample'] = edge_sample
-                else:
-                    if n0 not in current_tree[n0][one_node]['sample']:
-                        current_tree[n0][one_node]['sample'][n0] = u_n0
-            for one_node in current_tree.neighbors(n1):
-                if 'sample' not in current_tree[n1][one_node]:
-                    edge_sample = {n1:u_n1}
-                    current_tree[n1][one_node]['sample'] = edge_sample
-                else:
-                    if n1 not in current_tree[n1][one_node]['sample']:
-                        current_tree[n1][one_node]['sample'][n1] = u_n1
-            return
 
-        # Traverse up the vine one level
-        prev_n0, prev_n1, prev_n2 = edge_info['one-fold']
-        self._sampleEdge(prev_n0, prev_n2, n0, n1, size, vine)
-        self._sampleEdge(prev_n1, prev_n2, n0, n1, size, vine)
-        return
+def fitEdge(storeRef, label0, label1, family, indepAlpha=0.0):
+    """!
+    @brief Run the copula tournament of a single edge.  Executed by the
+    workers of Vtree.seqCopulaFit().
+    @param storeRef <b>dict</b> shared column store reference.
+        See ColumnStore.share()
+    @param label0 first column label of the edge
+    @param label1 second column label of the edge
+    @param family <b>dict</b> trial copula families
+    @param indepAlpha <b>float</b> significance level of the independence pre-test
+    @return <b>dict</b> tournament result.  See PairCopula._loadTournament()
+    """
+    store = ColumnStore.attach(storeRef)
+    pair = store.pairCopula(label0, label1, family=family, indepAlpha=indepAlpha)
+    pair._runTournament(vb=False)
+    return pair._dumpTournament()
@@ -0,0 +1,167 @@
+##
+# \brief Level by level checkpoints of a vine construction.
+from __future__ import print_function, absolute_import, division
+import os
+import hashlib
+import pickle
+import numpy as np
+from six import iteritems
+from starvine.bvcopula.pc_cache import TournamentCache
+
+
+class VineCheckpoint(object):
+    """!
+    @brief Stores each completed tree level of a vine construction in a
+    local directory so that an interrupted construction can be resumed.
+
+    Every level is written as two files: level_<j>.pkl holds the root,
+    edges and tournament result of each edge, and level_<j>.npy holds the
+    pseudo-observations the tree was built on (not stored for the top
+    level, which is built on the vine's data).  Files are written to a
+    temporary name first and then moved in place, so a crash never leaves
+    a partially written level behind.  The manifest.pkl file holds a
+    content hash of the data and the construction settings; stored levels
+    which do not match the current data or settings are discarded.
+
+    Edge fits of the level in progress are stored in the edges/
+    subdirectory by a starvine.bvcopula.pc_cache.TournamentCache, so
+    edges fit before a crash are not refit.
+    """
+    def __init__(self, checkpointDir, data, settings={}):
+        """!
+        @param checkpointDir <b>str</b> checkpoint directory
+        @param data <b>DataFrame</b> data of the vine
+        @param settings <b>dict</b> construction settings which alter the
+            fitted vine
+        """
+        self.checkpointDir = checkpointDir
+        if not os.path.exists(checkpointDir):
+            os.makedirs(checkpointDir)
+        self.key = self.dataKey(data, settings)
+        self._edgeCache = None
+        self.manifest = {"key": self.key, "levels": 0, "complete": False, "structure": None}
+        stored = self._read("manifest.pkl")
+        if stored is not None and stored["key"] == self.key:
+            self.manifest = stored
+        else:
+            if stored is not None:
+                print("Checkpoint in %s does not match the data or settings, restarting."
+                      % checkpointDir)
+            self._clearLevels()
+            self._write("manifest.pkl", self.manifest)
+
+    @staticmethod
+    def dataKey(data, settings={}):
+        """!
+        @brief Content hash of the data and construction settings.
+        @return <b>str</b> hex digest
+        """
+        h = hashlib.sha1()
+        h.update(repr(list(data.columns)).encode())
+        h.update(np.ascontiguousarray(data.values, dtype=np.float64).tobytes())
+        h.update(repr(sorted(iteritems(settings))).encode())
+        return h.hexdigest()
+
+    @property
+    def levels(self):
+        """!
+        @brief Number of completed tree levels.
+        """
+        return self.manifest["levels"]
+
+    @property
+    def complete(self):
+        """!
+        @brief True if the vine construction finished.
+        """
+        return self.manifest["complete"]
+
+    @property
+    def structure(self):
+        """!
+        @brief Stored fixed tree structure, see Cvine.selectStructure()
+        """
+        return self.manifest["structure"]
+
+    def edgeCache(self):
+        """!
+        @brief Tournament cache of the edge fits of the level in progress.
+        @return <b>TournamentCache</b>
+        """
+        if self._edgeCache is None:
+            self._edgeCache = TournamentCache(cacheDir=os.path.join(self.checkpointDir, "edges"))
+        return self._edgeCache
+
+    def saveStructure(self, structure):
+        """!
+        @brief Store a fixed tree structure selected before the first level.
+        """
+        self.manifest["structure"] = structure
+        self._write("manifest.pkl", self.manifest)
+
+    def saveLevel(self, level, treeT):
+        """!
+        @brief Store a fitted tree.  Levels must be saved in order.
+        @param level <b>int</b> tree level
+        @param treeT <b>Vtree</b> fitted tree
+        """
+        assert level == self.levels
+        edges = []
+        for u, v, data in treeT.tree.edges(data=True):
+            pair = data["pc"]
+            edges.append({"id": tuple(data["id"]),
+                          "weight": data["weight"],
+                          "trialFamily": dict(pair.trialFamily),
+                          "indepAlpha": pair.indepAlpha,
+                          "tournament": pair._dumpTournament()})
+        if level > 0:
+            fname = os.path.join(self.checkpointDir, "level_%d.npy" % level)
+            with open(fname + ".tmp", 'wb') as f:
+                np.save(f, treeT.store.values)
+            os.replace(fname + ".tmp", fname)
+        self._write("level_%d.pkl" % level,
+                    {"root": getattr(treeT, "rootNodeID", None),
+                     "labels": list(treeT.store.labels),
+                     "edges": edges})
+        self.manifest["levels"] = level + 1
+        self._write("manifest.pkl", self.manifest)
+
+    def loadLevel(self, level):
+        """!
+        @brief Load a stored tree level.
+        @param level <b>int</b> tree level
+        @return (<b>dict</b> root, labels and edges of the tree,
+            <b>np_2darray</b> pseudo-observations of the tree or None
+            for the top level)
+        """
+        assert level < self.levels
+        stored = self._read("level_%d.pkl" % level)
+        values = None
+        if level > 0:
+            values = np.load(os.path.join(self.checkpointDir, "level_%d.npy" % level))
+        return stored, values
+
+    def finish(self):
+        """!
+        @brief Mark the vine construction as complete.
+        """
+        self.manifest["complete"] = True
+        self._write("manifest.pkl", self.manifest)
+
+    def _read(self, name):
+        fname = os.path.join(self.checkpointDir, name)
+        if not os.path.exists(fname):
+            return None
+        with open(fname, 'rb') as f:
+            return pickle.load(f)
+
+    def _write(self, name, obj):
+        fname = os.path.join(self.checkpointDir, name)
+        with open(fname + ".tmp", 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(fname + ".tmp", fname)
+
+    def _clearLevels(self):
+        for fname in os.listdir(self.checkpointDir):
+            if fname.startswith("level_"):
+                os.remove(os.path.join(self.checkpointDir, fname))
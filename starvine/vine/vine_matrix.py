@@ -0,0 +1,395 @@
+##
+# \brief Compact array representation of a fitted vine.
+# Any regular vine is stored as an R-vine matrix together with the
+# family code, rotation and parameters of the pair copula at each matrix
+# entry.  A stored vine is reloaded without the training data.
+#
+from __future__ import print_function, absolute_import, division
+import json
+import numpy as np
+from pandas import DataFrame
+from starvine.bvcopula.copula_factory import Copula
+from starvine.vine.base_vine import BaseVine
+
+
+## Pair copula family codes.  The family code is the index in this tuple.
+FAMILIES = ('indep', 'gauss', 't', 'frank', 'clayton', 'gumbel')
+## Max number of parameters of a pair copula family
+MAX_PARAMS = 2
+
+
+class VineMatrix(object):
+    """!
+    @brief R-vine matrix with one pair copula per entry below the diagonal.
+
+    Entry \f$ (k, i), k > i \f$ of the matrix \f$ M \f$ encodes the pair
+    copula with conditioned set \f$ \{M_{i,i}, M_{k,i}\} \f$ and conditioning
+    set \f$ \{M_{k+1,i}, ..., M_{d,i}\} \f$.  Matrix entries are data column
+    indices into self.labels.  See starvine.vine.R_vine.Rvine
+
+    The pair copula at entry (k, i) is given by self.family[k, i],
+    self.rotation[k, i] and the non-nan values of self.params[k, i].
+    The first argument of the copula is \f$ M_{i,i} \f$, unless
+    self.reverse[k, i] is set.
+    """
+    def __init__(self, labels, M, family, rotation, params, reverse):
+        """!
+        @param labels <b>list</b> data column labels
+        @param M <b>np_2darray</b> (d, d) int vine matrix
+        @param family <b>np_2darray</b> (d, d) int family codes, see FAMILIES
+        @param rotation <b>np_2darray</b> (d, d) int copula rotations
+        @param params <b>np_3darray</b> (d, d, MAX_PARAMS) copula parameters,
+            padded with nan
+        @param reverse <b>np_2darray</b> (d, d) bool.  Copula arguments are
+            swapped.
+        """
+        self.labels = list(labels)
+        self.M = np.asarray(M, dtype=int)
+        self.family = np.asarray(family, dtype=int)
+        self.rotation = np.asarray(rotation, dtype=int)
+        self.params = np.asarray(params, dtype=np.float64)
+        self.reverse = np.asarray(reverse, dtype=bool)
+        assert self.M.shape == (len(self.labels), len(self.labels))
+        self._copulas = None
+        self._plans = {}
+
+    @classmethod
+    def fromEntries(cls, labels, M, entries):
+        """!
+        @brief Build from the pair copulas of each matrix entry.
+        @param labels <b>list</b> data column labels
+        @param M <b>np_2darray</b> (d, d) int vine matrix
+        @param entries <b>dict</b> (k, i): (family name, rotation, params, reverse).
+            Missing entries are independence copulas.
+        """
+        d = len(labels)
+        family = np.zeros((d, d), dtype=int)
+        rotation = np.zeros((d, d), dtype=int)
+        params = np.full((d, d, MAX_PARAMS), np.nan)
+        reverse = np.zeros((d, d), dtype=bool)
+        for (k, i), (name, rot, theta, rev) in entries.items():
+            theta = np.atleast_1d(theta)
+            family[k, i] = FAMILIES.index(name)
+            rotation[k, i] = rot
+            params[k, i, :len(theta)] = theta
+            reverse[k, i] = rev
+        return cls(labels, M, family, rotation, params, reverse)
+
+    @property
+    def d(self):
+        return len(self.labels)
+
+    @property
+    def sampleOrder(self):
+        """!
+        @brief Data column indices in the order the variables are drawn by
+        sample(), the reversed matrix diagonal.
+        """
+        return [int(self.M[i, i]) for i in range(self.d - 1, -1, -1)]
+
+    def copulas(self):
+        """!
+        @brief Pair copula of each matrix entry below the diagonal.
+        Copula instances are shared between entries of equal family
+        and rotation.
+        @return <b>dict</b> (k, i): (copula, params, reverse)
+        """
+        if self._copulas is None:
+            models, self._copulas = {}, {}
+            for i in range(self.d - 1):
+                for k in range(i + 1, self.d):
+                    key = (FAMILIES[self.family[k, i]], self.rotation[k, i])
+                    if key not in models:
+                        models[key] = Copula(*key)
+                    theta = self.params[k, i]
+                    self._copulas[(k, i)] = (models[key], theta[~np.isnan(theta)],
+                                             self.reverse[k, i])
+        return self._copulas
+
+    def compile(self):
+        """!
+        @brief Precompute the evaluation order of sample() and logpdf().
+        Each conditional distribution \f$ F(x_a|x_{cond}) \f$ is assigned a
+        column of an (n, nSlots) workspace array.  The first d columns hold
+        the variables, other columns are reused as soon as their conditional
+        distribution has been read for the last time.
+        Sets self.samplePlan, self.densityPlan and their workspace widths.
+        Each plan step is (op, copula, params, reverse, reads, writes).
+        The plans of rosenblatt() and conditional sampling are compiled
+        on first use, see _transformPlan().
+        """
+        M, d = self.M, self.d
+        pcc = self.copulas()
+        self.samplePlan, self.sampleSlots = self._plan(())
+        # density: tree by tree, from the bottom row of the matrix up
+        ops = []
+        for k in range(d - 1, 0, -1):
+            for i in range(k):
+                a, b, cond = M[i, i], M[k, i], frozenset(M[k + 1:, i])
+                copula, params, reverse = pcc[(k, i)]
+                if reverse:
+                    a, b = b, a
+                # outputs F(a|b, cond) and F(b|a, cond)
+                outputs = ((a, cond | frozenset([b])), (b, cond | frozenset([a]))) \
+                    if k > 1 else ()
+                ops.append((_PDF, copula, params, False, ((a, cond), (b, cond)), outputs))
+        self.densityPlan, self.densitySlots = _allocateSlots(ops, d)
+
+    def sample(self, n=1000):
+        """!
+        @brief Draws n samples from the vine.
+        Variables are drawn in reverse order of the vine matrix diagonal.
+        Each variable is obtained by inverting its chain of conditional
+        distributions down the matrix column, for the whole sample at once.
+        @param n int. number of samples to draw
+        @return <b>np_2darray</b> (n, d) samples, columns in label order
+        """
+        return self.inverseRosenblatt(np.random.rand(n, self.d))
+
+    def inverseRosenblatt(self, w, x=None, given=()):
+        """!
+        @brief Inverse Rosenblatt transform.  Maps independent uniforms to
+        points of the vine copula.
+        Variable \f$ a = M_{i,i} \f$ is obtained by inverting
+        \f$ F(x_a|x_{M_{i+1,i}}, ..., x_{M_{d,i}}) \f$, its conditional
+        distribution given the variables drawn before it (see sampleOrder).
+        @param w <b>np_2darray</b> (n, d) independent uniforms, columns in
+            label order
+        @param x <b>np_2darray</b> (optional) (n, d) points.  Only the
+            columns of the given variables are read.
+        @param given <b>list</b> of data column indices of variables which
+            are fixed at their values in x rather than drawn.  The given
+            variables must lead sampleOrder.
+        @return <b>np_2darray</b> (n, d) points, columns in label order
+        """
+        plan, nSlots = self._plan(given)
+        return self._runPlan(plan, nSlots, x, w)[0]
+
+    def rosenblatt(self, x):
+        """!
+        @brief Forward Rosenblatt transform.  Maps points of the vine copula
+        to independent uniforms, the inverse of inverseRosenblatt().
+        @param x <b>np_2darray</b> (n, d) points, columns in label order
+        @return <b>np_2darray</b> (n, d) uniforms, columns in label order
+        """
+        plan, nSlots = self._plan(range(self.d))
+        return self._runPlan(plan, nSlots, x, None)[1]
+
+    def _plan(self, given):
+        """!
+        @brief Compiled transform plan for a set of given variables.
+        """
+        given = frozenset(int(a) for a in given)
+        if given not in self._plans:
+            order = self.sampleOrder
+            if sorted(order.index(a) for a in given) != list(range(len(given))):
+                raise RuntimeError("Conditioning variables %s must lead the sampling order %s"
+                                   % ([self.labels[a] for a in given],
+                                      [self.labels[a] for a in order]))
+            self._plans[given] = self._transformPlan(given)
+        return self._plans[given]
+
+    def _transformPlan(self, given):
+        """!
+        @brief Evaluation plan of the inverse Rosenblatt transform with the
+        given variables fixed.
+        Variables are visited in reverse order of the diagonal.  A free
+        variable is drawn by inverting its chain of conditional
+        distributions down the matrix column.  For a given variable the
+        chain is evaluated up the column instead, which also yields its
+        forward Rosenblatt transform.  With all variables given the plan is
+        the forward transform.
+        @param given <b>frozenset</b> data column indices of given variables
+        @return (plan, nSlots), see _allocateSlots()
+        """
+        M, d = self.M, self.d
+        pcc = self.copulas()
+        ops = []
+        for i in range(d - 1, -1, -1):
+            a = M[i, i]
+            if a in given:
+                ops.append((_GIVEN, None, (), False, (a, ), ((a, frozenset()), )))
+                # F(a|b, cond) from F(a|cond) and F(b|cond)
+                for k in range(d - 1, i, -1):
+                    b, cond = M[k, i], frozenset(M[k + 1:, i])
+                    copula, params, reverse = pcc[(k, i)]
+                    ops.append((_FWD, copula, params, not reverse,
+                                ((b, cond), (a, cond)), ((a, cond | frozenset([b])), )))
+                ops.append((_OUT, None, (), False, ((a, frozenset(M[i + 1:, i])), ), (a, )))
+            else:
+                ops.append((_INIT, None, (), False, (a, ), ((a, frozenset(M[i + 1:, i])), )))
+                for k in range(i + 1, d):
+                    b, cond = M[k, i], frozenset(M[k + 1:, i])
+                    copula, params, reverse = pcc[(k, i)]
+                    ops.append((_INV, copula, params, reverse,
+                                ((a, cond | frozenset([b])), (b, cond)), ((a, cond), )))
+            # conditional distributions of the sampled variables given a
+            for k in range(d - 1, i, -1):
+                b, cond = M[k, i], frozenset(M[k + 1:, i])
+                copula, params, reverse = pcc[(k, i)]
+                ops.append((_FWD, copula, params, reverse,
+                            ((a, cond), (b, cond)), ((b, cond | frozenset([a])), )))
+        return _allocateSlots(ops, d)
+
+    def _runPlan(self, plan, nSlots, x, w):
+        """!
+        @brief Evaluate a transform plan.
+        @param x <b>np_2darray</b> (n, d) values of the given variables
+        @param w <b>np_2darray</b> (n, d) uniforms of the free variables
+        @return (points, uniforms).  Both (n, d) arrays in label order.
+        """
+        n = (x if w is None else w).shape[0]
+        W = np.empty((n, nSlots), order='F')
+        wOut = np.empty((n, self.d)) if w is None else np.array(w, dtype=np.float64)
+        for op, copula, params, reverse, r, wr in plan:
+            if op == _INIT:
+                W[:, wr[0]] = w[:, r[0]]
+            elif op == _GIVEN:
+                W[:, wr[0]] = x[:, r[0]]
+            elif op == _OUT:
+                wOut[:, wr[0]] = W[:, r[0]]
+            elif op == _INV:
+                W[:, wr[0]] = copula.hinv(W[:, r[1]], W[:, r[0]], *params) if reverse else \
+                    copula.hinvT(W[:, r[0]], W[:, r[1]], *params)
+            elif wr[0] >= 0:
+                W[:, wr[0]] = copula.hT(W[:, r[1]], W[:, r[0]], *params) if reverse else \
+                    copula.h(W[:, r[0]], W[:, r[1]], *params)
+        return np.array(W[:, :self.d]), wOut
+
+    def logpdf(self, x, chunkSize=65536):
+        """!
+        @brief Log density of the vine copula.
+        @param x <b>np_2darray</b> of shape (n, d).  Points in the unit
+            hypercube, columns in label order.
+        @param chunkSize <b>int</b> number of rows evaluated at once
+        @return <b>np_1darray</b> log density at each point
+        """
+        if not hasattr(self, "densityPlan"):
+            self.compile()
+        x = np.asarray(x)
+        logp = np.zeros(x.shape[0])
+        for start in range(0, x.shape[0], chunkSize):
+            stop = min(start + chunkSize, x.shape[0])
+            W = np.empty((stop - start, self.densitySlots), order='F')
+            W[:, :self.d] = x[start:stop]
+            for op, copula, params, reverse, (r0, r1), wr in self.densityPlan:
+                logp[start:stop] += np.log(copula.pdf(W[:, r0], W[:, r1], *params))
+                if wr and wr[0] >= 0:
+                    W[:, wr[0]] = copula.hT(W[:, r0], W[:, r1], *params)
+                if wr and wr[1] >= 0:
+                    W[:, wr[1]] = copula.h(W[:, r0], W[:, r1], *params)
+        return logp
+
+    def save(self, fname):
+        """!
+        @brief Write the vine to a .npz or .json file.
+        @param fname <b>str</b> file name.  The format is chosen by the
+            file extension.
+        """
+        if fname.endswith(".json"):
+            params = np.where(np.isnan(self.params), None, self.params)
+            with open(fname, "w") as f:
+                json.dump({"labels": self.labels,
+                           "matrix": self.M.tolist(),
+                           "family": self.family.tolist(),
+                           "rotation": self.rotation.tolist(),
+                           "params": params.tolist(),
+                           "reverse": self.reverse.tolist(),
+                           "families": list(FAMILIES)}, f)
+        else:
+            np.savez(fname, labels=np.array(json.dumps(self.labels)),
+                     matrix=self.M, family=self.family, rotation=self.rotation,
+                     params=self.params, reverse=self.reverse,
+                     families=np.array(FAMILIES))
+
+    @classmethod
+    def load(cls, fname):
+        """!
+        @brief Read a vine written by VineMatrix.save()
+        @param fname <b>str</b> .npz or .json file name
+        """
+        if fname.endswith(".json"):
+            with open(fname) as f:
+                vS = json.load(f)
+            labels = vS["labels"]
+            vS["params"] = np.array(vS["params"], dtype=np.float64)
+        else:
+            with np.load(fname) as f:
+                vS = dict((key, f[key]) for key in f.files)
+            labels = json.loads(str(vS["labels"]))
+        if tuple(vS["families"]) != FAMILIES:
+            raise RuntimeError("Unknown pair copula family codes in %s" % fname)
+        return cls(labels, vS["matrix"], vS["family"], vS["rotation"],
+                   vS["params"], vS["reverse"])
+
+
+class MatrixVine(BaseVine):
+    """!
+    @brief Vine defined only by its VineMatrix.
+    Returned by BaseVine.loadVineStructure().  Provides sampling and
+    density evaluation without the training data or the vine trees.
+    """
+    def __init__(self, vineMatrix, **kwargs):
+        """!
+        @param vineMatrix <b>VineMatrix</b> fitted vine
+        """
+        super(MatrixVine, self).__init__(DataFrame(columns=vineMatrix.labels), **kwargs)
+        self.matrix = vineMatrix
+        self.nLevels = vineMatrix.d - 1
+        self.vine = []
+
+    def compileMatrix(self):
+        return self.matrix
+
+
+# evaluation plan operations, see VineMatrix.compile()
+_INIT, _INV, _FWD, _PDF, _GIVEN, _OUT = range(6)
+
+
+def _allocateSlots(ops, d):
+    """!
+    @brief Map the conditional distributions read and written by a
+    sequence of operations to workspace columns.
+    Columns 0, ..., d-1 hold the unconditioned variables.  A written
+    conditional distribution which is never read gets column -1.  A
+    column is freed after the last read of its conditional distribution
+    and reused by later writes.
+    @param ops <b>list</b> of (op, copula, params, reverse, reads, writes)
+        where reads and writes are (variable, conditioning set) keys.
+        The reads of _INIT and _GIVEN ops are input columns, the writes of
+        an _OUT op are output columns.
+    @param d <b>int</b> number of variables
+    @return (plan, nSlots).  The plan holds the ops with column indices
+        in place of keys.
+    """
+    lastRead = {}
+    for step, op in enumerate(ops):
+        if op[0] not in (_INIT, _GIVEN):
+            for key in op[4]:
+                lastRead[key] = step
+    slots = dict(((j, frozenset()), j) for j in range(d))
+    free, nSlots, plan = [], d, []
+    for step, (op, copula, params, reverse, reads, writes) in enumerate(ops):
+        outSlots = list(writes) if op == _OUT else []
+        for key in (() if op == _OUT else writes):
+            if key in slots:
+                outSlots.append(slots[key])
+            elif key not in lastRead:
+                outSlots.append(-1)
+            else:
+                if not free:
+                    free.append(nSlots)
+                    nSlots += 1
+                slots[key] = free.pop()
+                outSlots.append(slots[key])
+        if op in (_INIT, _GIVEN):
+            inSlots = reads
+        else:
+            inSlots = tuple(slots[key] for key in reads)
+            # outputs are allocated before inputs are released, an op
+            # never overwrites its own inputs
+            for key in set(reads):
+                if lastRead[key] == step and slots[key] >= d:
+                    free.append(slots.pop(key))
+        plan.append((op, copula, params, reverse, tuple(inSlots), tuple(outSlots)))
+    return plan, nSlots
@@ -0,0 +1,303 @@
+##
+# \brief Simultaneous maximum likelihood estimation of all pair copula
+# parameters in a vine.
+from __future__ import print_function, absolute_import, division
+import numpy as np
+from scipy.optimize import minimize
+
+
+class VineLikelihood(object):
+    """!
+    @brief Log likelihood of a fitted vine as a function of all pair
+    copula parameters.
+
+    The edges of every tree are compiled into levels.  Each edge reads
+    two columns of pseudo-observations and writes its conditional
+    distributions, F(a|b) and F(b|a), to the columns read by the next
+    level.  The pseudo-observations and the log likelihood of every edge
+    are cached at the current parameters.  A change in the parameters of
+    one tree level re-evaluates that level and the levels below it only,
+    and a change in the parameters of a single edge re-evaluates only the
+    edges downstream of that edge.  The derivative of an edge's own log
+    likelihood is analytic for copula with a closed form dlogpdf().  The
+    change of the edges downstream of it is a central difference over
+    single edges.
+    """
+    def __init__(self, vine, weights=None, eps=1e-12):
+        """!
+        @param vine <b>BaseVine</b> vine with fitted trees
+        @param weights <b>np_1darray</b> (optional) data weights
+        @param eps <b>float</b> conditional distributions are clipped
+            to [eps, 1 - eps]
+        """
+        self.eps = eps
+        self.weights = None
+        if weights is not None:
+            self.weights = np.asarray(weights, dtype=np.float64).ravel()
+            self.weights = self.weights / np.average(self.weights)
+        self.levels, self.paramEdge = [], []
+        theta, bounds = [], []
+        # column labels of deep trees are deeply nested tuples, they are
+        # hashed once here and replaced by integer keys
+        keys = {}
+        colKey = lambda label: None if label is None else keys.setdefault(label, len(keys))
+        for j, treeL in enumerate(vine.vine):
+            level = []
+            for u, v, data in treeL.tree.edges(data=True):
+                pair = data["pc"]
+                params = np.atleast_1d(np.asarray(pair.copulaParams[1], dtype=np.float64))
+                marker = len(self.paramEdge)
+                level.append({"pc": pair, "copula": pair.copulaModel, "analytic": True,
+                              "in": tuple(map(colKey, treeL._edgeColumns(*data["id"]))),
+                              "out": tuple(map(colKey, treeL._edgeOutputs(*data["id"]))),
+                              "slice": slice(marker, marker + len(params))})
+                theta.append(params)
+                bounds += list(pair.copulaModel.thetaBounds[:len(params)])
+                self.paramEdge += [(j, len(level) - 1)] * len(params)
+            self.levels.append(level)
+        # outputs which are not read by the next level are not computed
+        for j, level in enumerate(self.levels):
+            read = set(col for edge in self.levels[j + 1] for col in edge["in"]) \
+                if j + 1 < len(self.levels) else set()
+            for edge in level:
+                edge["out"] = tuple(col if col in read else None for col in edge["out"])
+        self.levelSlices = [slice(level[0]["slice"].start, level[-1]["slice"].stop)
+                            if level else slice(0, 0) for level in self.levels]
+        self.bounds = np.array(bounds, dtype=np.float64).reshape(-1, 2)
+        theta = np.concatenate(theta) if theta else np.zeros(0)
+        self.theta0 = np.clip(theta, self.bounds[:, 0], self.bounds[:, 1])
+        store = vine.vine[0].store
+        self._top = dict((keys[label], np.asarray(store.rankColumn(label), dtype=np.float64))
+                         for label in store.labels if label in keys)
+        self.evaluate(self.theta0)
+
+    @property
+    def nParams(self):
+        return len(self.theta0)
+
+    def evaluate(self, theta, fromLevel=0):
+        """!
+        @brief Evaluate the vine log likelihood.  The cached
+        pseudo-observations above fromLevel are reused.
+        @param theta <b>np_1darray</b> all pair copula parameters
+        @param fromLevel <b>int</b> first tree level with changed parameters
+        @return <b>float</b> log likelihood
+        """
+        theta = np.array(theta, dtype=np.float64)
+        if fromLevel == 0:
+            self._cols, self._edgeLL = [self._top], []
+        self._cols = self._cols[:fromLevel + 1]
+        self._edgeLL = self._edgeLL[:fromLevel]
+        cols = self._cols[fromLevel]
+        for level in self.levels[fromLevel:]:
+            nextCols, levelLL = {}, []
+            for edge in level:
+                ll, hA, hB = self._evalEdge(edge, theta, cols[edge["in"][0]], cols[edge["in"][1]])
+                levelLL.append(ll)
+                self._store(nextCols, edge, hA, hB)
+            self._edgeLL.append(levelLL)
+            self._cols.append(nextCols)
+            cols = nextCols
+        self.theta = theta
+        self.ll = float(sum(sum(levelLL) for levelLL in self._edgeLL))
+        return self.ll
+
+    def logLike(self, theta):
+        """!
+        @brief Vine log likelihood.  Only the tree levels at and below
+        the first changed parameter are re-evaluated.
+        @param theta <b>np_1darray</b> all pair copula parameters
+        """
+        theta = np.asarray(theta, dtype=np.float64)
+        changed = np.flatnonzero(theta != self.theta)
+        if len(changed) > 0:
+            self.evaluate(theta, self.paramEdge[changed[0]][0])
+        return self.ll
+
+    def gradient(self, theta, indices=None, step=1e-6):
+        """!
+        @brief Gradient of the vine log likelihood.  The edge's own term
+        is analytic where the copula provides dlogpdf().  The other
+        terms are central differences, one sided at a parameter bound.
+        Each parameter perturbation re-evaluates the edges downstream
+        of its own edge only.
+        @param theta <b>np_1darray</b> all pair copula parameters
+        @param indices <b>np_1darray</b> (optional) indices of the
+            parameters to differentiate.  Default is all.
+        @param step <b>float</b> relative finite difference step
+        @return <b>np_1darray</b> gradient, zero outside of indices
+        """
+        self.logLike(theta)
+        grad = np.zeros(self.nParams)
+        indices = range(self.nParams) if indices is None else indices
+        for p in indices:
+            j, k = self.paramEdge[p]
+            edge = self.levels[j][k]
+            direct = self._edgeDerivative(edge, p)
+            if direct is not None:
+                grad[p] = direct
+                if all(col is None for col in edge["out"]):
+                    # no lower tree reads the edge's outputs
+                    continue
+            h = step * max(1.0, abs(self.theta[p]))
+            hUp = min(h, self.bounds[p, 1] - self.theta[p])
+            hDown = min(h, self.theta[p] - self.bounds[p, 0])
+            delta = 0.
+            for sign, hp in ((1., hUp), (-1., hDown)):
+                if hp > 0:
+                    trial = self.theta.copy()
+                    trial[p] += sign * hp
+                    delta += sign * self._edgeDelta(trial, j, k, own=direct is None)
+            grad[p] += delta / (hUp + hDown)
+        return grad
+
+    def fit(self, blockwise=True, maxSweeps=10, tol=1e-6, method='L-BFGS-B', **kwargs):
+        """!
+        @brief Maximize the vine log likelihood, starting from the
+        current (sequentially estimated) parameters.  The parameters are
+        kept within each copula's thetaBounds.
+        @param blockwise <b>bool</b> block coordinate ascent over the
+            tree levels.  Each block update only re-evaluates the trees
+            at and below its level.  If False all parameters are updated
+            at once.
+        @param maxSweeps <b>int</b> max number of sweeps over the tree levels
+        @param tol <b>float</b> relative convergence tolerance of the log likelihood
+        @param method <b>str</b> bounded scipy.optimize.minimize method
+        @return <b>np_1darray</b> fitted parameters
+        """
+        theta = self.theta0.copy()
+        if self.nParams == 0:
+            return theta
+        if not blockwise:
+            return self._fitBlock(theta, np.arange(self.nParams), tol, method, **kwargs)
+        llOld = self.logLike(theta)
+        for sweep in range(maxSweeps):
+            for blockSlice in self.levelSlices:
+                if blockSlice.stop > blockSlice.start:
+                    indices = np.arange(blockSlice.start, blockSlice.stop)
+                    theta = self._fitBlock(theta, indices, tol, method, **kwargs)
+            llNew = self.logLike(theta)
+            if llNew - llOld <= tol * max(1.0, abs(llNew)):
+                break
+            llOld = llNew
+        return theta
+
+    def apply(self, theta):
+        """!
+        @brief Store the parameters in the vine's pair copulas.  The AIC
+        of each edge is updated from its log likelihood.
+        @param theta <b>np_1darray</b> all pair copula parameters
+        """
+        self.logLike(theta)
+        for j, level in enumerate(self.levels):
+            for k, edge in enumerate(level):
+                params = np.array(self.theta[edge["slice"]])
+                if len(params) == 0:
+                    continue
+                pair = edge["pc"]
+                aic = 2. * len(params) - 2. * self._edgeLL[j][k]
+                pair.copulaParams = (pair.copulaParams[0], params, aic) + \
+                    tuple(pair.copulaParams[3:])
+                pair.copulaModel._fittedParams = params
+
+    def _fitBlock(self, theta, indices, tol, method, **kwargs):
+        """!
+        @brief Maximize the log likelihood over theta[indices].
+        """
+        theta = theta.copy()
+
+        def nllh(x):
+            trial = theta.copy()
+            trial[indices] = x
+            return -self.logLike(trial)
+
+        def grad(x):
+            trial = theta.copy()
+            trial[indices] = x
+            return -self.gradient(trial, indices)[indices]
+
+        x0 = theta[indices]
+        f0 = nllh(x0)
+        bounds = [(lo if np.isfinite(lo) else None, hi if np.isfinite(hi) else None)
+                  for lo, hi in self.bounds[indices]]
+        res = minimize(nllh, x0, jac=grad, bounds=bounds, method=method, tol=tol, **kwargs)
+        if nllh(res.x) < f0:
+            theta[indices] = res.x
+        self.logLike(theta)
+        return theta
+
+    def _edgeDelta(self, theta, j, k, own=True):
+        """!
+        @brief Change of the log likelihood when only the parameters of
+        edge k in tree level j differ from the cached parameters.
+        Only the edges which read a changed column are re-evaluated.
+        @param own <b>bool</b> include the change of edge k itself
+        """
+        edge = self.levels[j][k]
+        cols = self._cols[j]
+        ll, hA, hB = self._evalEdge(edge, theta, cols[edge["in"][0]], cols[edge["in"][1]])
+        delta = ll - self._edgeLL[j][k] if own else 0.
+        dirty = {}
+        self._store(dirty, edge, hA, hB)
+        for jj in range(j + 1, len(self.levels)):
+            if not dirty:
+                break
+            cols, nextDirty = self._cols[jj], {}
+            for kk, edge in enumerate(self.levels[jj]):
+                colA, colB = edge["in"]
+                if colA in dirty or colB in dirty:
+                    ll, hA, hB = self._evalEdge(edge, theta,
+                                                dirty.get(colA, cols[colA]),
+                                                dirty.get(colB, cols[colB]))
+                    delta += ll - self._edgeLL[jj][kk]
+                    self._store(nextDirty, edge, hA, hB)
+            dirty = nextDirty
+        return delta
+
+    def _edgeDerivative(self, edge, p):
+        """!
+        @brief Analytic derivative of the log likelihood of one edge
+        with respect to parameter p at the cached parameters.
+        @return <b>float</b> or None if the copula has no closed form
+            derivative with respect to p
+        """
+        if p != edge["slice"].start or not edge["analytic"]:
+            return None
+        copula, params = edge["copula"], self.theta[edge["slice"]]
+        cols = self._cols[self.paramEdge[p][0]]
+        try:
+            dlogc = copula.dlogpdf(cols[edge["in"][0]], cols[edge["in"][1]], *params)
+        except NotImplementedError:
+            edge["analytic"] = False
+            return None
+        dll = np.sum(dlogc) if self.weights is None else np.dot(self.weights, dlogc)
+        return dll if np.isfinite(dll) else None
+
+    def _evalEdge(self, edge, theta, a, b):
+        """!
+        @brief Log likelihood and conditional distributions of one edge.
+        @return (log likelihood, F(a|b), F(b|a)).  A conditional
+            distribution is None if no lower tree reads it.
+        """
+        copula, params = edge["copula"], theta[edge["slice"]]
+        if copula.name == 'indep':
+            # unit density, h is the identity
+            return 0.0, a, b
+        logc = np.log(np.maximum(copula.pdf(a, b, *params), 1e-300))
+        ll = np.sum(logc) if self.weights is None else np.dot(self.weights, logc)
+        if not np.isfinite(ll):
+            ll = -1e20
+        outA, outB = edge["out"]
+        hA = None if outA is None else \
+            np.clip(copula.hT(a, b, *params), self.eps, 1. - self.eps)
+        hB = None if outB is None else \
+            np.clip(copula.h(a, b, *params), self.eps, 1. - self.eps)
+        return ll, hA, hB
+
+    @staticmethod
+    def _store(cols, edge, hA, hB):
+        outA, outB = edge["out"]
+        if outA is not None:
+            cols[outA] = hA
+        if outB is not None:
+            cols[outB] = hB
@@ -4,6 +4,7 @@ from __future__ import print_function, division
 import context
 from starvine.vine.C_vine import Cvine
 from starvine.mvar.mv_plot import matrixPairPlot
+from vine_data import driven_data
 # extra imports
 from scipy.stats import norm, beta
 import unittest
@@ -89,6 +90,91 @@ class TestCvine(unittest.TestCase):
         self.assertTrue(np.allclose(tst_rho_matrix - sample_scaled_rho_matrix_a, 0, atol=0.1))
         self.assertTrue(np.allclose(tst_rho_matrix - sample_scaled_rho_matrix_b, 0, atol=0.1))
 
+    def testCvineTrialCopula(self):
+        z = np.random.normal(size=(600, 3))
+        z[:, :2] += np.outer(z[:, 2], [0.9, -0.8])
+        ranked_data = pd.DataFrame(z, columns=['a', 'b', 'c']).rank() / 601
+        family = {'frank': 0, 'clayton-90': 1}
+        tstVine = Cvine(ranked_data, trial_copula=family)
+        self.assertEqual(tstVine.trial_copula_dict, family)
+        tstVine.constructVine()
+        for treeL in tstVine.vine:
+            for u, v, data in treeL.tree.edges(data=True):
+                self.assertIn(data["pc"].copulaModel.name, ('frank', 'clayton'))
+
+    def testCvineSubsampleStructure(self):
+        # variable 'c' drives all others
+        n = 8000
+        ranked_data = driven_data(n, [0.9, -0.8, 1.2], coupling=[(1, 0, 0.6)])
+        family = {'gauss': 0, 'frank': 0, 'clayton-90': 1}
+        for method in ('random', 'stratified'):
+            tstVine = Cvine(ranked_data, trial_copula=family, subsample=1000,
+                            subsampleMethod=method, nSubsamples=2, stratifyBy='c')
+            tstVine.constructVine()
+            report = tstVine.structureReport
+            self.assertEqual(report["subsample"], 1000)
+            self.assertEqual(len(report["roots"]), 2)
+            self.assertEqual(report["rootStability"][0], 1.0)
+            self.assertEqual(tstVine.vine[0].rootNodeID, 'c')
+            # the structure and families are kept, params are fit on all rows
+            self.assertEqual(len(tstVine.vine), len(tstVine.structure))
+            for treeL, treeStructure in zip(tstVine.vine, tstVine.structure):
+                self.assertEqual(treeL.rootNodeID, treeStructure["root"])
+                families = dict((edge[:2], edge[3]) for edge in treeStructure["edges"])
+                for u, v, data in treeL.tree.edges(data=True):
+                    pair = data["pc"]
+                    self.assertEqual(len(pair.UU), n)
+                    self.assertIs(pair.copulaModel, pair.copulaBank[families[data["id"]]])
+            samples = tstVine.sample(n=8000)
+            self.assertTrue(np.allclose(ranked_data.corr(method='kendall'),
+                                        samples.corr(method='kendall'), atol=0.05))
+
+    def testCvineUpdate(self):
+        rs = np.random.RandomState(7)
+
+        def draw(n, driver, load=(0.9, -0.8, 1.2, 1.0)):
+            z = rs.normal(size=(n, 4))
+            z += np.outer(z[:, driver], load)
+            return pd.DataFrame(z, columns=['a', 'b', 'c', 'd'])
+        family = {'gauss': 0, 'frank': 0}
+        # no independence edges, which could flip on the new rows
+        tstVine = Cvine(draw(2000, 2), trial_copula=family, indepAlpha=0.0)
+        tstVine.constructVine()
+        oldStructure = tstVine.treeStructures()
+        # new rows from the same distribution: structure and families kept
+        report = tstVine.update(draw(1000, 2), driftTol=0.05, tauDriftTol=0.1)
+        self.assertIsNone(report["reselectedLevel"])
+        self.assertEqual(report["reselected"], [])
+        self.assertEqual(len(report["tauDrift"]), len(oldStructure))
+        self.assertTrue(max(report["tauDrift"]) < 0.1)
+        self.assertEqual(len(tstVine.data), 3000)
+        newStructure = tstVine.treeStructures()
+        for old, new in zip(oldStructure, newStructure):
+            self.assertEqual(old["root"], new["root"])
+            self.assertEqual([e[:2] + e[3:] for e in old["edges"]],
+                             [e[:2] + e[3:] for e in new["edges"]])
+        for treeL in tstVine.vine:
+            for u, v, data in treeL.tree.edges(data=True):
+                self.assertEqual(len(data["pc"].UU), 3000)
+        # the warm started fit is as good as a fit from scratch on all rows
+        refVine = Cvine(tstVine.data, trial_copula=family, indepAlpha=0.0)
+        refVine.constructVine()
+        u = tstVine.data.rank() / 3001.
+        self.assertAlmostEqual(np.mean(refVine.logpdf(u)), np.mean(tstVine.logpdf(u)), delta=2e-3)
+        # new rows driven by another variable: the root is re-selected
+        report = tstVine.update(draw(6000, 0, (1., 1.5, 0., -1.5)), tauDriftTol=0.1)
+        self.assertEqual(report["reselectedLevel"], 0)
+        self.assertNotEqual(tstVine.vine[0].rootNodeID, oldStructure[0]["root"])
+        self.assertEqual(len(tstVine.vine[0].tree.edges()), 3)
+        # data weights of the new rows are appended
+        weightedVine = Cvine(draw(500, 2), dataWeights=np.ones(500), trial_copula=family)
+        weightedVine.constructVine()
+        with self.assertRaises(RuntimeError):
+            weightedVine.update(draw(100, 2))
+        weightedVine.update(draw(100, 2), np.full(100, 2.))
+        self.assertEqual(len(weightedVine.weights), 600)
+        self.assertEqual(weightedVine.weights[-1], 2.)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,180 @@
+#!/usr/bin/python2
+from __future__ import print_function, division
+# starvine imports
+import context
+from starvine.vine.C_vine import Cvine
+from vine_data import driven_data
+# extra imports
+from scipy.stats import kendalltau
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+np.random.seed(123)
+
+
+def treeCopula(tstVine, j, m):
+    """!
+    @brief (copula, params) of the tree j edge between the root and
+    variable m of the sampling order, None for the independence copula.
+    """
+    d = len(tstVine.sampleOrder)
+    copula, params, reverse = tstVine.matrix.copulas()[(d - 1 - j, d - 1 - m)]
+    return None if copula.name == 'indep' else (copula, params)
+
+
+class TestCvineSample(unittest.TestCase):
+    def testCvineArraySample(self):
+        # variable 'c' drives all others
+        ranked_data = driven_data(1500, [0.9, -0.8, 1.2, 0.6], coupling=[(4, 3, 0.5)])
+        tstVine = Cvine(ranked_data, trial_copula={'gauss': 0, 'frank': 0, 'clayton': 0,
+                                                   'clayton-90': 1, 'clayton-270': 3})
+        tstVine.constructVine()
+        self.assertEqual(tstVine.vine[0].rootNodeID, 'c')
+        # the nodes of lower trees are views into the conditional buffer
+        # written by the tree above
+        for treeL in tstVine.vine[1:]:
+            for node, nodeData in treeL.tree.nodes(data=True):
+                self.assertTrue(np.shares_memory(nodeData["data"], treeL.store.values))
+        self.assertEqual(sorted(tstVine.sampleOrder), list(range(5)))
+        self.assertEqual(tstVine.sampleOrder[0], 2)
+
+        samples = tstVine.sample(n=10000)
+        self.assertEqual(samples.shape, (10000, 5))
+        self.assertEqual(list(samples.columns), list(ranked_data.columns))
+        self.assertTrue(np.all((samples.values > 0) & (samples.values < 1)))
+        tst_ktau_matrix = ranked_data.corr(method='kendall')
+        sample_ktau_matrix = samples.corr(method='kendall')
+        self.assertTrue(np.allclose(tst_ktau_matrix - sample_ktau_matrix, 0, atol=0.05))
+
+    def testCvineConditionalSample(self):
+        ranked_data = driven_data(1500, [0.9, -0.8, 1.2], coupling=[(1, 0, 0.6)])
+        tstVine = Cvine(ranked_data, trial_copula={'gauss': 0, 'frank': 0, 'clayton-90': 1})
+        tstVine.constructVine()
+        labels = list(ranked_data.columns)
+        root, second = [labels[i] for i in tstVine.sampleOrder[:2]]
+        self.assertEqual(root, 'c')
+        # conditioning on uniform root values recovers the joint distribution
+        samples = tstVine.sample_conditional(8000, {root: np.random.rand(8000)})
+        self.assertTrue(np.allclose(ranked_data.corr(method='kendall'),
+                                    samples.corr(method='kendall'), atol=0.05))
+        # fixed root values shift the positively dependent 'd' up
+        samples = tstVine.sample_conditional(4000, {root: 0.9, second: 0.5})
+        self.assertTrue(np.all(samples[root] == 0.9))
+        self.assertTrue(np.all(samples[second] == 0.5))
+        self.assertGreater(samples['d'].mean(), 0.7)
+        # conditioning variables must lead the sampling order
+        with self.assertRaises(RuntimeError):
+            tstVine.sample_conditional(10, {labels[tstVine.sampleOrder[-1]]: 0.5})
+
+    def testCvineRosenblatt(self):
+        ranked_data = driven_data(1000, [0.9, -0.8, 1.2], coupling=[(1, 0, 0.6)])
+        tstVine = Cvine(ranked_data, trial_copula={'gauss': 0, 'frank': 0, 'clayton-90': 1})
+        tstVine.constructVine()
+        # the transformed data is close to independent
+        W = tstVine.rosenblatt(ranked_data)
+        self.assertEqual(list(W.columns), list(ranked_data.columns))
+        self.assertTrue(np.allclose(W.corr(method='kendall'), np.eye(4), atol=0.07))
+        # round trip, chunked and parallel
+        W = np.random.uniform(0.01, 0.99, (3000, 4))
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            U = tstVine.inverse_rosenblatt(W, chunkSize=700, executor=executor)
+            self.assertTrue(np.allclose(tstVine.rosenblatt(U, chunkSize=500, executor=executor),
+                                        W, atol=1e-6))
+        self.assertTrue(np.allclose(tstVine.inverse_rosenblatt(W), U))
+
+    def testCvineDensity(self):
+        ranked_data = driven_data(1000, [0.8, -0.7], driver=1, coupling=[(2, 0, 0.6)],
+                                  labels=['x', 'y', 'z'])
+        tstVine = Cvine(ranked_data, trial_copula={'gauss': 0, 'frank': 0, 'clayton-90': 1})
+        tstVine.constructVine()
+        # density agrees with the pair copula decomposition c_ry * c_rz * c_yz|r
+        r, a, b = tstVine.sampleOrder
+        (c_ra, p_ra), (c_rb, p_rb), (c_ab, p_ab) = \
+            treeCopula(tstVine, 0, 1), treeCopula(tstVine, 0, 2), treeCopula(tstVine, 1, 2)
+        U = np.random.uniform(0.01, 0.99, (2000, 3))
+        ref = np.log(c_ra.pdf(U[:, a], U[:, r], *p_ra)) + \
+            np.log(c_rb.pdf(U[:, b], U[:, r], *p_rb)) + \
+            np.log(c_ab.pdf(c_rb.hT(U[:, b], U[:, r], *p_rb),
+                            c_ra.hT(U[:, a], U[:, r], *p_ra), *p_ab))
+        self.assertTrue(np.allclose(tstVine.logpdf(U), ref))
+        self.assertTrue(np.allclose(tstVine.logpdf(pd.DataFrame(U, columns=['x', 'y', 'z'])), ref))
+        # chunked and parallel evaluation
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.assertTrue(np.allclose(tstVine.logpdf(U, chunkSize=300, executor=executor), ref))
+        # the density integrates to one over the unit cube
+        self.assertAlmostEqual(np.mean(tstVine.pdf(np.random.rand(200000, 3))), 1.0, delta=0.05)
+
+    def testCvineFamilies(self):
+        # every default family but the t copula, alone and with its rotations
+        trial_copulas = [{'gumbel': 0}, {'gauss': 0}]
+        for family in ('frank', 'clayton', 'gumbel'):
+            trial_copulas.append(dict([(family, 0)] + [("%s-%d" % (family, 90 * r), r)
+                                                      for r in (1, 2, 3)]))
+        ranked_data = driven_data(800, [0.9, -0.8, 1.2], coupling=[(1, 0, 0.6)],
+                                  rs=np.random.RandomState(5))
+        W = np.random.uniform(0.05, 0.95, (500, 4))
+        for family in trial_copulas:
+            msg = str(sorted(family))
+            tstVine = Cvine(ranked_data, trial_copula=family)
+            tstVine.constructVine()
+            # rosenblatt round trip
+            U = tstVine.inverse_rosenblatt(W)
+            self.assertTrue(np.allclose(tstVine.rosenblatt(U), W, atol=1e-6), msg)
+            # the density is the jacobian determinant of the rosenblatt
+            # transform, which is triangular in the sampling order
+            eps = 1e-6
+            ref = np.zeros(len(U))
+            for k in tstVine.sampleOrder:
+                dU = np.zeros(U.shape)
+                dU[:, k] = eps
+                dW = tstVine.rosenblatt(U + dU)[:, k] - tstVine.rosenblatt(U - dU)[:, k]
+                ref += np.log(dW / (2 * eps))
+            self.assertTrue(np.allclose(tstVine.logpdf(U), ref, atol=1e-4), msg)
+            # samples have the kendall's tau of the first tree copulas.  The
+            # data is not the reference: the families are misspecified
+            root = tstVine.sampleOrder[0]
+            x = tstVine.sample(n=5000).values
+            given = {ranked_data.columns[root]: np.random.rand(5000)}
+            xc = tstVine.sample_conditional(5000, given).values
+            for m in (1, 2, 3):
+                edge, var = treeCopula(tstVine, 0, m), tstVine.sampleOrder[m]
+                tau = 0. if edge is None else edge[0].kTau(0, *edge[1])
+                self.assertAlmostEqual(kendalltau(x[:, root], x[:, var])[0], tau,
+                                       delta=0.04, msg=msg)
+                self.assertAlmostEqual(kendalltau(xc[:, root], xc[:, var])[0], tau,
+                                       delta=0.04, msg=msg)
+
+    def testCvineTruncated(self):
+        # all variables are independent given 'r'.  The data does not
+        # depend on the test order: a chance rejection of independence in
+        # a lower tree would stop the 'indep' truncation
+        ranked_data = driven_data(800, [1.0, -0.8, 0.7], driver=0, labels=['r', 'x', 'y', 'z'],
+                                  rs=np.random.RandomState(42))
+        family = {'gauss': 0, 'frank': 0, 'clayton-90': 1}
+        for kwargs in ({'truncLevel': 1}, {'truncCriterion': 'indep', 'indepAlpha': 0.01}):
+            tstVine = Cvine(ranked_data, trial_copula=family, **kwargs)
+            tstVine.constructVine()
+            self.assertEqual(len(tstVine.vine), 1)
+            self.assertEqual(tstVine.sampleOrder[0], 0)
+            self.assertEqual(sorted(tstVine.sampleOrder), list(range(4)))
+            self.assertTrue(all(treeCopula(tstVine, j, m) is None
+                                for j in (1, 2) for m in range(j + 1, 4)))
+            # density of the truncated vine is the product of the first tree copulas
+            U = np.random.uniform(0.01, 0.99, (1000, 4))
+            ref = np.zeros(1000)
+            for i in range(1, 4):
+                copula, params = treeCopula(tstVine, 0, i)
+                ref += np.log(copula.pdf(U[:, tstVine.sampleOrder[i]], U[:, 0], *params))
+            self.assertTrue(np.allclose(tstVine.logpdf(U), ref))
+            samples = tstVine.sample(n=5000)
+            self.assertTrue(np.allclose(ranked_data.corr(method='kendall'),
+                                        samples.corr(method='kendall'), atol=0.05))
+        # the AIC criterion keeps every tree with a dependence gain
+        tstVine = Cvine(ranked_data, trial_copula=family, truncCriterion='AIC')
+        tstVine.constructVine()
+        self.assertTrue(1 <= len(tstVine.vine) <= 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
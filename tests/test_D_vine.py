@@ -0,0 +1,84 @@
+#!/usr/bin/python2
+from __future__ import print_function, division
+# starvine imports
+import context
+from starvine.vine.D_vine import Dvine, maxTauPath
+# extra imports
+import unittest
+import numpy as np
+import pandas as pd
+np.random.seed(123)
+
+
+def ar1_data(n, labels, rho=0.7):
+    """! @brief Ranked samples of a gaussian AR(1) chain in shuffled column order """
+    z = np.zeros((n, len(labels)))
+    z[:, 0] = np.random.normal(size=n)
+    for i in range(1, len(labels)):
+        z[:, i] = rho * z[:, i - 1] + np.sqrt(1 - rho ** 2) * np.random.normal(size=n)
+    data = pd.DataFrame(z, columns=labels)
+    data = data[list(np.random.permutation(labels))]
+    return data.rank() / (n + 1)
+
+
+class TestDvine(unittest.TestCase):
+    def testMaxTauPath(self):
+        # weights of a hidden chain 3-0-4-1-2
+        chain = [3, 0, 4, 1, 2]
+        weights = np.full((5, 5), 0.05)
+        for i, j in zip(chain[:-1], chain[1:]):
+            weights[i, j] = weights[j, i] = 0.6
+        path = maxTauPath(weights)
+        self.assertTrue(path == chain or path == chain[::-1])
+
+    def testDvineConstruct(self):
+        # independent of the random state left by other tests
+        np.random.seed(123)
+        labels = ['a', 'b', 'c', 'd', 'e']
+        ranked_data = ar1_data(1000, labels)
+        tstVine = Dvine(ranked_data, trial_copula={'gauss': 0, 'frank': 0, 'clayton': 0})
+        tstVine.constructVine()
+        # the path recovers the chain ordering
+        self.assertTrue(tstVine.pathOrder in (labels, labels[::-1]))
+        self.assertEqual(len(tstVine.vine), 4)
+        # only the given trial copula are fit
+        for treeL in tstVine.vine:
+            for u, v, data in treeL.tree.edges(data=True):
+                self.assertIn(data["pc"].copulaModel.name, ('gauss', 'frank', 'clayton'))
+
+        # sample from vine
+        samples = tstVine.sample(n=8000)
+        self.assertEqual(list(samples.columns), list(ranked_data.columns))
+        tst_ktau_matrix = ranked_data.corr(method='kendall')
+        sample_ktau_matrix = samples.corr(method='kendall')
+        self.assertTrue(np.allclose(tst_ktau_matrix - sample_ktau_matrix, 0, atol=0.05))
+
+        self.assertTrue(np.all(np.isfinite(tstVine.logpdf(samples))))
+
+    def testDvineDensity(self):
+        ranked_data = ar1_data(600, ['x', 'y', 'z'], rho=-0.5)
+        tstVine = Dvine(ranked_data, trial_copula={'gauss': 0, 'frank': 0, 'clayton-90': 1},
+                        pathOrder=['x', 'y', 'z'])
+        tstVine.constructVine()
+        # density agrees with the pair copula decomposition c12 * c23 * c13|2
+        pcc = tstVine.pathCopulas()
+        (c12, p12), (c23, p23) = pcc[0]
+        c13_2, p13_2 = pcc[1][0]
+        x = np.random.uniform(0.01, 0.99, (500, 3))
+        ref = np.log(c12.pdf(x[:, 0], x[:, 1], *p12)) + \
+            np.log(c23.pdf(x[:, 1], x[:, 2], *p23)) + \
+            np.log(c13_2.pdf(c12.hT(x[:, 0], x[:, 1], *p12),
+                             c23.h(x[:, 1], x[:, 2], *p23), *p13_2))
+        shuffled = pd.DataFrame(x, columns=['x', 'y', 'z'])[list(ranked_data.columns)]
+        self.assertTrue(np.allclose(tstVine.logpdf(shuffled), ref))
+        self.assertTrue(np.allclose(tstVine.logpdf(shuffled.values), ref))
+        self.assertTrue(np.allclose(tstVine.pdf(shuffled), np.exp(ref)))
+        # sampling inverts the conditional distributions
+        samples = tstVine.sample(n=8000)
+        tst_ktau_matrix = ranked_data.corr(method='kendall')
+        sample_ktau_matrix = samples.corr(method='kendall')
+        self.assertTrue(np.allclose(tst_ktau_matrix - sample_ktau_matrix, 0, atol=0.05))
+
+
+if __name__ == "__main__":
+    unittest.main()
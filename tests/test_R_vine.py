@@ -0,0 +1,77 @@
+#!/usr/bin/python2
+from __future__ import print_function, division
+# starvine imports
+import context
+from starvine.vine.R_vine import Rvine
+from starvine.vine.D_vine import Dvine
+# extra imports
+import unittest
+import numpy as np
+import pandas as pd
+np.random.seed(123)
+
+
+def gauss_data(n, corr, labels):
+    """! @brief Ranked samples of a multivariate gaussian """
+    z = np.random.multivariate_normal(np.zeros(len(labels)), corr, size=n)
+    data = pd.DataFrame(z, columns=labels)
+    return data.rank() / (n + 1)
+
+
+class TestRvine(unittest.TestCase):
+    def testRvineConstruct(self):
+        # tree structure 0-1, 1-2, 1-3, 3-4: neither a C- nor a D-vine
+        corr = np.array([[1.0, 0.7, 0.5, 0.5, 0.3],
+                         [0.7, 1.0, 0.7, 0.7, 0.4],
+                         [0.5, 0.7, 1.0, 0.5, 0.3],
+                         [0.5, 0.7, 0.5, 1.0, 0.6],
+                         [0.3, 0.4, 0.3, 0.6, 1.0]])
+        labels = ['a', 'b', 'c', 'd', 'e']
+        ranked_data = gauss_data(1500, corr, labels)
+        tstVine = Rvine(ranked_data, trial_copula={'gauss': 0, 'frank': 0, 'clayton': 0})
+        tstVine.constructVine()
+        edges0 = set(frozenset(e) for e in tstVine.vine[0].tree.edges())
+        self.assertEqual(edges0, set([frozenset(['a', 'b']), frozenset(['b', 'c']),
+                                      frozenset(['b', 'd']), frozenset(['d', 'e'])]))
+        # every lower tree satisfies the proximity condition
+        for treeL in tstVine.vine[1:]:
+            for n0, n1 in treeL.tree.edges():
+                self.assertEqual(len(set(n0) & set(n1)), 1)
+        # vine matrix encodes each edge once
+        M = tstVine.vineMatrix
+        self.assertEqual(sorted(np.diag(M)), list(range(5)))
+        self.assertEqual(len(tstVine.matrixEdges), 10)
+        for i in range(5):
+            self.assertEqual(len(set(M[i:, i])), 5 - i)
+        # the sequential fit minimizes each tree's negative log likelihood
+        treeL = tstVine.vine[0]
+        self.assertLess(treeL.treeNLLH(), 0.)
+        self.assertLess(treeL.treeNLLH(), treeL.treeNLLH(1.05 * treeL.treeCopulaParams))
+
+        # sample from vine
+        samples = tstVine.sample(n=8000)
+        tst_ktau_matrix = ranked_data.corr(method='kendall')
+        sample_ktau_matrix = samples.corr(method='kendall')
+        self.assertTrue(np.allclose(tst_ktau_matrix - sample_ktau_matrix, 0, atol=0.05))
+        self.assertTrue(np.all(np.isfinite(tstVine.logpdf(samples))))
+
+    def testRvineDensity(self):
+        corr = np.array([[1.0, -0.6, 0.3],
+                         [-0.6, 1.0, -0.5],
+                         [0.3, -0.5, 1.0]])
+        ranked_data = gauss_data(800, corr, ['x', 'y', 'z'])
+        family = {'gauss': 0, 'frank': 0, 'clayton-90': 1}
+        rVine = Rvine(ranked_data, trial_copula=family)
+        rVine.constructVine()
+        # a three variable R-vine is a D-vine along the first tree
+        path = [v for v in ranked_data.columns if rVine.vine[0].tree.degree(v) == 1]
+        path.insert(1, [v for v in ranked_data.columns if v not in path][0])
+        dVine = Dvine(ranked_data, trial_copula=family, pathOrder=path)
+        dVine.constructVine()
+        x = pd.DataFrame(np.random.uniform(0.01, 0.99, (500, 3)), columns=ranked_data.columns)
+        self.assertTrue(np.allclose(rVine.logpdf(x), dVine.logpdf(x)))
+        self.assertTrue(np.allclose(rVine.pdf(x.values), dVine.pdf(x)))
+
+
+if __name__ == "__main__":
+    unittest.main()
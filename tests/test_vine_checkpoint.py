@@ -0,0 +1,74 @@
+#!/usr/bin/python2
+from __future__ import print_function, division
+# starvine imports
+import context
+from starvine.vine.C_vine import Cvine
+from vine_data import driven_data
+from starvine.vine.vine_checkpoint import VineCheckpoint
+from starvine.bvcopula.pc_cache import TournamentCache
+# extra imports
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+
+
+class TestVineCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.data = driven_data(800, [0.9, -0.8, 1.2, 0.5], coupling=[(1, 0, 0.6), (4, 3, 0.8)],
+                                rs=np.random.RandomState(11))
+        self.family = {'gauss': 0, 'frank': 0, 'clayton': 0}
+        self.checkpointDir = tempfile.mkdtemp()
+        self.edgeDir = os.path.join(self.checkpointDir, "edges")
+
+    def tearDown(self):
+        shutil.rmtree(self.checkpointDir)
+
+    def testCvineResume(self):
+        refVine = Cvine(self.data, trial_copula=self.family,
+                        checkpointDir=self.checkpointDir,
+                        tournamentCache=TournamentCache(cacheDir=self.edgeDir))
+        refVine.constructVine()
+        ckpt = VineCheckpoint(self.checkpointDir, self.data, refVine._checkpointSettings())
+        self.assertEqual(ckpt.levels, len(refVine.vine))
+        self.assertTrue(ckpt.complete)
+        stored, values = ckpt.loadLevel(2)
+        self.assertTrue(np.array_equal(values, refVine.vine[2].store.values))
+        self.assertEqual(stored["root"], refVine.vine[2].rootNodeID)
+        # crash after the second level, during the fit of the third level
+        ckpt.manifest.update(levels=2, complete=False)
+        ckpt._write("manifest.pkl", ckpt.manifest)
+        os.remove(os.path.join(self.checkpointDir, "level_2.pkl"))
+        cache = TournamentCache(cacheDir=self.edgeDir)
+        tstVine = Cvine(self.data, trial_copula=self.family,
+                        checkpointDir=self.checkpointDir, tournamentCache=cache)
+        tstVine.constructVine()
+        # restored levels are not refit, stored edge fits are not refit
+        self.assertEqual(cache.misses, 0)
+        self.assertEqual(cache.hits, sum(len(treeL.tree.edges()) for treeL in refVine.vine[2:]))
+        self.assertEqual(tstVine.treeStructures(), refVine.treeStructures())
+        u = self.data.values[:50]
+        self.assertTrue(np.allclose(tstVine.logpdf(u), refVine.logpdf(u)))
+        for treeL, refTree in zip(tstVine.vine, refVine.vine):
+            for u, v, data in treeL.tree.edges(data=True):
+                refPair = refTree.tree[u][v]["pc"]
+                self.assertEqual(data["pc"].copulaModel.name, refPair.copulaModel.name)
+                self.assertEqual(data["pc"].trialFamily, refPair.trialFamily)
+                self.assertTrue(np.allclose(data["pc"].UU, refPair.UU))
+
+    def testCheckpointMismatch(self):
+        tstVine = Cvine(self.data, trial_copula=self.family, truncLevel=2,
+                        checkpointDir=self.checkpointDir)
+        tstVine.constructVine()
+        self.assertTrue(os.path.exists(os.path.join(self.checkpointDir, "level_1.npy")))
+        # other data: the stored levels are discarded
+        ckpt = VineCheckpoint(self.checkpointDir, self.data.iloc[:400],
+                              tstVine._checkpointSettings())
+        self.assertEqual(ckpt.levels, 0)
+        self.assertFalse(ckpt.complete)
+        self.assertFalse(os.path.exists(os.path.join(self.checkpointDir, "level_1.npy")))
+
+
+if __name__ == "__main__":
+    unittest.main()
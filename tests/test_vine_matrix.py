@@ -0,0 +1,71 @@
+#!/usr/bin/python2
+from __future__ import print_function, division
+# starvine imports
+import context
+from starvine.vine.base_vine import BaseVine
+from starvine.vine.C_vine import Cvine
+from starvine.vine.D_vine import Dvine
+from starvine.vine.R_vine import Rvine
+from vine_data import driven_data
+# extra imports
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+np.random.seed(123)
+
+
+class TestVineMatrix(unittest.TestCase):
+    def setUp(self):
+        self.data = driven_data(600, [0.9, -0.8, 1.2], coupling=[(1, 0, 0.6)])
+        self.family = {'gauss': 0, 'frank': 0, 'clayton': 0, 'clayton-90': 1}
+        self.outDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.outDir)
+
+    def testSaveLoad(self):
+        for vineType, kwargs in ((Cvine, {}), (Cvine, {'truncLevel': 2}),
+                                 (Dvine, {}), (Rvine, {})):
+            tstVine = vineType(self.data, trial_copula=self.family, **kwargs)
+            tstVine.constructVine()
+            logp = tstVine.logpdf(self.data)
+            for ext in ('npz', 'json'):
+                fname = os.path.join(self.outDir, "vine." + ext)
+                tstVine.saveVine(fname)
+                # the reloaded vine does not hold the training data
+                loadedVine = BaseVine.loadVineStructure(fname)
+                self.assertEqual(len(loadedVine.data), 0)
+                self.assertTrue(np.allclose(loadedVine.logpdf(self.data), logp))
+            samples = loadedVine.sample(n=8000)
+            self.assertEqual(list(samples.columns), list(self.data.columns))
+            self.assertTrue(np.allclose(samples.corr(method='kendall'),
+                                        self.data.corr(method='kendall'), atol=0.05))
+
+    def testCompiledMatrix(self):
+        tstVine = Dvine(self.data, trial_copula=self.family)
+        tstVine.constructVine()
+        matrix = tstVine.matrix
+        d = matrix.d
+        # workspace columns are reused, at most one per conditional
+        # distribution held at once
+        self.assertLess(matrix.densitySlots, d * (d + 1) // 2)
+        U = self.data.values
+        self.assertTrue(np.allclose(matrix.logpdf(U, chunkSize=7), matrix.logpdf(U)))
+        # rosenblatt transforms and conditional sampling share the plan
+        # of sample()
+        W = np.random.uniform(0.01, 0.99, (500, d))
+        X = matrix.inverseRosenblatt(W)
+        self.assertTrue(np.allclose(matrix.rosenblatt(X), W, atol=1e-6))
+        first = matrix.sampleOrder[0]
+        self.assertTrue(np.allclose(matrix.inverseRosenblatt(W, X, [first]), X))
+        with self.assertRaises(RuntimeError):
+            matrix.inverseRosenblatt(W, X, matrix.sampleOrder[-1:])
+        # the compiled vine is independent of the networkx trees
+        tstVine.vine = []
+        self.assertEqual(tstVine.sample(n=10).shape, (10, d))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/python2
+from __future__ import print_function, division
+# starvine imports
+import context
+from vine_data import driven_data
+from starvine.vine.C_vine import Cvine
+from starvine.vine.D_vine import Dvine
+from starvine.vine.vine_mle import VineLikelihood
+# extra imports
+import unittest
+import numpy as np
+np.random.seed(123)
+
+
+class TestVineMLE(unittest.TestCase):
+    def setUp(self):
+        self.data = driven_data(500, [0.9, -0.8, 1.2], coupling=[(1, 0, 0.6)])
+        self.family = {'gauss': 0, 'frank': 0, 'clayton': 0, 'clayton-90': 1}
+
+    def testVineLikelihood(self):
+        for vineType in (Cvine, Dvine):
+            tstVine = vineType(self.data, trial_copula=self.family)
+            tstVine.constructVine()
+            vineLLH = VineLikelihood(tstVine)
+            # the propagated likelihood agrees with the vine density
+            U = np.asarray(tstVine.vine[0].store.ranks)
+            self.assertAlmostEqual(vineLLH.ll, np.sum(tstVine.logpdf(U)), places=6)
+            self.assertAlmostEqual(tstVine.vineNLLH(), -vineLLH.ll)
+            # edge-wise gradient agrees with a full re-evaluation
+            theta = vineLLH.theta0
+            grad = vineLLH.gradient(theta)
+            for p in range(vineLLH.nParams):
+                h = 1e-5 * max(1.0, abs(theta[p]))
+                up, down = theta.copy(), theta.copy()
+                up[p] += h
+                down[p] -= h
+                fd = (VineLikelihood(tstVine).logLike(up) -
+                      VineLikelihood(tstVine).logLike(down)) / (2 * h)
+                self.assertAlmostEqual(grad[p], fd, delta=1e-5 * max(1.0, abs(fd)))
+            # second order one sided difference at a parameter bound
+            vineLLH.bounds[0, 1] = theta[0]
+            h = 1e-5 * max(1.0, abs(theta[0]))
+            down, down2 = theta.copy(), theta.copy()
+            down[0] -= h
+            down2[0] -= 2 * h
+            fd = (3 * vineLLH.logLike(theta) - 4 * VineLikelihood(tstVine).logLike(down) +
+                  VineLikelihood(tstVine).logLike(down2)) / (2 * h)
+            self.assertAlmostEqual(vineLLH.gradient(theta)[0], fd, delta=1e-3 * max(1.0, abs(fd)))
+
+    def testSfitMLE(self):
+        for blockwise in (True, False):
+            tstVine = Cvine(self.data, trial_copula=self.family)
+            tstVine.constructVine()
+            llSeq = -tstVine.vineNLLH()
+            llJoint = tstVine.sfitMLE(blockwise=blockwise)
+            self.assertGreaterEqual(llJoint, llSeq - 1e-8)
+            # fitted params are stored in the vine and stay within bounds
+            U = np.asarray(tstVine.vine[0].store.ranks)
+            self.assertAlmostEqual(np.sum(tstVine.logpdf(U)), llJoint, places=6)
+            for tree in tstVine.vine:
+                for u, v, data in tree.tree.edges(data=True):
+                    copula, params = data["pc"].copulaModel, data["pc"].copulaParams[1]
+                    for p, (lo, hi) in zip(params, copula.thetaBounds):
+                        self.assertTrue(lo <= p <= hi)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/python2
+from __future__ import print_function, division
+# starvine imports
+import context
+from vine_data import driven_data
+from starvine.vine.C_vine import Cvine
+from starvine.vine.D_vine import Dvine
+from starvine.bvcopula.pc_store import ColumnStore
+# extra imports
+import unittest
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import os
+import shutil
+import tempfile
+import numpy as np
+np.random.seed(123)
+
+
+def fittedEdges(vine):
+    return [sorted((str(data["id"]), data["pc"].copulaModel.name,
+                    tuple(np.round(data["pc"].copulaParams[1], 8)))
+                   for u, v, data in tree.tree.edges(data=True))
+            for tree in vine.vine]
+
+
+class TestVineParallelFit(unittest.TestCase):
+    def setUp(self):
+        self.data = driven_data(600, [0.9, -0.8, 1.2])
+        self.family = {'gauss': 0, 'frank': 0, 'clayton': 0, 'clayton-90': 1}
+
+    def testSharedStore(self):
+        store = ColumnStore(self.data)
+        ref = store.share()
+        shared = ColumnStore.attach(ref)
+        self.assertTrue(np.array_equal(shared.values, store.values))
+        self.assertTrue(np.array_equal(shared.rankColumn('c'), store.rankColumn('c')))
+        ColumnStore.unshare(ref)
+        self.assertFalse(os.path.exists(ref["dir"]))
+
+    def testParallelCvineFit(self):
+        seqVine = Cvine(self.data, trial_copula=self.family)
+        seqVine.constructVine()
+        with ProcessPoolExecutor(max_workers=2,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            parVine = Cvine(self.data, trial_copula=self.family, executor=executor)
+            parVine.constructVine()
+        self.assertEqual(fittedEdges(seqVine), fittedEdges(parVine))
+        self.assertTrue(np.allclose(seqVine.logpdf(self.data.values),
+                                    parVine.logpdf(self.data.values)))
+
+    def testParallelDvineFit(self):
+        seqVine = Dvine(self.data, trial_copula=self.family)
+        seqVine.constructVine()
+        parVine = Dvine(self.data, trial_copula=self.family, nWorkers=2)
+        parVine.constructVine()
+        self.assertEqual(fittedEdges(seqVine), fittedEdges(parVine))
+
+    def testThreadExecutorShareDir(self):
+        seqVine = Cvine(self.data, trial_copula=self.family)
+        seqVine.constructVine()
+        shareDir = tempfile.mkdtemp()
+        try:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                parVine = Cvine(self.data, trial_copula=self.family,
+                                executor=executor, shareDir=shareDir)
+                parVine.constructVine()
+            # shared files are removed after each tree level
+            self.assertEqual(os.listdir(shareDir), [])
+        finally:
+            shutil.rmtree(shareDir)
+        self.assertEqual(fittedEdges(seqVine), fittedEdges(parVine))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+##
+# \brief Synthetic data sets shared by the vine tests
+from __future__ import print_function, division
+import numpy as np
+import pandas as pd
+
+
+def driven_data(n, load, driver=2, coupling=(), labels=None, rs=np.random):
+    """!
+    @brief Ranked samples of gaussian variables which all load on a single
+    driving variable.  The driver is the root of the first C-tree.
+    @param n <b>int</b> number of samples
+    @param load <b>list</b> loading of each other variable on the driver
+    @param driver <b>int</b> column of the driving variable
+    @param coupling <b>list</b> of (i, j, c): c times column j is added to
+        column i, which leaves dependence given the driver
+    @param labels <b>list</b> column labels.  Default is 'a', 'b', ...
+    @param rs random state.  Default is the global numpy random state
+    @return <b>DataFrame</b> ranked samples
+    """
+    d = len(load) + 1
+    z = rs.normal(size=(n, d))
+    z[:, [i for i in range(d) if i != driver]] += np.outer(z[:, driver], load)
+    for i, j, c in coupling:
+        z[:, i] += c * z[:, j]
+    if labels is None:
+        labels = [chr(ord('a') + i) for i in range(d)]
+    return pd.DataFrame(z, columns=list(labels)).rank() / (n + 1)